@@ -5,7 +5,7 @@ Reddit Monitor - Page d'accueil (VERSION SCRAPING)
 Application de collecte et analyse de posts Reddit
 """
 import streamlit as st
-from utils.database import get_stats, cleanup_old_posts
+from utils.database import get_stats, cleanup_old_posts, get_storage_backend_name, get_cache_stats
 from utils.reddit_scraper import test_reddit_connection
 from config.settings import RETENTION_DAYS
 
@@ -90,6 +90,19 @@ with st.sidebar:
         with st.spinner("Nettoyage en cours..."):
             if cleanup_old_posts(RETENTION_DAYS):
                 st.success("✅ Nettoyage effectué!")
+    
+    # Efficacité du cache des requêtes (processus courant et niveau partagé)
+    cache_stats = get_cache_stats()
+    st.caption(
+        f"Cache : {cache_stats['hit_rate']:.0%} de hits "
+        f"({cache_stats['entries']} entrées en mémoire)"
+    )
+    if "shared" in cache_stats:
+        shared_stats = cache_stats["shared"]
+        st.caption(
+            f"Cache partagé : {shared_stats['hit_rate']:.0%} de hits, "
+            f"{shared_stats['entries']} entrées, {shared_stats['bytes'] / 1024 / 1024:.1f} Mo"
+        )
 
 # Main content
 col1, col2 = st.columns([2, 1])
@@ -156,7 +169,7 @@ st.markdown("""
 
 # Affichage d'avertissements si configuration manquante (VERSION SCRAPING - pas besoin de Reddit)
 try:
-    if "supabase" not in st.secrets:
+    if get_storage_backend_name() == "supabase" and "supabase" not in st.secrets:
         st.warning("⚠️ Configuration incomplète. Veuillez ajouter vos secrets Supabase dans `.streamlit/secrets.toml`")
 except:
     st.error("❌ Fichier secrets.toml manquant. Voir la documentation.")
@@ -2,6 +2,11 @@
 Configuration globale de l'application Reddit Monitor
 """
 
+# Configuration stockage
+# "supabase" (PostgreSQL hébergé) ou "sqlite" (base embarquée, mono-machine / CI)
+STORAGE_BACKEND = "supabase"
+SQLITE_PATH = "data/reddit_monitor.db"
+
 # Configuration Reddit API
 REDDIT_USER_AGENT = "reddit-monitor:v1.0.0 (by /u/YourUsername)"
 
@@ -18,6 +23,28 @@ MAX_POSTS_PER_SCAN = 1000  # Limite par mot-clé
 POST_AGE_DAYS = 7  # Posts de moins de X jours
 RETENTION_DAYS = 30  # Garder l'historique X jours
 
+# Configuration détection de pics pendant les scans (utils/trends.py)
+TREND_HALF_LIFE_HOURS = 6.0  # Demi-vie des débits par mot-clé / subreddit
+TREND_BASELINE_DAYS = 28  # Jours d'agrégats servant de référence
+TREND_EWMA_ALPHA = 0.2  # Lissage de la bande de référence
+TREND_Z_THRESHOLD = 3.0  # z-score minimal d'un pic
+TREND_MIN_DAILY_RATE = 5.0  # Débit minimal (posts/jour) d'un pic
+
+# Configuration découverte de subreddits (utils/discovery.py)
+DISCOVERY_DAYS = 90  # Fenêtre d'agrégats résumée par subreddit
+DISCOVERY_HALF_LIFE_DAYS = 14.0  # Demi-vie des occurrences de mots-clés
+
+# Configuration cache des requêtes des pages (utils/cache.py)
+QUERY_CACHE_TTL_SECONDS = 300  # Durée de vie d'un résultat (les écritures l'invalident avant)
+QUERY_CACHE_MAX_ENTRIES = 256  # Au-delà, les résultats les moins récemment lus sont évincés
+SHARED_CACHE_ENABLED = True  # Cache commun à tous les processus locaux (fichier SQLite)
+SHARED_CACHE_PATH = "data/query_cache.db"
+SHARED_CACHE_MAX_MB = 256  # Taille maximale des résultats stockés (éviction LRU)
+
+# Configuration archivage (posts expirés copiés en Parquet avant purge, nécessite pyarrow)
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = "data/archive"
+
 # Configuration Reddit rate limiting
 REQUESTS_PER_MINUTE = 60
 SLEEP_BETWEEN_REQUESTS = 1  # secondes
@@ -40,12 +40,14 @@ CREATE INDEX IF NOT EXISTS idx_subreddits_user ON subreddits(user_id, list_type,
 
 -- Table: posts
 -- Stocke les posts Reddit collectés
+-- Partitionnée par mois sur post_date (PostgreSQL 13+) : la rétention se fait
+-- en détachant/supprimant des partitions entières (voir plus bas)
 CREATE TABLE IF NOT EXISTS posts (
-    id BIGSERIAL PRIMARY KEY,
-    post_id TEXT NOT NULL UNIQUE,  -- ID Reddit du post
+    id BIGSERIAL,
+    post_id TEXT NOT NULL,  -- ID Reddit du post
     user_id TEXT NOT NULL DEFAULT 'default',
     title TEXT NOT NULL,
-    content TEXT,
+    content_preview TEXT,  -- Début du contenu (le texte complet est dans post_bodies)
     author TEXT,
     subreddit TEXT NOT NULL,
     url TEXT NOT NULL,
@@ -55,11 +57,62 @@ CREATE TABLE IF NOT EXISTS posts (
     num_comments INTEGER DEFAULT 0,
     awards INTEGER DEFAULT 0,
     is_nsfw BOOLEAN DEFAULT FALSE,
-    matched_keywords TEXT,  -- Mots-clés qui ont matché (CSV)
+    matched_keywords TEXT,  -- Mots-clés qui ont matché (CSV, affichage)
+    keywords TEXT[] NOT NULL DEFAULT '{}',  -- Mots-clés normalisés (filtrage indexé)
     age_hours DECIMAL(10,2),
     engagement_score DECIMAL(10,2) DEFAULT 0,
-    created_at TIMESTAMPTZ DEFAULT NOW()
-);
+    cluster_id TEXT,  -- Groupe de quasi-doublons (post_id de référence, voir post_signatures)
+    sentiment DECIMAL(4,3),  -- Sentiment du titre et du contenu, de -1 à 1 (utils/sentiment.py)
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    -- Vecteur de recherche plein texte (titre prioritaire sur le contenu),
+    -- calculé par le trigger set_post_search_vector à partir de post_bodies
+    search_vector TSVECTOR,
+    -- La clé de partitionnement doit faire partie des contraintes d'unicité
+    PRIMARY KEY (id, post_date),
+    UNIQUE (post_id, post_date)
+) PARTITION BY RANGE (post_date);
+
+-- Partition par défaut : posts hors des plages mensuelles créées
+CREATE TABLE IF NOT EXISTS posts_default PARTITION OF posts DEFAULT;
+
+-- Migration d'une ancienne table posts non partitionnée (une seule fois) :
+--   ALTER TABLE posts RENAME TO posts_legacy;
+--   -- exécuter ce schéma, puis :
+--   INSERT INTO posts (post_id, user_id, title, content, author, subreddit, url,
+--       post_date, score, upvote_ratio, num_comments, awards, is_nsfw,
+--       matched_keywords, keywords, age_hours, engagement_score, created_at)
+--   SELECT post_id, user_id, title, content, author, subreddit, url,
+--       post_date, score, upvote_ratio, num_comments, awards, is_nsfw,
+--       matched_keywords, coalesce(string_to_array(matched_keywords, ', '), '{}'),
+--       age_hours, engagement_score, created_at
+--   FROM posts_legacy;
+--   DROP TABLE posts_legacy;
+--
+-- Migration du contenu vers post_bodies (une seule fois, après création de post_bodies) :
+--   INSERT INTO post_bodies (post_id, post_date, user_id, content)
+--   SELECT post_id, post_date, user_id, content FROM posts WHERE coalesce(content, '') <> '';
+--   ALTER TABLE posts ADD COLUMN IF NOT EXISTS content_preview TEXT;
+--   UPDATE posts SET content_preview = left(content, 200);
+--   ALTER TABLE posts DROP COLUMN search_vector;
+--   ALTER TABLE posts ADD COLUMN search_vector TSVECTOR;
+--   ALTER TABLE posts DROP COLUMN content;
+--   -- une fois le trigger set_post_search_vector créé :
+--   UPDATE posts SET title = title;
+--
+-- Ajout des groupes de quasi-doublons :
+--   ALTER TABLE posts ADD COLUMN IF NOT EXISTS cluster_id TEXT;
+--
+-- Ajout du sentiment (puis backfill_sentiment depuis la page Configuration) :
+--   ALTER TABLE posts ADD COLUMN IF NOT EXISTS sentiment DECIMAL(4,3);
+--   ALTER TABLE rollup_daily_subreddit ADD COLUMN IF NOT EXISTS sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0;
+--   ALTER TABLE rollup_daily_subreddit ADD COLUMN IF NOT EXISTS positive_posts INTEGER NOT NULL DEFAULT 0;
+--   ALTER TABLE rollup_daily_subreddit ADD COLUMN IF NOT EXISTS negative_posts INTEGER NOT NULL DEFAULT 0;
+--   ALTER TABLE rollup_daily_keyword ADD COLUMN IF NOT EXISTS sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0;
+--   ALTER TABLE rollup_daily_keyword ADD COLUMN IF NOT EXISTS positive_posts INTEGER NOT NULL DEFAULT 0;
+--   ALTER TABLE rollup_daily_keyword ADD COLUMN IF NOT EXISTS negative_posts INTEGER NOT NULL DEFAULT 0;
+--
+-- Ajout des formules d'engagement personnalisées :
+--   ALTER TABLE user_configs ADD COLUMN IF NOT EXISTS engagement_formula TEXT;
 
 -- Index pour performances
 CREATE INDEX IF NOT EXISTS idx_posts_user ON posts(user_id);
@@ -68,8 +121,209 @@ CREATE INDEX IF NOT EXISTS idx_posts_engagement ON posts(engagement_score DESC);
 CREATE INDEX IF NOT EXISTS idx_posts_subreddit ON posts(subreddit);
 CREATE INDEX IF NOT EXISTS idx_posts_post_id ON posts(post_id);
 
--- Index pour recherche full-text
-CREATE INDEX IF NOT EXISTS idx_posts_title ON posts USING gin(to_tsvector('english', title));
+-- Index composites pour le tri côté base et la pagination keyset (get_posts)
+CREATE INDEX IF NOT EXISTS idx_posts_user_date ON posts(user_id, post_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_engagement ON posts(user_id, engagement_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_score ON posts(user_id, score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_comments ON posts(user_id, num_comments DESC, id DESC);
+
+-- Index pour recherche full-text (titre + contenu, remplace idx_posts_title)
+DROP INDEX IF EXISTS idx_posts_title;
+CREATE INDEX IF NOT EXISTS idx_posts_search ON posts USING gin(search_vector);
+
+-- Index pour le filtrage par mot-clé (keywords @> ARRAY['...'])
+CREATE INDEX IF NOT EXISTS idx_posts_keywords ON posts USING gin(keywords);
+
+-- Index pour les variantes d'un même groupe de quasi-doublons
+CREATE INDEX IF NOT EXISTS idx_posts_cluster ON posts(user_id, cluster_id);
+
+-- =====================================================
+
+-- Table: post_bodies
+-- Contenu complet des posts (selftext), séparé de posts pour que les listes,
+-- statistiques et graphiques ne parcourent que des lignes étroites. Chargé à
+-- la demande (aperçu, export, archivage). Compression LZ4 (PostgreSQL 14+).
+-- Partitionnée comme posts : les partitions expirent en même temps.
+CREATE TABLE IF NOT EXISTS post_bodies (
+    post_id TEXT NOT NULL,
+    post_date TIMESTAMPTZ NOT NULL,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    content TEXT COMPRESSION lz4 NOT NULL,
+    PRIMARY KEY (post_id, post_date)
+) PARTITION BY RANGE (post_date);
+
+CREATE TABLE IF NOT EXISTS post_bodies_default PARTITION OF post_bodies DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_post_bodies_post_id ON post_bodies(post_id);
+
+-- Function: Vecteur de recherche (titre A, contenu B) calculé à l'écriture
+-- save_posts enregistre les corps avant les posts
+CREATE OR REPLACE FUNCTION set_post_search_vector()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT b.content
+            FROM post_bodies b
+            WHERE b.post_id = NEW.post_id
+            AND b.post_date = NEW.post_date
+        ), '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS set_post_search_vector ON posts;
+CREATE TRIGGER set_post_search_vector
+    BEFORE INSERT OR UPDATE OF title ON posts
+    FOR EACH ROW
+    EXECUTE FUNCTION set_post_search_vector();
+
+-- =====================================================
+
+-- Table: post_signatures
+-- Signatures MinHash des posts (utils/dedup.py) et leurs clés LSH : un
+-- nouveau post n'est comparé qu'aux posts partageant au moins une bande
+-- (bands && ARRAY[...], index GIN). Purgée avec les partitions expirées.
+CREATE TABLE IF NOT EXISTS post_signatures (
+    user_id TEXT NOT NULL DEFAULT 'default',
+    post_id TEXT NOT NULL,
+    post_date TIMESTAMPTZ NOT NULL,
+    cluster_id TEXT NOT NULL,
+    signature TEXT NOT NULL,  -- 128 valeurs uint32 en base64
+    bands TEXT[] NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_signatures_bands ON post_signatures USING gin(bands);
+CREATE INDEX IF NOT EXISTS idx_post_signatures_date ON post_signatures(post_date);
+
+-- =====================================================
+
+-- Gestion des partitions de posts
+
+-- Function: Création des partitions mensuelles manquantes de posts et post_bodies
+-- (de p_months_back mois avant le mois courant à p_months_ahead mois après)
+-- Si la maintenance a été sautée, la partition par défaut contient déjà des
+-- lignes du mois : CREATE ... PARTITION OF échouerait. La partition est donc
+-- créée à part, les lignes du mois y sont déplacées depuis la partition par
+-- défaut (le DELETE ne touche pas aux agrégats, maintenus à l'INSERT / UPDATE),
+-- puis elle est attachée.
+CREATE OR REPLACE FUNCTION create_posts_partitions(
+    p_months_back INTEGER DEFAULT 0,
+    p_months_ahead INTEGER DEFAULT 2
+)
+RETURNS INTEGER AS $$
+DECLARE
+    parent TEXT;
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['posts', 'post_bodies'] LOOP
+        FOR i IN -p_months_back..p_months_ahead LOOP
+            month_start := (date_trunc('month', NOW()) + make_interval(months => i))::DATE;
+            month_end := (month_start + INTERVAL '1 month')::DATE;
+            partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+            
+            IF to_regclass(partition_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMPRESSION)',
+                    partition_name,
+                    parent
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE post_date >= %L AND post_date < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    parent || '_default',
+                    month_start,
+                    month_end,
+                    partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    parent,
+                    partition_name,
+                    month_start,
+                    month_end
+                );
+                created := created + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Function: Rétention par suppression de partitions entières
+-- Une partition est supprimée quand tout son mois est plus vieux que p_days :
+-- coût constant quel que soit le nombre de lignes expirées (pas de DELETE,
+-- pas de bloat). Seule la partition par défaut est purgée ligne à ligne.
+CREATE OR REPLACE FUNCTION drop_expired_posts_partitions(p_days INTEGER DEFAULT 30)
+RETURNS INTEGER AS $$
+DECLARE
+    part RECORD;
+    upper_bound TIMESTAMPTZ;
+    dropped INTEGER := 0;
+BEGIN
+    FOR part IN
+        SELECT
+            i.inhparent::regclass AS parent,
+            c.oid::regclass AS name,
+            pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent IN ('posts'::regclass, 'post_bodies'::regclass)
+    LOOP
+        CONTINUE WHEN part.bound = 'DEFAULT';
+        
+        upper_bound := substring(part.bound FROM $re$TO \('([^']+)'\)$re$)::TIMESTAMPTZ;
+        
+        IF upper_bound <= NOW() - make_interval(days => p_days) THEN
+            EXECUTE format('ALTER TABLE %s DETACH PARTITION %s', part.parent, part.name);
+            EXECUTE format('DROP TABLE %s', part.name);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+    
+    DELETE FROM posts_default WHERE post_date < NOW() - make_interval(days => p_days);
+    DELETE FROM post_bodies_default WHERE post_date < NOW() - make_interval(days => p_days);
+    DELETE FROM post_signatures WHERE post_date < NOW() - make_interval(days => p_days);
+    
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Function: Posts qui seront supprimés par drop_expired_posts_partitions
+-- (archivage Parquet avant purge), par lots triés par id
+CREATE OR REPLACE FUNCTION get_expiring_posts(
+    p_days INTEGER DEFAULT 30,
+    p_after_id BIGINT DEFAULT 0,
+    p_limit INTEGER DEFAULT 1000
+)
+RETURNS SETOF posts AS $$
+    SELECT *
+    FROM posts
+    WHERE id > p_after_id
+    AND (
+        -- Partitions mensuelles entièrement expirées
+        post_date < date_trunc('month', NOW() - make_interval(days => p_days))
+        -- Partition par défaut, purgée ligne à ligne
+        OR (tableoid = 'posts_default'::regclass
+            AND post_date < NOW() - make_interval(days => p_days))
+    )
+    ORDER BY id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+-- Partitions initiales (couvre la rétention par défaut de 30 jours)
+SELECT create_posts_partitions(2, 2);
+
+-- Maintenance automatique (optionnel, extension pg_cron activée dans Supabase) :
+-- SELECT cron.schedule('posts-partitions', '0 3 * * *',
+--     $$SELECT create_posts_partitions(0, 2); SELECT drop_expired_posts_partitions(30);$$);
 
 -- =====================================================
 
@@ -84,6 +338,8 @@ CREATE TABLE IF NOT EXISTS user_configs (
         "awards": 5.0,
         "upvote_ratio": 10.0
     }'::jsonb,
+    -- Formule personnalisée (utils/formula.py), NULL = formule par défaut
+    engagement_formula TEXT,
     telegram_chat_id TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
@@ -110,6 +366,461 @@ CREATE TRIGGER update_user_configs_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Function: Fusion des mots-clés lors d'un upsert d'un post déjà connu
+-- (un post retrouvé par un autre mot-clé cumule ses mots-clés)
+CREATE OR REPLACE FUNCTION merge_post_keywords()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.keywords = ARRAY(
+        SELECT DISTINCT unnest(OLD.keywords || NEW.keywords) ORDER BY 1
+    );
+    NEW.matched_keywords = array_to_string(NEW.keywords, ', ');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger pour posts
+DROP TRIGGER IF EXISTS merge_posts_keywords ON posts;
+CREATE TRIGGER merge_posts_keywords
+    BEFORE UPDATE ON posts
+    FOR EACH ROW
+    EXECUTE FUNCTION merge_post_keywords();
+
+-- =====================================================
+
+-- Agrégats journaliers (rollups) maintenus à l'écriture
+-- Les graphiques de l'Historique lisent ces tables : quelques centaines de
+-- lignes pour 90 jours, quel que soit le nombre de posts. Pas de trigger de
+-- suppression : les agrégats survivent à la rétention des posts bruts.
+-- Jours et heures en UTC. Sentiment : somme des scores et nombre de posts
+-- positifs (>= 0.05) / négatifs (<= -0.05), mêmes seuils que utils/sentiment.py.
+
+-- Table: rollup_daily_subreddit (utilisateur × jour × subreddit)
+CREATE TABLE IF NOT EXISTS rollup_daily_subreddit (
+    user_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    subreddit TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    comments_sum BIGINT NOT NULL DEFAULT 0,
+    engagement_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0,
+    positive_posts INTEGER NOT NULL DEFAULT 0,
+    negative_posts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, subreddit)
+);
+
+-- Table: rollup_daily_keyword (utilisateur × jour × subreddit × mot-clé)
+CREATE TABLE IF NOT EXISTS rollup_daily_keyword (
+    user_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    subreddit TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    engagement_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0,
+    positive_posts INTEGER NOT NULL DEFAULT 0,
+    negative_posts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, subreddit, keyword)
+);
+
+-- Table: rollup_hourly (utilisateur × jour × heure, pour la heatmap jour/heure)
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    user_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    hour SMALLINT NOT NULL CHECK (hour BETWEEN 0 AND 23),
+    posts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, hour)
+);
+
+-- Function: Ajoute (p_sign = 1) ou retire (p_sign = -1) un post des agrégats
+CREATE OR REPLACE FUNCTION apply_post_rollups(p_post posts, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    post_day DATE := (p_post.post_date AT TIME ZONE 'UTC')::DATE;
+    positive INTEGER := CASE WHEN p_post.sentiment >= 0.05 THEN p_sign ELSE 0 END;
+    negative INTEGER := CASE WHEN p_post.sentiment <= -0.05 THEN p_sign ELSE 0 END;
+BEGIN
+    INSERT INTO rollup_daily_subreddit AS r
+        (user_id, day, subreddit, posts, score_sum, comments_sum, engagement_sum,
+         sentiment_sum, positive_posts, negative_posts)
+    VALUES (
+        p_post.user_id, post_day, p_post.subreddit, p_sign,
+        p_sign * coalesce(p_post.score, 0),
+        p_sign * coalesce(p_post.num_comments, 0),
+        p_sign * coalesce(p_post.engagement_score, 0),
+        p_sign * coalesce(p_post.sentiment, 0), positive, negative
+    )
+    ON CONFLICT (user_id, day, subreddit) DO UPDATE SET
+        posts = r.posts + EXCLUDED.posts,
+        score_sum = r.score_sum + EXCLUDED.score_sum,
+        comments_sum = r.comments_sum + EXCLUDED.comments_sum,
+        engagement_sum = r.engagement_sum + EXCLUDED.engagement_sum,
+        sentiment_sum = r.sentiment_sum + EXCLUDED.sentiment_sum,
+        positive_posts = r.positive_posts + EXCLUDED.positive_posts,
+        negative_posts = r.negative_posts + EXCLUDED.negative_posts;
+    
+    INSERT INTO rollup_daily_keyword AS r
+        (user_id, day, subreddit, keyword, posts, score_sum, engagement_sum,
+         sentiment_sum, positive_posts, negative_posts)
+    SELECT
+        p_post.user_id, post_day, p_post.subreddit, kw, p_sign,
+        p_sign * coalesce(p_post.score, 0),
+        p_sign * coalesce(p_post.engagement_score, 0),
+        p_sign * coalesce(p_post.sentiment, 0), positive, negative
+    FROM unnest(p_post.keywords) AS kw
+    ON CONFLICT (user_id, day, subreddit, keyword) DO UPDATE SET
+        posts = r.posts + EXCLUDED.posts,
+        score_sum = r.score_sum + EXCLUDED.score_sum,
+        engagement_sum = r.engagement_sum + EXCLUDED.engagement_sum,
+        sentiment_sum = r.sentiment_sum + EXCLUDED.sentiment_sum,
+        positive_posts = r.positive_posts + EXCLUDED.positive_posts,
+        negative_posts = r.negative_posts + EXCLUDED.negative_posts;
+    
+    INSERT INTO rollup_hourly AS r (user_id, day, hour, posts)
+    VALUES (
+        p_post.user_id, post_day,
+        EXTRACT(HOUR FROM p_post.post_date AT TIME ZONE 'UTC'), p_sign
+    )
+    ON CONFLICT (user_id, day, hour) DO UPDATE SET
+        posts = r.posts + EXCLUDED.posts;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function: Mise à jour incrémentale des agrégats
+-- (un post re-scanné est retiré avec ses anciennes valeurs puis ré-ajouté)
+CREATE OR REPLACE FUNCTION maintain_post_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM apply_post_rollups(OLD, -1);
+    END IF;
+    PERFORM apply_post_rollups(NEW, 1);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS maintain_posts_rollups ON posts;
+CREATE TRIGGER maintain_posts_rollups
+    AFTER INSERT OR UPDATE ON posts
+    FOR EACH ROW
+    EXECUTE FUNCTION maintain_post_rollups();
+
+-- Function: Reconstruction des agrégats d'un utilisateur depuis posts
+-- (migration d'une base existante ; l'historique au-delà de la rétention est perdu)
+CREATE OR REPLACE FUNCTION rebuild_post_rollups(p_user_id TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    post posts;
+    rebuilt INTEGER := 0;
+BEGIN
+    DELETE FROM rollup_daily_subreddit WHERE user_id = p_user_id;
+    DELETE FROM rollup_daily_keyword WHERE user_id = p_user_id;
+    DELETE FROM rollup_hourly WHERE user_id = p_user_id;
+    
+    FOR post IN SELECT * FROM posts WHERE user_id = p_user_id LOOP
+        PERFORM apply_post_rollups(post, 1);
+        rebuilt := rebuilt + 1;
+    END LOOP;
+    
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function: Série journalière, au total (p_dimension NULL) ou par
+-- subreddit / mot-clé (p_dimension = 'subreddit' | 'keyword', colonne name),
+-- éventuellement restreinte aux valeurs p_names
+DROP FUNCTION IF EXISTS get_daily_rollups(TEXT, INTEGER, TEXT, TEXT[]);
+CREATE OR REPLACE FUNCTION get_daily_rollups(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 30,
+    p_dimension TEXT DEFAULT NULL,
+    p_names TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+    day DATE,
+    name TEXT,
+    total_posts BIGINT,
+    score_sum BIGINT,
+    comments_sum BIGINT,
+    engagement_sum DECIMAL,
+    sentiment_sum DECIMAL
+) AS $$
+DECLARE
+    since DATE := ((NOW() - make_interval(days => p_days)) AT TIME ZONE 'UTC')::DATE;
+BEGIN
+    IF p_dimension = 'keyword' THEN
+        RETURN QUERY
+        SELECT r.day, r.keyword, SUM(r.posts)::BIGINT, SUM(r.score_sum)::BIGINT,
+            NULL::BIGINT, SUM(r.engagement_sum), SUM(r.sentiment_sum)
+        FROM rollup_daily_keyword r
+        WHERE r.user_id = p_user_id AND r.day >= since
+        AND (p_names IS NULL OR r.keyword = ANY(p_names))
+        GROUP BY r.day, r.keyword
+        HAVING SUM(r.posts) > 0
+        ORDER BY r.day, r.keyword;
+    ELSIF p_dimension = 'subreddit' THEN
+        RETURN QUERY
+        SELECT r.day, r.subreddit, r.posts::BIGINT, r.score_sum, r.comments_sum, r.engagement_sum,
+            r.sentiment_sum
+        FROM rollup_daily_subreddit r
+        WHERE r.user_id = p_user_id AND r.day >= since
+        AND (p_names IS NULL OR r.subreddit = ANY(p_names))
+        AND r.posts > 0
+        ORDER BY r.day, r.subreddit;
+    ELSE
+        RETURN QUERY
+        SELECT r.day, NULL::TEXT, SUM(r.posts)::BIGINT, SUM(r.score_sum)::BIGINT,
+            SUM(r.comments_sum)::BIGINT, SUM(r.engagement_sum), SUM(r.sentiment_sum)
+        FROM rollup_daily_subreddit r
+        WHERE r.user_id = p_user_id AND r.day >= since
+        GROUP BY r.day
+        HAVING SUM(r.posts) > 0
+        ORDER BY r.day;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Function: Totaux de la période par subreddit ou mot-clé, du plus actif au moins actif
+DROP FUNCTION IF EXISTS get_rollup_totals(TEXT, INTEGER, TEXT);
+CREATE OR REPLACE FUNCTION get_rollup_totals(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 30,
+    p_dimension TEXT DEFAULT 'subreddit'
+)
+RETURNS TABLE (
+    name TEXT,
+    total_posts BIGINT,
+    engagement_sum DECIMAL,
+    sentiment_sum DECIMAL,
+    positive_posts BIGINT,
+    negative_posts BIGINT
+) AS $$
+DECLARE
+    since DATE := ((NOW() - make_interval(days => p_days)) AT TIME ZONE 'UTC')::DATE;
+BEGIN
+    IF p_dimension = 'keyword' THEN
+        RETURN QUERY
+        SELECT r.keyword, SUM(r.posts)::BIGINT, SUM(r.engagement_sum), SUM(r.sentiment_sum),
+            SUM(r.positive_posts)::BIGINT, SUM(r.negative_posts)::BIGINT
+        FROM rollup_daily_keyword r
+        WHERE r.user_id = p_user_id AND r.day >= since
+        GROUP BY r.keyword
+        HAVING SUM(r.posts) > 0
+        ORDER BY 2 DESC, 1;
+    ELSE
+        RETURN QUERY
+        SELECT r.subreddit, SUM(r.posts)::BIGINT, SUM(r.engagement_sum), SUM(r.sentiment_sum),
+            SUM(r.positive_posts)::BIGINT, SUM(r.negative_posts)::BIGINT
+        FROM rollup_daily_subreddit r
+        WHERE r.user_id = p_user_id AND r.day >= since
+        GROUP BY r.subreddit
+        HAVING SUM(r.posts) > 0
+        ORDER BY 2 DESC, 1;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Function: Heatmap jour de la semaine (0 = lundi) × heure, au plus 168 lignes
+CREATE OR REPLACE FUNCTION get_activity_heatmap(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+    day_of_week INTEGER,
+    hour INTEGER,
+    total_posts BIGINT
+) AS $$
+    SELECT
+        EXTRACT(ISODOW FROM r.day)::INTEGER - 1,
+        r.hour::INTEGER,
+        SUM(r.posts)::BIGINT
+    FROM rollup_hourly r
+    WHERE r.user_id = p_user_id
+    AND r.day >= ((NOW() - make_interval(days => p_days)) AT TIME ZONE 'UTC')::DATE
+    GROUP BY 1, 2
+    HAVING SUM(r.posts) > 0
+    ORDER BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+-- Function: Activité journalière de subreddits (découverte, utils/discovery.py) :
+-- posts, engagement et occurrences de mots-clés par subreddit et par jour,
+-- éventuellement restreinte aux subreddits p_subreddits
+CREATE OR REPLACE FUNCTION get_subreddit_activity(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 90,
+    p_subreddits TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+    subreddit TEXT,
+    day DATE,
+    posts BIGINT,
+    engagement_sum DECIMAL,
+    keyword_hits BIGINT,
+    keywords TEXT[]
+) AS $$
+    SELECT
+        s.subreddit,
+        s.day,
+        s.posts::BIGINT,
+        s.engagement_sum,
+        coalesce(SUM(k.posts), 0)::BIGINT,
+        coalesce(array_agg(k.keyword) FILTER (WHERE k.posts > 0), '{}')
+    FROM rollup_daily_subreddit s
+    LEFT JOIN rollup_daily_keyword k
+        ON k.user_id = s.user_id AND k.day = s.day AND k.subreddit = s.subreddit
+    WHERE s.user_id = p_user_id
+    AND s.day >= ((NOW() - make_interval(days => p_days)) AT TIME ZONE 'UTC')::DATE
+    AND (p_subreddits IS NULL OR s.subreddit = ANY(p_subreddits))
+    AND s.posts > 0
+    GROUP BY s.subreddit, s.day, s.posts, s.engagement_sum
+    ORDER BY s.subreddit, s.day;
+$$ LANGUAGE sql STABLE;
+
+-- Table: rollup_daily_sketches (utilisateur × jour)
+-- Sketches fusionnables calculés par l'application (utils/sketches.py) :
+-- HyperLogLog des auteurs et subreddits, DDSketch des scores et de
+-- l'engagement. Reconstruits pour les jours touchés par un scan ou un
+-- recalcul ; conservés au-delà de la rétention comme les autres agrégats
+CREATE TABLE IF NOT EXISTS rollup_daily_sketches (
+    user_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    authors_hll TEXT,
+    subreddits_hll TEXT,
+    score_sketch TEXT,
+    engagement_sketch TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, day)
+);
+
+-- Table: keyword_mining (une ligne par utilisateur)
+-- État incrémental de la fouille des termes associés aux mots-clés
+-- (utils/keyword_mining.py : Space-Saving des termes fréquents, count-min
+-- sketch des co-occurrences), mis à jour à chaque sauvegarde de posts
+CREATE TABLE IF NOT EXISTS keyword_mining (
+    user_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Table: subreddit_discovery (utilisateur × subreddit)
+-- Classement des subreddits candidats (utils/discovery.py), recalculé depuis
+-- les agrégats pour les subreddits touchés par chaque scan. decayed_hits :
+-- occurrences de mots-clés à décroissance exponentielle, valeur au jour as_of
+CREATE TABLE IF NOT EXISTS subreddit_discovery (
+    user_id TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    keyword_hits INTEGER NOT NULL DEFAULT 0,
+    keywords_matched INTEGER NOT NULL DEFAULT 0,
+    engagement_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    decayed_hits DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_day DATE,
+    as_of DATE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, subreddit)
+);
+
+-- =====================================================
+
+-- Function: Recalcul des scores d'engagement d'un utilisateur (changement de poids)
+-- Par lots triés par id (pagination keyset sur p_after_id) ; seules les lignes
+-- dont le score change sont réécrites. Même formule que
+-- utils/analyzer.py:score_engagement_batch, à partir de l'âge enregistré au scan.
+CREATE OR REPLACE FUNCTION rescore_posts_batch(
+    p_user_id TEXT,
+    p_weights JSONB,
+    p_after_id BIGINT DEFAULT 0,
+    p_limit INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+    processed INTEGER,
+    updated INTEGER,
+    last_id BIGINT
+) AS $$
+    WITH batch AS (
+        SELECT
+            p.id,
+            p.post_date,
+            round((
+                coalesce(p.score, 0) * coalesce((p_weights->>'upvotes')::NUMERIC, 1.0) +
+                coalesce(p.num_comments, 0) * coalesce((p_weights->>'comments')::NUMERIC, 2.0) +
+                coalesce(p.awards, 0) * coalesce((p_weights->>'awards')::NUMERIC, 5.0) +
+                coalesce(p.upvote_ratio, 0.5) * coalesce((p_weights->>'upvote_ratio')::NUMERIC, 10.0)
+            ) * GREATEST(
+                CASE
+                    WHEN coalesce(p.age_hours, 0) < 24 THEN 1.2
+                    WHEN p.age_hours < 48 THEN 1.1
+                    WHEN p.age_hours < 72 THEN 1.0
+                    ELSE 0.9 - p.age_hours / 1000
+                END,
+                0.5
+            ), 2) AS new_score
+        FROM posts p
+        WHERE p.user_id = p_user_id
+        AND p.id > p_after_id
+        ORDER BY p.id
+        LIMIT p_limit
+    ),
+    changed AS (
+        UPDATE posts p
+        SET engagement_score = b.new_score
+        FROM batch b
+        WHERE p.id = b.id
+        AND p.post_date = b.post_date
+        AND p.engagement_score IS DISTINCT FROM b.new_score
+        RETURNING p.id
+    )
+    SELECT
+        (SELECT COUNT(*) FROM batch)::INTEGER,
+        (SELECT COUNT(*) FROM changed)::INTEGER,
+        (SELECT MAX(id) FROM batch);
+$$ LANGUAGE sql;
+
+-- Function: Enregistre les scores de sentiment calculés par l'application
+-- (utils/sentiment.py) pour un lot de posts ; seules les lignes dont le
+-- score change sont réécrites (les agrégats suivent par trigger)
+CREATE OR REPLACE FUNCTION set_posts_sentiment(
+    p_user_id TEXT,
+    p_post_ids TEXT[],
+    p_scores DECIMAL[]
+)
+RETURNS INTEGER AS $$
+    WITH changed AS (
+        UPDATE posts p
+        SET sentiment = s.score
+        FROM unnest(p_post_ids, p_scores) AS s(post_id, score)
+        WHERE p.user_id = p_user_id
+        AND p.post_id = s.post_id
+        AND p.sentiment IS DISTINCT FROM s.score
+        RETURNING p.id
+    )
+    SELECT COUNT(*)::INTEGER FROM changed;
+$$ LANGUAGE sql;
+
+-- Function: Enregistre les scores d'engagement calculés par l'application
+-- (formule personnalisée, utils/formula.py) pour un lot de posts ; seules les
+-- lignes dont le score change sont réécrites
+CREATE OR REPLACE FUNCTION set_posts_engagement(
+    p_user_id TEXT,
+    p_ids BIGINT[],
+    p_scores DECIMAL[]
+)
+RETURNS INTEGER AS $$
+    WITH changed AS (
+        UPDATE posts p
+        SET engagement_score = s.score
+        FROM unnest(p_ids, p_scores) AS s(id, score)
+        WHERE p.user_id = p_user_id
+        AND p.id = s.id
+        AND p.engagement_score IS DISTINCT FROM s.score
+        RETURNING p.id
+    )
+    SELECT COUNT(*)::INTEGER FROM changed;
+$$ LANGUAGE sql;
+
 -- =====================================================
 
 -- Vues utiles pour statistiques
@@ -128,21 +839,195 @@ FROM posts
 GROUP BY user_id, subreddit
 ORDER BY avg_engagement DESC;
 
--- Vue: Stats par mot-clé
-CREATE OR REPLACE VIEW v_keyword_stats AS
+-- Vue: Stats par mot-clé (un post compte pour chacun de ses mots-clés)
+DROP VIEW IF EXISTS v_keyword_stats;
+CREATE VIEW v_keyword_stats AS
 SELECT 
-    user_id,
-    matched_keywords,
+    p.user_id,
+    k.keyword,
     COUNT(*) as total_posts,
-    AVG(score) as avg_score,
-    AVG(engagement_score) as avg_engagement
-FROM posts
-WHERE matched_keywords IS NOT NULL
-GROUP BY user_id, matched_keywords
+    AVG(p.score) as avg_score,
+    AVG(p.engagement_score) as avg_engagement
+FROM posts p, unnest(p.keywords) AS k(keyword)
+GROUP BY p.user_id, k.keyword
 ORDER BY avg_engagement DESC;
 
 -- =====================================================
 
+-- Fonctions RPC d'agrégation (appelées via client.rpc)
+-- Versions paramétrées (utilisateur + fenêtre) des vues ci-dessus :
+-- seules quelques lignes agrégées transitent vers l'application
+
+-- Function: Stats globales pour la page d'accueil
+CREATE OR REPLACE FUNCTION get_user_stats(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 7,
+    p_top INTEGER DEFAULT 5
+)
+RETURNS JSONB AS $$
+    WITH window_posts AS (
+        SELECT subreddit, engagement_score
+        FROM posts
+        WHERE user_id = p_user_id
+        AND post_date >= NOW() - make_interval(days => p_days)
+    ),
+    top_subreddits AS (
+        SELECT subreddit, COUNT(*) AS total_posts
+        FROM window_posts
+        GROUP BY subreddit
+        ORDER BY total_posts DESC, subreddit
+        LIMIT p_top
+    )
+    SELECT jsonb_build_object(
+        'total_posts', (SELECT COUNT(*) FROM window_posts),
+        'avg_engagement', COALESCE((SELECT AVG(engagement_score) FROM window_posts), 0),
+        'top_subreddits', COALESCE(
+            (SELECT jsonb_agg(
+                jsonb_build_object('subreddit', subreddit, 'total_posts', total_posts)
+                ORDER BY total_posts DESC, subreddit
+            ) FROM top_subreddits),
+            '[]'::jsonb
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Function: Stats par subreddit sur une fenêtre (cf. v_subreddit_stats)
+CREATE OR REPLACE FUNCTION get_subreddit_stats(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 7,
+    p_subreddit TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    subreddit TEXT,
+    total_posts BIGINT,
+    avg_score DOUBLE PRECISION,
+    avg_comments DOUBLE PRECISION,
+    avg_engagement DOUBLE PRECISION,
+    last_post_date TIMESTAMPTZ
+) AS $$
+    SELECT
+        p.subreddit,
+        COUNT(*),
+        AVG(p.score)::DOUBLE PRECISION,
+        AVG(p.num_comments)::DOUBLE PRECISION,
+        AVG(p.engagement_score)::DOUBLE PRECISION,
+        MAX(p.post_date)
+    FROM posts p
+    WHERE p.user_id = p_user_id
+    AND p.post_date >= NOW() - make_interval(days => p_days)
+    AND (p_subreddit IS NULL OR p.subreddit = p_subreddit)
+    GROUP BY p.subreddit
+    ORDER BY 5 DESC;
+$$ LANGUAGE sql STABLE;
+
+-- Function: Stats par mot-clé sur une fenêtre (cf. v_keyword_stats)
+CREATE OR REPLACE FUNCTION get_keyword_stats(
+    p_user_id TEXT,
+    p_days INTEGER DEFAULT 7,
+    p_subreddit TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    keyword TEXT,
+    total_posts BIGINT,
+    avg_score DOUBLE PRECISION,
+    avg_engagement DOUBLE PRECISION
+) AS $$
+    SELECT
+        k.keyword,
+        COUNT(*),
+        AVG(p.score)::DOUBLE PRECISION,
+        AVG(p.engagement_score)::DOUBLE PRECISION
+    FROM posts p, unnest(p.keywords) AS k(keyword)
+    WHERE p.user_id = p_user_id
+    AND p.post_date >= NOW() - make_interval(days => p_days)
+    AND (p_subreddit IS NULL OR p.subreddit = p_subreddit)
+    GROUP BY k.keyword
+    ORDER BY 4 DESC;
+$$ LANGUAGE sql STABLE;
+
+-- Function: Recherche plein texte classée, avec surlignage et pagination
+-- ts_headline n'est calculé (et le contenu lu dans post_bodies) que pour
+-- les lignes de la page demandée. Les critères p_subreddit à p_keyword sont
+-- ceux de FilterSpec (utils/filters.py, rpc_params), neutres par défaut.
+DROP FUNCTION IF EXISTS search_posts(TEXT, TEXT, INTEGER, TEXT, INTEGER, INTEGER);
+CREATE OR REPLACE FUNCTION search_posts(
+    p_user_id TEXT,
+    p_query TEXT,
+    p_days INTEGER DEFAULT 30,
+    p_subreddit TEXT DEFAULT NULL,
+    p_min_score INTEGER DEFAULT 0,
+    p_min_comments INTEGER DEFAULT 0,
+    p_since TIMESTAMPTZ DEFAULT NULL,
+    p_exclude_nsfw BOOLEAN DEFAULT FALSE,
+    p_exclude_subreddits TEXT[] DEFAULT NULL,
+    p_keyword TEXT DEFAULT NULL,
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    id BIGINT,
+    post_id TEXT,
+    title TEXT,
+    author TEXT,
+    subreddit TEXT,
+    url TEXT,
+    post_date TIMESTAMPTZ,
+    score INTEGER,
+    upvote_ratio DECIMAL,
+    num_comments INTEGER,
+    awards INTEGER,
+    is_nsfw BOOLEAN,
+    matched_keywords TEXT,
+    engagement_score DECIMAL,
+    content_preview TEXT,
+    cluster_id TEXT,
+    sentiment DECIMAL,
+    title_highlight TEXT,
+    content_highlight TEXT,
+    rank REAL,
+    total_count BIGINT
+) AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('english', p_query) AS query
+    ),
+    matches AS (
+        SELECT
+            p.*,
+            ts_rank_cd(p.search_vector, q.query) AS rank,
+            COUNT(*) OVER () AS total_count
+        FROM posts p, q
+        WHERE p.user_id = p_user_id
+        AND p.post_date >= NOW() - make_interval(days => p_days)
+        AND (p_subreddit IS NULL OR p.subreddit = p_subreddit)
+        AND (p_min_score <= 0 OR p.score >= p_min_score)
+        AND (p_min_comments <= 0 OR p.num_comments >= p_min_comments)
+        AND (p_since IS NULL OR p.post_date >= p_since)
+        AND (NOT p_exclude_nsfw OR p.is_nsfw IS NOT TRUE)
+        AND (p_exclude_subreddits IS NULL OR lower(p.subreddit) <> ALL (p_exclude_subreddits))
+        AND (p_keyword IS NULL OR p.keywords @> ARRAY[p_keyword])
+        AND p.search_vector @@ q.query
+        ORDER BY rank DESC, p.id DESC
+        LIMIT p_limit OFFSET p_offset
+    )
+    SELECT
+        m.id, m.post_id, m.title, m.author, m.subreddit, m.url, m.post_date,
+        m.score, m.upvote_ratio, m.num_comments, m.awards, m.is_nsfw,
+        m.matched_keywords, m.engagement_score, m.content_preview,
+        m.cluster_id, m.sentiment,
+        ts_headline('english', m.title, q.query,
+            'StartSel=**, StopSel=**, HighlightAll=true'),
+        NULLIF(ts_headline('english', coalesce(b.content, ''), q.query,
+            'StartSel=**, StopSel=**, MaxWords=30, MinWords=10'), ''),
+        m.rank,
+        m.total_count
+    FROM matches m
+    CROSS JOIN q
+    LEFT JOIN post_bodies b ON b.post_id = m.post_id AND b.post_date = m.post_date
+    ORDER BY m.rank DESC, m.id DESC;
+$$ LANGUAGE sql STABLE;
+
+-- =====================================================
+
 -- Données de test (optionnel)
 -- Décommentez pour insérer des exemples
 
@@ -0,0 +1,354 @@
+-- =====================================================
+-- SCHEMA SQL POUR REDDIT MONITOR (SQLite embarqué)
+-- =====================================================
+-- Équivalent local de database_schema.sql, appliqué automatiquement
+-- par utils/sqlite_storage.py à l'ouverture de la base
+-- Nécessite SQLite 3.35+ (JSON1, FTS5, UPSERT, fonctions de fenêtrage)
+-- =====================================================
+
+PRAGMA journal_mode = WAL;
+
+-- Table: keywords
+CREATE TABLE IF NOT EXISTS keywords (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    keyword TEXT NOT NULL,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(keyword, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_keywords_user ON keywords(user_id, active);
+
+-- =====================================================
+
+-- Table: subreddits
+CREATE TABLE IF NOT EXISTS subreddits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subreddit TEXT NOT NULL,
+    list_type TEXT NOT NULL CHECK (list_type IN ('whitelist', 'blacklist')),
+    user_id TEXT NOT NULL DEFAULT 'default',
+    active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(subreddit, user_id, list_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_subreddits_user ON subreddits(user_id, list_type, active);
+
+-- =====================================================
+
+-- Table: posts
+-- Dates au format ISO 8601 (comparaisons lexicographiques)
+-- keywords : tableau JSON, indexé via la table post_keywords
+-- Le contenu complet est dans post_bodies (seul l'aperçu reste ici)
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    title TEXT NOT NULL,
+    content_preview TEXT,
+    author TEXT,
+    subreddit TEXT NOT NULL,
+    url TEXT NOT NULL,
+    post_date TEXT NOT NULL,
+    score INTEGER DEFAULT 0,
+    upvote_ratio REAL DEFAULT 0.5,
+    num_comments INTEGER DEFAULT 0,
+    awards INTEGER DEFAULT 0,
+    is_nsfw INTEGER DEFAULT 0,
+    matched_keywords TEXT,
+    keywords TEXT NOT NULL DEFAULT '[]',
+    age_hours REAL,
+    engagement_score REAL DEFAULT 0,
+    cluster_id TEXT,
+    sentiment REAL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Index composites pour le tri et la pagination keyset (get_posts)
+CREATE INDEX IF NOT EXISTS idx_posts_user_date ON posts(user_id, post_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_engagement ON posts(user_id, engagement_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_score ON posts(user_id, score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_user_comments ON posts(user_id, num_comments DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_subreddit ON posts(user_id, subreddit);
+CREATE INDEX IF NOT EXISTS idx_posts_cluster ON posts(user_id, cluster_id);
+
+-- Table: post_keywords (équivalent de l'index GIN sur posts.keywords)
+CREATE TABLE IF NOT EXISTS post_keywords (
+    post_id TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (keyword, post_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS posts_keywords_insert AFTER INSERT ON posts BEGIN
+    INSERT OR IGNORE INTO post_keywords (post_id, keyword)
+    SELECT NEW.post_id, value FROM json_each(NEW.keywords);
+END;
+
+CREATE TRIGGER IF NOT EXISTS posts_keywords_update AFTER UPDATE OF keywords ON posts BEGIN
+    DELETE FROM post_keywords WHERE post_id = OLD.post_id;
+    INSERT OR IGNORE INTO post_keywords (post_id, keyword)
+    SELECT NEW.post_id, value FROM json_each(NEW.keywords);
+END;
+
+CREATE TRIGGER IF NOT EXISTS posts_keywords_delete AFTER DELETE ON posts BEGIN
+    DELETE FROM post_keywords WHERE post_id = OLD.post_id;
+END;
+
+-- Table: post_bodies
+-- Contenu complet des posts, compressé (zlib) par utils/sqlite_storage.py
+-- et lu uniquement à la demande (aperçu, export, archivage)
+CREATE TABLE IF NOT EXISTS post_bodies (
+    post_id TEXT PRIMARY KEY,
+    content BLOB NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS posts_bodies_delete AFTER DELETE ON posts BEGIN
+    DELETE FROM post_bodies WHERE post_id = OLD.post_id;
+END;
+
+-- Table: post_signatures (signatures MinHash, voir utils/dedup.py)
+-- post_lsh_bands remplace l'index GIN sur bands de database_schema.sql
+CREATE TABLE IF NOT EXISTS post_signatures (
+    post_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    cluster_id TEXT NOT NULL,
+    signature TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS post_lsh_bands (
+    user_id TEXT NOT NULL,
+    band_key TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, band_key, post_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_post_lsh_bands_post ON post_lsh_bands(post_id);
+
+CREATE TRIGGER IF NOT EXISTS posts_signatures_delete AFTER DELETE ON posts BEGIN
+    DELETE FROM post_signatures WHERE post_id = OLD.post_id;
+    DELETE FROM post_lsh_bands WHERE post_id = OLD.post_id;
+END;
+
+-- Source de l'index plein texte : titre + contenu décompressé
+-- (body_text est enregistrée sur chaque connexion par sqlite_storage.py)
+CREATE VIEW IF NOT EXISTS posts_search_source AS
+SELECT p.id, p.title, body_text(b.content) AS content
+FROM posts p
+LEFT JOIN post_bodies b ON b.post_id = p.post_id;
+
+-- Recherche plein texte (équivalent de search_vector + index GIN)
+-- Alimentée par save_posts (le contenu n'étant pas dans posts, pas de
+-- trigger d'insertion) ; les suppressions passent par le trigger ci-dessous
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    title,
+    content,
+    content = 'posts_search_source',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS posts_fts_delete BEFORE DELETE ON posts BEGIN
+    INSERT INTO posts_fts (posts_fts, rowid, title, content)
+    SELECT 'delete', id, title, content FROM posts_search_source WHERE id = OLD.id;
+END;
+
+-- =====================================================
+
+-- Agrégats journaliers (équivalent des tables rollup_* de database_schema.sql)
+-- Maintenus par triggers ; pas de trigger de suppression, les agrégats
+-- survivent à la rétention des posts bruts. Posts positifs / négatifs :
+-- sentiment >= 0.05 / <= -0.05 (mêmes seuils que utils/sentiment.py)
+CREATE TABLE IF NOT EXISTS rollup_daily_subreddit (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    comments_sum INTEGER NOT NULL DEFAULT 0,
+    engagement_sum REAL NOT NULL DEFAULT 0,
+    sentiment_sum REAL NOT NULL DEFAULT 0,
+    positive_posts INTEGER NOT NULL DEFAULT 0,
+    negative_posts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, subreddit)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_daily_keyword (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    engagement_sum REAL NOT NULL DEFAULT 0,
+    sentiment_sum REAL NOT NULL DEFAULT 0,
+    positive_posts INTEGER NOT NULL DEFAULT 0,
+    negative_posts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, subreddit, keyword)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, hour)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS posts_rollups_insert AFTER INSERT ON posts BEGIN
+    INSERT INTO rollup_daily_subreddit (user_id, day, subreddit, posts, score_sum, comments_sum, engagement_sum,
+        sentiment_sum, positive_posts, negative_posts)
+    VALUES (NEW.user_id, substr(NEW.post_date, 1, 10), NEW.subreddit, 1,
+        coalesce(NEW.score, 0), coalesce(NEW.num_comments, 0), coalesce(NEW.engagement_score, 0),
+        coalesce(NEW.sentiment, 0), coalesce(NEW.sentiment >= 0.05, 0), coalesce(NEW.sentiment <= -0.05, 0))
+    ON CONFLICT DO UPDATE SET
+        posts = posts + excluded.posts,
+        score_sum = score_sum + excluded.score_sum,
+        comments_sum = comments_sum + excluded.comments_sum,
+        engagement_sum = engagement_sum + excluded.engagement_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        positive_posts = positive_posts + excluded.positive_posts,
+        negative_posts = negative_posts + excluded.negative_posts;
+
+    INSERT INTO rollup_daily_keyword (user_id, day, subreddit, keyword, posts, score_sum, engagement_sum,
+        sentiment_sum, positive_posts, negative_posts)
+    SELECT NEW.user_id, substr(NEW.post_date, 1, 10), NEW.subreddit, value, 1,
+        coalesce(NEW.score, 0), coalesce(NEW.engagement_score, 0),
+        coalesce(NEW.sentiment, 0), coalesce(NEW.sentiment >= 0.05, 0), coalesce(NEW.sentiment <= -0.05, 0)
+    FROM json_each(NEW.keywords) WHERE true
+    ON CONFLICT DO UPDATE SET
+        posts = posts + excluded.posts,
+        score_sum = score_sum + excluded.score_sum,
+        engagement_sum = engagement_sum + excluded.engagement_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        positive_posts = positive_posts + excluded.positive_posts,
+        negative_posts = negative_posts + excluded.negative_posts;
+
+    INSERT INTO rollup_hourly (user_id, day, hour, posts)
+    VALUES (NEW.user_id, substr(NEW.post_date, 1, 10), CAST(substr(NEW.post_date, 12, 2) AS INTEGER), 1)
+    ON CONFLICT DO UPDATE SET posts = posts + excluded.posts;
+END;
+
+-- Post re-scanné : retiré avec ses anciennes valeurs puis ré-ajouté
+CREATE TRIGGER IF NOT EXISTS posts_rollups_update AFTER UPDATE ON posts BEGIN
+    INSERT INTO rollup_daily_subreddit (user_id, day, subreddit, posts, score_sum, comments_sum, engagement_sum,
+        sentiment_sum, positive_posts, negative_posts)
+    VALUES (OLD.user_id, substr(OLD.post_date, 1, 10), OLD.subreddit, -1,
+        -coalesce(OLD.score, 0), -coalesce(OLD.num_comments, 0), -coalesce(OLD.engagement_score, 0),
+        -coalesce(OLD.sentiment, 0), -coalesce(OLD.sentiment >= 0.05, 0), -coalesce(OLD.sentiment <= -0.05, 0))
+    ON CONFLICT DO UPDATE SET
+        posts = posts + excluded.posts,
+        score_sum = score_sum + excluded.score_sum,
+        comments_sum = comments_sum + excluded.comments_sum,
+        engagement_sum = engagement_sum + excluded.engagement_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        positive_posts = positive_posts + excluded.positive_posts,
+        negative_posts = negative_posts + excluded.negative_posts;
+
+    INSERT INTO rollup_daily_subreddit (user_id, day, subreddit, posts, score_sum, comments_sum, engagement_sum,
+        sentiment_sum, positive_posts, negative_posts)
+    VALUES (NEW.user_id, substr(NEW.post_date, 1, 10), NEW.subreddit, 1,
+        coalesce(NEW.score, 0), coalesce(NEW.num_comments, 0), coalesce(NEW.engagement_score, 0),
+        coalesce(NEW.sentiment, 0), coalesce(NEW.sentiment >= 0.05, 0), coalesce(NEW.sentiment <= -0.05, 0))
+    ON CONFLICT DO UPDATE SET
+        posts = posts + excluded.posts,
+        score_sum = score_sum + excluded.score_sum,
+        comments_sum = comments_sum + excluded.comments_sum,
+        engagement_sum = engagement_sum + excluded.engagement_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        positive_posts = positive_posts + excluded.positive_posts,
+        negative_posts = negative_posts + excluded.negative_posts;
+
+    INSERT INTO rollup_daily_keyword (user_id, day, subreddit, keyword, posts, score_sum, engagement_sum,
+        sentiment_sum, positive_posts, negative_posts)
+    SELECT OLD.user_id, substr(OLD.post_date, 1, 10), OLD.subreddit, value, -1,
+        -coalesce(OLD.score, 0), -coalesce(OLD.engagement_score, 0),
+        -coalesce(OLD.sentiment, 0), -coalesce(OLD.sentiment >= 0.05, 0), -coalesce(OLD.sentiment <= -0.05, 0)
+    FROM json_each(OLD.keywords) WHERE true
+    ON CONFLICT DO UPDATE SET
+        posts = posts + excluded.posts,
+        score_sum = score_sum + excluded.score_sum,
+        engagement_sum = engagement_sum + excluded.engagement_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        positive_posts = positive_posts + excluded.positive_posts,
+        negative_posts = negative_posts + excluded.negative_posts;
+
+    INSERT INTO rollup_daily_keyword (user_id, day, subreddit, keyword, posts, score_sum, engagement_sum,
+        sentiment_sum, positive_posts, negative_posts)
+    SELECT NEW.user_id, substr(NEW.post_date, 1, 10), NEW.subreddit, value, 1,
+        coalesce(NEW.score, 0), coalesce(NEW.engagement_score, 0),
+        coalesce(NEW.sentiment, 0), coalesce(NEW.sentiment >= 0.05, 0), coalesce(NEW.sentiment <= -0.05, 0)
+    FROM json_each(NEW.keywords) WHERE true
+    ON CONFLICT DO UPDATE SET
+        posts = posts + excluded.posts,
+        score_sum = score_sum + excluded.score_sum,
+        engagement_sum = engagement_sum + excluded.engagement_sum,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        positive_posts = positive_posts + excluded.positive_posts,
+        negative_posts = negative_posts + excluded.negative_posts;
+
+    -- Heure inchangée tant que post_date ne change pas
+    INSERT INTO rollup_hourly (user_id, day, hour, posts)
+    SELECT OLD.user_id, substr(OLD.post_date, 1, 10), CAST(substr(OLD.post_date, 12, 2) AS INTEGER), -1
+    WHERE OLD.post_date IS NOT NEW.post_date
+    ON CONFLICT DO UPDATE SET posts = posts + excluded.posts;
+
+    INSERT INTO rollup_hourly (user_id, day, hour, posts)
+    SELECT NEW.user_id, substr(NEW.post_date, 1, 10), CAST(substr(NEW.post_date, 12, 2) AS INTEGER), 1
+    WHERE OLD.post_date IS NOT NEW.post_date
+    ON CONFLICT DO UPDATE SET posts = posts + excluded.posts;
+END;
+
+-- Sketches journaliers (HyperLogLog auteurs/subreddits, DDSketch score/engagement,
+-- voir utils/sketches.py) : reconstruits par l'application pour les jours
+-- touchés par un scan ou un recalcul, conservés au-delà de la rétention
+CREATE TABLE IF NOT EXISTS rollup_daily_sketches (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    authors_hll TEXT,
+    subreddits_hll TEXT,
+    score_sketch TEXT,
+    engagement_sketch TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+
+-- État incrémental de la fouille des termes associés aux mots-clés
+-- (voir utils/keyword_mining.py), une ligne par utilisateur
+CREATE TABLE IF NOT EXISTS keyword_mining (
+    user_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Classement des subreddits candidats (voir utils/discovery.py), recalculé
+-- depuis les agrégats pour les subreddits touchés par chaque scan
+CREATE TABLE IF NOT EXISTS subreddit_discovery (
+    user_id TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0,
+    keyword_hits INTEGER NOT NULL DEFAULT 0,
+    keywords_matched INTEGER NOT NULL DEFAULT 0,
+    engagement_sum REAL NOT NULL DEFAULT 0,
+    decayed_hits REAL NOT NULL DEFAULT 0,
+    last_day TEXT,
+    as_of TEXT NOT NULL,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, subreddit)
+) WITHOUT ROWID;
+
+-- =====================================================
+
+-- Table: user_configs
+-- engagement_weights : objet JSON
+-- engagement_formula : formule personnalisée (utils/formula.py), NULL = formule par défaut
+CREATE TABLE IF NOT EXISTS user_configs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL UNIQUE,
+    engagement_weights TEXT DEFAULT '{"upvotes": 1.0, "comments": 2.0, "awards": 5.0, "upvote_ratio": 10.0}',
+    engagement_formula TEXT,
+    telegram_chat_id TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
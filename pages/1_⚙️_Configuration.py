@@ -2,11 +2,15 @@
 Page Configuration - Gestion des mots-clés, subreddits et paramètres
 """
 import streamlit as st
+import pandas as pd
 from utils.database import (
     add_keyword, get_keywords, delete_keyword,
     add_subreddit, get_subreddits, delete_subreddit,
-    get_user_config, update_user_config
+    get_user_config, update_user_config, rescore_user_posts, get_score_matrix,
+    get_keyword_miner, get_subreddit_candidates, backfill_sentiment
 )
+from utils.analyzer import rank_with_weights, score_posts_frame, top_k_indices
+from utils.formula import DEFAULT_FORMULA, VARIABLES, FUNCTIONS, validate_formula
 
 st.set_page_config(page_title="Configuration", page_icon="⚙️", layout="wide")
 
@@ -84,6 +88,46 @@ with tab1:
                             st.rerun()
     else:
         st.warning("⚠️ Aucun mot-clé configuré. Ajoutez-en pour commencer!")
+    
+    st.divider()
+    
+    # Suggestions issues des titres collectés (état incrémental, mis à jour à chaque scan)
+    st.subheader("💡 Suggestions")
+    miner = get_keyword_miner(user_id)
+    
+    if miner is None or not miner.total_posts:
+        st.info("Les suggestions apparaîtront après les premiers scans.")
+    else:
+        suggestions = miner.suggestions(keywords, limit=12)
+        
+        if suggestions:
+            st.caption(
+                "Termes fréquents des titres récents, absents de vos mots-clés "
+                "(mot-clé le plus associé et part des posts du terme qui le contiennent)"
+            )
+            cols = st.columns(4)
+            for i, suggestion in enumerate(suggestions):
+                with cols[i % 4]:
+                    related = (
+                        f"avec **{suggestion['keyword']}** ({suggestion['share']:.0%})"
+                        if suggestion["keyword"] else "sans mot-clé associé"
+                    )
+                    st.markdown(f"**{suggestion['term']}** · ~{suggestion['count']:.0f} posts  \n{related}")
+                    if st.button("➕ Ajouter", key=f"add_sugg_{suggestion['term']}", use_container_width=True):
+                        if add_keyword(suggestion["term"], user_id):
+                            st.success(f"✅ Mot-clé '{suggestion['term']}' ajouté!")
+                            st.rerun()
+        else:
+            st.info("Aucun terme fréquent hors de vos mots-clés pour l'instant.")
+        
+        redundant = miner.redundant_pairs(keywords)
+        if redundant:
+            st.markdown("**🔁 Mots-clés redondants** (trouvent presque toujours les mêmes posts)")
+            for pair in redundant:
+                st.markdown(
+                    f"- **{pair['keyword_a']}** / **{pair['keyword_b']}** : "
+                    f"{pair['overlap']:.0%} de recouvrement (~{pair['together']:.0f} posts communs)"
+                )
 
 # ============= TAB 2: SUBREDDITS =============
 with tab2:
@@ -175,6 +219,40 @@ with tab2:
                             st.rerun()
         else:
             st.caption("Aucun subreddit exclu")
+    
+    st.divider()
+    
+    # Candidats classés depuis les agrégats des scans (mis à jour à chaque scan)
+    st.subheader("🧭 Subreddits découverts")
+    candidates = get_subreddit_candidates(user_id, limit=15)
+    
+    if candidates.empty:
+        st.info("Le classement apparaîtra après les premiers scans.")
+    else:
+        st.caption(
+            "Classés par occurrences récentes de vos mots-clés, occurrences par post "
+            "et engagement moyen (90 derniers jours)"
+        )
+        for _, candidate in candidates.iterrows():
+            col_sr, col_stats, col_w, col_b = st.columns([2, 4, 1, 1])
+            with col_sr:
+                st.markdown(f"**[r/{candidate['subreddit']}](https://reddit.com/r/{candidate['subreddit']})**")
+            with col_stats:
+                st.caption(
+                    f"~{candidate['recent_hits']:.0f} occurrences récentes · "
+                    f"{candidate['hit_rate']:.2f} mot-clé/post · "
+                    f"{candidate['keywords_matched']} mots-clés · "
+                    f"engagement moyen {candidate['engagement_per_post']:.0f} · "
+                    f"dernier post {candidate['last_day']}"
+                )
+            with col_w:
+                if st.button("✅", key=f"disc_w_{candidate['subreddit']}", help="Ajouter à la whitelist"):
+                    if add_subreddit(candidate["subreddit"], "whitelist", user_id):
+                        st.rerun()
+            with col_b:
+                if st.button("🚫", key=f"disc_b_{candidate['subreddit']}", help="Ajouter à la blacklist"):
+                    if add_subreddit(candidate["subreddit"], "blacklist", user_id):
+                        st.rerun()
 
 # ============= TAB 3: SCORING =============
 with tab3:
@@ -202,6 +280,7 @@ with tab3:
         "awards": 5.0,
         "upvote_ratio": 10.0
     })
+    current_formula = config.get("engagement_formula") or ""
     
     st.subheader("⚖️ Poids des métriques")
     
@@ -245,6 +324,31 @@ with tab3:
             help="Importance du ratio upvote/downvote"
         )
     
+    slider_weights = {
+        "upvotes": weight_upvotes,
+        "comments": weight_comments,
+        "awards": weight_awards,
+        "upvote_ratio": weight_ratio
+    }
+    
+    # Formule personnalisée : validée (liste blanche) et compilée une fois, sans eval
+    st.subheader("🧪 Formule personnalisée")
+    engagement_formula = st.text_area(
+        "Formule (vide = formule par défaut)",
+        value=current_formula,
+        placeholder="log1p(score) * w1 + comments / max(age, 1) ^ 1.5",
+        help=f"Formule par défaut : {DEFAULT_FORMULA}"
+    ).strip()
+    st.caption(
+        f"Variables : {', '.join(f'`{name}`' for name in VARIABLES)} · "
+        f"Fonctions : {', '.join(f'`{name}`' for name in FUNCTIONS)} · "
+        "Opérateurs : `+ - * / % < > == and or`, puissance `^` ou `**`, `a if condition else b`"
+    )
+    
+    formula_error = validate_formula(engagement_formula) if engagement_formula else None
+    if formula_error:
+        st.error(f"❌ {formula_error}")
+    
     st.divider()
     
     # Exemple de calcul
@@ -274,22 +378,147 @@ with tab3:
     **→ Score d'engagement: `{example_score:.1f}`**
     """)
     
+    if engagement_formula and not formula_error:
+        example_formula_score = score_posts_frame([{
+            "score": example_post["upvotes"],
+            "num_comments": example_post["comments"],
+            "awards": example_post["awards"],
+            "upvote_ratio": example_post["upvote_ratio"],
+            "age_hours": 12
+        }], slider_weights, engagement_formula)[0]
+        st.markdown(f"**→ Avec la formule personnalisée (post de 12h): `{example_formula_score:.1f}`**")
+    
+    st.divider()
+    
+    # Simulation sur les posts réels : classement recalculé à chaque modification
+    st.subheader("🔮 Impact sur le classement")
+    
+    col_w1, col_w2 = st.columns([1, 3])
+    
+    with col_w1:
+        what_if_days = st.selectbox(
+            "Posts des",
+            [7, 30],
+            index=1,
+            format_func=lambda x: f"{x} derniers jours",
+            key="what_if_days"
+        )
+    
+    # Composantes mises en cache : chaque simulation = un produit matrice-vecteur + top 20
+    what_if_posts, score_matrix = get_score_matrix(user_id, days=what_if_days)
+    
+    if what_if_posts.empty:
+        st.info("Aucun post sur la période : lancez un scan pour simuler le classement.")
+    else:
+        def simulate_ranking(weights: dict, formula: str):
+            # Formule personnalisée : composantes brutes scorées en une passe vectorisée
+            if formula:
+                scores = score_posts_frame(what_if_posts, weights, formula)
+                top = top_k_indices(scores, 20)
+                return top, scores[top]
+            return rank_with_weights(score_matrix, weights, k=20)
+        
+        new_top, new_scores = simulate_ranking(
+            slider_weights, current_formula if formula_error else engagement_formula
+        )
+        old_top, _ = simulate_ranking(current_weights, current_formula)
+        old_ranks = {int(idx): rank for rank, idx in enumerate(old_top, start=1)}
+        
+        def rank_change(idx: int, rank: int) -> str:
+            if idx not in old_ranks:
+                return "🆕"
+            delta = old_ranks[idx] - rank
+            if delta > 0:
+                return f"⬆️ +{delta}"
+            if delta < 0:
+                return f"⬇️ {delta}"
+            return "="
+        
+        top_df = what_if_posts.iloc[new_top].reset_index(drop=True)
+        
+        with col_w2:
+            entered = sum(1 for idx in new_top if int(idx) not in old_ranks)
+            st.caption(
+                f"Top 20 parmi {len(what_if_posts)} posts avec les poids et la formule ci-dessus · "
+                f"{entered} nouveau(x) par rapport à la configuration enregistrée"
+            )
+        
+        st.dataframe(
+            pd.DataFrame({
+                "#": range(1, len(top_df) + 1),
+                "Évolution": [rank_change(int(idx), rank) for rank, idx in enumerate(new_top, start=1)],
+                "Titre": top_df["title"],
+                "Subreddit": top_df["subreddit"],
+                "Engagement": new_scores.round(1)
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+    
     # Sauvegarde
-    if st.button("💾 Sauvegarder configuration", type="primary", use_container_width=True):
+    if st.button(
+        "💾 Sauvegarder configuration",
+        type="primary",
+        use_container_width=True,
+        disabled=bool(formula_error)
+    ):
+        new_weights = slider_weights
         new_config = {
-            "engagement_weights": {
-                "upvotes": weight_upvotes,
-                "comments": weight_comments,
-                "awards": weight_awards,
-                "upvote_ratio": weight_ratio
-            }
+            "engagement_weights": new_weights,
+            "engagement_formula": engagement_formula or None
         }
         
         if update_user_config(user_id, new_config):
             st.success("✅ Configuration sauvegardée!")
+            
+            # Les posts déjà collectés sont recalculés avec les nouveaux poids / la nouvelle formule
+            if new_weights != current_weights or engagement_formula != current_formula:
+                progress_bar = st.progress(0.0, text="Recalcul des scores d'engagement...")
+                
+                def show_progress(done: int, total: int):
+                    progress_bar.progress(
+                        done / total if total else 1.0,
+                        text=f"Recalcul des scores d'engagement... {done}/{total} posts"
+                    )
+                
+                updated = rescore_user_posts(
+                    user_id, new_weights, progress_callback=show_progress, formula=engagement_formula
+                )
+                progress_bar.empty()
+                
+                if updated is not None:
+                    st.success(f"🔄 {updated} posts recalculés avec la nouvelle configuration")
+            
             st.balloons()
         else:
             st.error("❌ Erreur lors de la sauvegarde")
+    
+    st.divider()
+    
+    # Sentiment des posts collectés avant l'analyse (ou après une modification du lexique)
+    st.subheader("😊 Sentiment des posts")
+    st.caption(
+        "Calculé localement à chaque scan (lexique anglais / français, titre et contenu). "
+        "Les posts plus anciens peuvent être analysés ici."
+    )
+    rescore_all = st.checkbox("Recalculer aussi les posts déjà analysés", value=False)
+    
+    if st.button("🧮 Analyser le sentiment", use_container_width=True):
+        progress_bar = st.progress(0.0, text="Analyse du sentiment...")
+        
+        def show_sentiment_progress(done: int, total: int):
+            progress_bar.progress(
+                done / total if total else 1.0,
+                text=f"Analyse du sentiment... {done}/{total} posts"
+            )
+        
+        updated = backfill_sentiment(
+            user_id, missing_only=not rescore_all, progress_callback=show_sentiment_progress
+        )
+        progress_bar.empty()
+        
+        if updated is not None:
+            st.success(f"😊 Sentiment mis à jour pour {updated} posts")
 
 # Footer
 st.divider()
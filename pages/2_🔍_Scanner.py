@@ -7,9 +7,13 @@ Page Scanner - Lancement de la collecte de posts Reddit (VERSION SCRAPING)
 - Risque de ban si usage excessif
 """
 import streamlit as st
-from utils.database import get_keywords, get_subreddits, save_posts, get_user_config
+from utils.database import get_keywords, get_subreddits, save_posts, get_user_config, get_daily_rollups
 from utils.reddit_scraper import scan_keywords_batch, test_reddit_connection
-from utils.analyzer import enrich_posts_with_engagement, generate_summary_stats
+from utils.analyzer import generate_summary_stats, TopK, top_k
+from utils.sentiment import enrich_posts_with_sentiment, sentiment_label
+from utils.trends import TrendDetector
+from utils.filters import FilterSpec
+from config.settings import TREND_BASELINE_DAYS
 from datetime import datetime
 import time
 
@@ -129,17 +133,64 @@ if scan_button:
     # Conteneurs pour l'affichage
     progress_bar = st.progress(0)
     status_text = st.empty()
+    trends_container = st.empty()
     stats_container = st.empty()
     
     # Timer
     start_time = time.time()
     
+    engagement_weights = user_config.get("engagement_weights", {
+        "upvotes": 1.0,
+        "comments": 2.0,
+        "awards": 5.0,
+        "upvote_ratio": 10.0
+    })
+    engagement_formula = user_config.get("engagement_formula")
+    
+    # Classement en direct : top 10 mis à jour à chaque lot, sans retrier les posts déjà vus
+    live_top = TopK(10, unique_key="post_id")
+    
+    # Détection de pics : référence lue dans les agrégats journaliers, débits mis à jour à chaque post
+    trends = TrendDetector()
+    for dimension in ("keyword", "subreddit"):
+        trends.seed(get_daily_rollups(user_id=user_id, days=TREND_BASELINE_DAYS, dimension=dimension), dimension)
+    
+    def render_trend_alerts():
+        with trends_container.container():
+            st.markdown("**🚨 Pics d'activité détectés**")
+            for alert in trends.alerts():
+                label = f"r/{alert['name']}" if alert["dimension"] == "subreddit" else f"`{alert['name']}`"
+                st.markdown(
+                    f"- {label} : ~{alert['rate']:.0f} posts/jour "
+                    f"(habituel {alert['baseline']:.1f}, z = {alert['zscore']:.1f})"
+                )
+    
     # Callback pour mise à jour progression
     def update_progress(current, total, keyword):
         progress = int((current / total) * 100)
         progress_bar.progress(progress)
         status_text.markdown(f"**Scan en cours:** `{keyword}` ({current}/{total})")
     
+    # Filtres appliqués par le scraper à chaque lot, avant le calcul des scores
+    scan_filters = FilterSpec(min_score=min_score_filter, exclude_nsfw=exclude_nsfw)
+    
+    # Callback pour le classement en direct (lots déjà filtrés et notés par le scraper)
+    def update_leaderboard(posts):
+        if trends.extend(posts):
+            render_trend_alerts()
+        
+        entered = [live_top.push(p) for p in posts]
+        if not any(entered):
+            return
+        
+        with stats_container.container():
+            st.markdown("**🏆 Top 10 en direct**")
+            for i, post in enumerate(live_top.items(), 1):
+                st.markdown(
+                    f"{i}. [{post['title'][:80]}]({post['url']}) · "
+                    f"r/{post['subreddit']} · 📊 {post['engagement_score']:.1f}"
+                )
+    
     # Lancement du scan
     try:
         all_posts = scan_keywords_batch(
@@ -147,27 +198,23 @@ if scan_button:
             subreddits=whitelist if whitelist else None,
             blacklist=blacklist,
             time_filter=time_filter,
-            progress_callback=update_progress
+            progress_callback=update_progress,
+            posts_callback=update_leaderboard,
+            filters=scan_filters,
+            engagement_weights=engagement_weights,
+            engagement_formula=engagement_formula
         )
         
-        # Filtrage NSFW
-        if exclude_nsfw:
-            all_posts = [p for p in all_posts if not p.get("is_nsfw", False)]
-        
-        # Filtrage score minimum
-        if min_score_filter > 0:
-            all_posts = [p for p in all_posts if p.get("score", 0) >= min_score_filter]
+        # Valeurs finales des pics détectés pendant le scan
+        if trends.alerts():
+            render_trend_alerts()
         
-        # Calcul des scores d'engagement
-        status_text.markdown("**Calcul des scores d'engagement...**")
-        engagement_weights = user_config.get("engagement_weights", {
-            "upvotes": 1.0,
-            "comments": 2.0,
-            "awards": 5.0,
-            "upvote_ratio": 10.0
-        })
+        # Scores d'engagement calculés lot par lot pendant le scan
+        stats_container.empty()
         
-        all_posts = enrich_posts_with_engagement(all_posts, engagement_weights)
+        # Sentiment (lexique local, titre et contenu, par lot)
+        status_text.markdown("**Analyse du sentiment...**")
+        all_posts = enrich_posts_with_sentiment(all_posts)
         
         # Ajout du user_id
         for post in all_posts:
@@ -211,10 +258,10 @@ if scan_button:
                 
                 st.divider()
                 
-                # Top 10 posts
+                # Top 10 posts (une seule version par groupe de quasi-doublons)
                 st.subheader("🏆 Top 10 Posts")
                 
-                top_posts = sorted(all_posts, key=lambda x: x["engagement_score"], reverse=True)[:10]
+                top_posts = top_k(all_posts, 10, unique_key="cluster_id")
                 
                 for i, post in enumerate(top_posts, 1):
                     with st.expander(f"#{i} - {post['title'][:80]}..."):
@@ -224,6 +271,7 @@ if scan_button:
                             st.markdown(f"**Subreddit:** r/{post['subreddit']}")
                             st.markdown(f"**Auteur:** u/{post['author']}")
                             st.markdown(f"**Mot-clé:** {post['matched_keywords']}")
+                            st.markdown(f"**Sentiment:** {sentiment_label(post.get('sentiment'))} ({post.get('sentiment', 0):+.2f})")
                             st.markdown(f"[🔗 Voir le post]({post['url']})")
                         
                         with col_b:
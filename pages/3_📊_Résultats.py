@@ -2,8 +2,14 @@
 Page Résultats - Visualisation et filtrage des posts collectés
 """
 import streamlit as st
-from utils.database import get_posts, get_stats
-from utils.analyzer import analyze_by_subreddit, analyze_by_keyword
+from utils.database import (
+    get_keywords, get_posts, get_active_subreddits, get_post_content, get_next_cursor, search_posts,
+    get_subreddit_stats, get_keyword_stats, get_window_sketches
+)
+from utils.storage import CONTENT_PREVIEW_LENGTH
+from utils.analyzer import collapse_clusters
+from utils.filters import FilterSpec
+from utils.sentiment import sentiment_label, SENTIMENT_EMOJIS
 import pandas as pd
 from datetime import datetime
 
@@ -18,7 +24,7 @@ st.divider()
 # Paramètres de filtrage
 st.header("🔍 Filtres")
 
-col_f1, col_f2, col_f3, col_f4 = st.columns(4)
+col_f1, col_f2, col_f3, col_f4, col_f5 = st.columns(5)
 
 with col_f1:
     days_filter = st.selectbox(
@@ -30,7 +36,7 @@ with col_f1:
 
 with col_f2:
     limit_posts = st.selectbox(
-        "📊 Nombre de posts",
+        "📊 Posts par page",
         [20, 50, 100, 200, 500],
         index=2  # 100 par défaut
     )
@@ -48,26 +54,58 @@ with col_f3:
     )
 
 with col_f4:
-    # Liste dynamique des subreddits
-    all_posts_temp = get_posts(user_id, days=30, limit=1000)
-    
-    if not all_posts_temp.empty:
-        unique_subreddits = ["Tous"] + sorted(all_posts_temp["subreddit"].unique().tolist())
-    else:
-        unique_subreddits = ["Tous"]
-    
+    # Liste dynamique des subreddits (agrégats de la période, en cache)
     subreddit_filter = st.selectbox(
         "🏠 Subreddit",
-        unique_subreddits
+        ["Tous"] + get_active_subreddits(user_id, days=days_filter)
     )
 
+with col_f5:
+    keyword_filter = st.selectbox(
+        "🔑 Mot-clé",
+        ["Tous"] + get_keywords(user_id)
+    )
+
+col_f6, col_f7, col_f8 = st.columns(3)
+
+with col_f6:
+    min_score_filter = st.number_input("⬆️ Score minimum", min_value=0, value=0, step=10)
+
+with col_f7:
+    min_comments_filter = st.number_input("💬 Commentaires minimum", min_value=0, value=0, step=5)
+
+with col_f8:
+    exclude_nsfw = st.checkbox("🔞 Exclure contenu NSFW", value=False)
+
 # Récupération des données
 subreddit_param = None if subreddit_filter == "Tous" else subreddit_filter
+keyword_param = None if keyword_filter == "Tous" else keyword_filter
+
+# Tous les critères sont traduits en clauses de la requête (utils/filters.py)
+results_filters = FilterSpec(
+    min_score=min_score_filter,
+    min_comments=min_comments_filter,
+    exclude_nsfw=exclude_nsfw,
+    subreddit=subreddit_param,
+    keyword=keyword_param
+)
+
+# Pagination keyset : pile des curseurs, réinitialisée quand les filtres changent
+filters_key = (user_id, days_filter, limit_posts, sort_by, results_filters.key())
+if st.session_state.get("results_filters_key") != filters_key:
+    st.session_state.results_filters_key = filters_key
+    st.session_state.results_cursors = [None]
+
+page_number = len(st.session_state.results_cursors)
+
 posts_df = get_posts(
     user_id=user_id,
     days=days_filter,
     limit=limit_posts,
-    subreddit=subreddit_param
+    filters=results_filters,
+    columns="list",
+    sort_by=sort_by,
+    cursor=st.session_state.results_cursors[-1]
 )
 
 st.divider()
@@ -77,9 +115,6 @@ if posts_df.empty:
     st.warning("⚠️ **Aucun post trouvé.** Lancez un scan dans la section Scanner.")
     st.stop()
 
-# Tri des données
-posts_df = posts_df.sort_values(by=sort_by, ascending=False)
-
 # Stats globales
 st.header("📈 Statistiques globales")
 
@@ -98,7 +133,16 @@ with col_s4:
     st.metric("📊 Engagement moyen", f"{posts_df['engagement_score'].mean():.1f}")
 
 with col_s5:
-    st.metric("🏠 Subreddits", posts_df["subreddit"].nunique())
+    if not results_filters.is_empty():
+        st.metric("🏠 Subreddits", posts_df["subreddit"].nunique())
+    else:
+        # Sur toute la période (et pas seulement la page), depuis les sketches journaliers
+        window_sketches = get_window_sketches(user_id=user_id, days=days_filter)
+        if window_sketches and window_sketches["days"]:
+            subreddit_count = window_sketches["subreddits"].count()
+        else:
+            subreddit_count = posts_df["subreddit"].nunique()
+        st.metric("🏠 Subreddits", subreddit_count, help="Sur la période (estimation HyperLogLog)")
 
 st.divider()
 
@@ -107,43 +151,87 @@ tab1, tab2, tab3 = st.tabs(["📋 Liste des posts", "📊 Analyse par subreddit"
 
 # ============= TAB 1: LISTE DES POSTS =============
 with tab1:
-    st.subheader(f"🏆 Top {len(posts_df)} posts")
-    
-    # Recherche textuelle
+    # Recherche plein texte (titre + contenu) côté base, sur toute la période
     search_query = st.text_input(
-        "🔍 Rechercher dans les titres",
-        placeholder="Ex: crypto, AI, marketing..."
+        "🔍 Rechercher dans les posts",
+        placeholder="Ex: crypto, \"intelligence artificielle\", python -snake..."
     )
     
-    # Filtrage par recherche
     if search_query:
-        filtered_df = posts_df[posts_df["title"].str.contains(search_query, case=False, na=False)]
-        st.caption(f"**{len(filtered_df)}** résultats pour '{search_query}'")
+        # Pagination par offset (tri par pertinence), réinitialisée à chaque requête
+        search_key = (filters_key, search_query)
+        if st.session_state.get("search_key") != search_key:
+            st.session_state.search_key = search_key
+            st.session_state.search_page = 0
+        
+        display_df = search_posts(
+            user_id=user_id,
+            query=search_query,
+            days=days_filter,
+            filters=results_filters,
+            limit=limit_posts,
+            offset=st.session_state.search_page * limit_posts
+        )
+        total_results = int(display_df["total_count"].iloc[0]) if not display_df.empty else 0
+        current_page = st.session_state.search_page + 1
+        has_next_page = current_page * limit_posts < total_results
+        
+        st.subheader(f"🔍 {total_results} résultats pour '{search_query}'")
     else:
-        filtered_df = posts_df
+        display_df = posts_df
+        current_page = page_number
+        next_cursor = get_next_cursor(posts_df, sort_by, limit_posts)
+        has_next_page = next_cursor is not None
+        
+        st.subheader(f"🏆 Page {page_number} · {len(posts_df)} posts")
+    
+    # Crossposts et reprises d'une même actualité : une seule carte par groupe
+    if st.checkbox("🧬 Regrouper les quasi-doublons", value=True):
+        display_df = collapse_clusters(display_df)
     
     # Affichage des posts
-    for idx, post in filtered_df.iterrows():
+    for idx, post in display_df.iterrows():
         with st.container():
             col_a, col_b = st.columns([3, 1])
             
             with col_a:
-                # Titre cliquable
-                st.markdown(f"### [{post['title']}]({post['url']})")
+                # Titre cliquable (termes recherchés en gras)
+                title = post.get('title_highlight') or post['title']
+                st.markdown(f"### [{title}]({post['url']})")
                 
                 # Métadonnées
+                sentiment = post.get('sentiment')
+                sentiment_info = (
+                    f" · {SENTIMENT_EMOJIS[sentiment_label(sentiment)]} {sentiment:+.2f}"
+                    if sentiment is not None and pd.notna(sentiment) else ""
+                )
                 st.markdown(
                     f"🏠 **r/{post['subreddit']}** · "
                     f"👤 u/{post['author']} · "
                     f"🔑 `{post['matched_keywords']}` · "
                     f"📅 {post['post_date'][:10]}"
+                    + sentiment_info
                 )
                 
-                # Contenu (aperçu)
-                if post.get('content') and len(post['content']) > 0:
-                    content_preview = post['content'][:200] + "..." if len(post['content']) > 200 else post['content']
-                    with st.expander("📄 Aperçu du contenu"):
+                if post.get('cluster_size', 1) > 1:
+                    others = ", ".join(f"r/{sub}" for sub in post['cluster_subreddits'])
+                    st.caption(f"🔁 {post['cluster_size']} versions sur cette page" + (f" · aussi dans {others}" if others else ""))
+                
+                # Extrait du contenu correspondant à la recherche
+                if post.get('content_highlight'):
+                    st.caption(f"… {post['content_highlight']} …")
+                
+                # Aperçu stocké avec le post ; contenu complet chargé à la demande
+                content_preview = post.get('content_preview') or ""
+                if st.toggle("📄 Aperçu du contenu", key=f"content_{post['post_id']}"):
+                    if not content_preview:
+                        st.caption("Pas de contenu texte")
+                    elif len(content_preview) < CONTENT_PREVIEW_LENGTH:
                         st.markdown(content_preview)
+                    elif st.toggle("📖 Contenu complet", key=f"full_content_{post['post_id']}"):
+                        st.markdown(get_post_content(post['post_id']))
+                    else:
+                        st.markdown(content_preview + "...")
             
             with col_b:
                 # Métriques
@@ -158,24 +246,66 @@ with tab1:
             
             st.divider()
     
+    # Navigation entre les pages
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    
+    with col_prev:
+        if current_page > 1 and st.button("⬅️ Page précédente", use_container_width=True):
+            if search_query:
+                st.session_state.search_page -= 1
+            else:
+                st.session_state.results_cursors.pop()
+            st.rerun()
+    
+    with col_page:
+        st.caption(f"Page {current_page}")
+    
+    with col_next:
+        if has_next_page and st.button("Page suivante ➡️", use_container_width=True):
+            if search_query:
+                st.session_state.search_page += 1
+            else:
+                st.session_state.results_cursors.append(next_cursor)
+            st.rerun()
+    
     # Export CSV
     st.subheader("💾 Export des données")
     
-    csv_data = filtered_df.to_csv(index=False).encode('utf-8')
-    
-    st.download_button(
-        label="📥 Télécharger en CSV",
-        data=csv_data,
-        file_name=f"reddit_posts_{user_id}_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv",
-        use_container_width=True
-    )
+    # Les colonnes complètes (contenu inclus) ne sont chargées que pour l'export
+    if st.button("📦 Préparer l'export CSV", use_container_width=True):
+        if search_query:
+            # Résultats de recherche de la page courante
+            export_df = display_df.drop(
+                columns=["title_highlight", "content_highlight", "rank", "total_count", "cluster_size", "cluster_subreddits"],
+                errors="ignore"
+            )
+        else:
+            export_df = get_posts(
+                user_id=user_id,
+                days=days_filter,
+                limit=limit_posts,
+                filters=results_filters,
+                columns="export",
+                sort_by=sort_by,
+                cursor=st.session_state.results_cursors[-1]
+            )
+        
+        csv_data = export_df.to_csv(index=False).encode('utf-8')
+        
+        st.download_button(
+            label="📥 Télécharger en CSV",
+            data=csv_data,
+            file_name=f"reddit_posts_{user_id}_{datetime.now().strftime('%Y%m%d')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
 
 # ============= TAB 2: ANALYSE PAR SUBREDDIT =============
 with tab2:
     st.subheader("📊 Performance par subreddit")
+    st.caption(f"Agrégé sur l'ensemble des posts des {days_filter} derniers jours")
     
-    subreddit_stats = analyze_by_subreddit(posts_df.to_dict('records'))
+    subreddit_stats = get_subreddit_stats(user_id, days=days_filter, subreddit=subreddit_param)
     
     if not subreddit_stats.empty:
         # Affichage du tableau
@@ -209,8 +339,9 @@ with tab2:
 # ============= TAB 3: ANALYSE PAR MOT-CLÉ =============
 with tab3:
     st.subheader("🔑 Performance par mot-clé")
+    st.caption(f"Agrégé sur l'ensemble des posts des {days_filter} derniers jours")
     
-    keyword_stats = analyze_by_keyword(posts_df.to_dict('records'))
+    keyword_stats = get_keyword_stats(user_id, days=days_filter, subreddit=subreddit_param)
     
     if not keyword_stats.empty:
         # Affichage du tableau
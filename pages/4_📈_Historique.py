@@ -2,12 +2,17 @@
 Page Historique - Analyse des tendances dans le temps
 """
 import streamlit as st
-from utils.database import get_posts
-from utils.analyzer import get_time_series_data, calculate_growth_rate
+from utils.database import (
+    get_daily_rollups, get_rollup_totals, get_activity_heatmap, get_window_sketches,
+    get_archived_posts
+)
+from utils.analyzer import get_time_series_data, calculate_rollup_growth
+from utils.archive import is_archive_available
+from config.settings import RETENTION_DAYS
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 st.set_page_config(page_title="Historique", page_icon="📈", layout="wide")
 
@@ -23,7 +28,7 @@ col_p1, col_p2 = st.columns([1, 3])
 with col_p1:
     period_days = st.selectbox(
         "📅 Période d'analyse",
-        [7, 14, 30, 60, 90],
+        [7, 14, 30, 60, 90, 180, 365],
         index=2,  # 30 jours par défaut
         format_func=lambda x: f"{x} jours"
     )
@@ -31,52 +36,62 @@ with col_p1:
 with col_p2:
     st.info(f"📊 Analyse des posts des **{period_days} derniers jours**")
 
-# Récupération des données
-posts_df = get_posts(user_id=user_id, days=period_days, limit=5000)
+# Agrégats journaliers maintenus à l'écriture : une ligne par jour,
+# indépendamment du nombre de posts (et conservés au-delà de la rétention)
+daily_rollups = get_daily_rollups(user_id=user_id, days=period_days)
 
-if posts_df.empty:
+if daily_rollups.empty:
     st.warning("⚠️ **Aucune donnée historique.** Lancez quelques scans pour commencer l'analyse.")
     st.stop()
 
-# Conversion des dates
-posts_df["post_date"] = pd.to_datetime(posts_df["post_date"])
-posts_df["date"] = posts_df["post_date"].dt.date
+daily_stats = get_time_series_data(daily_rollups)
+subreddit_totals = get_rollup_totals(user_id=user_id, days=period_days, dimension="subreddit")
+
+# Sketches fusionnés de la période (auteurs distincts, quantiles) : taille fixe par jour
+window_sketches = get_window_sketches(user_id=user_id, days=period_days)
 
 st.divider()
 
 # Statistiques globales
 st.header("📊 Vue d'ensemble")
 
-col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+col_s1, col_s2, col_s3, col_s4, col_s5 = st.columns(5)
+
+total_posts = int(daily_stats["Nombre de posts"].sum())
+active_days = len(daily_stats)
 
 with col_s1:
-    st.metric("📝 Total posts", len(posts_df))
+    st.metric("📝 Total posts", total_posts)
 
 with col_s2:
-    st.metric("📅 Jours actifs", posts_df["date"].nunique())
+    st.metric("📅 Jours actifs", active_days)
 
 with col_s3:
-    posts_per_day = len(posts_df) / posts_df["date"].nunique()
+    posts_per_day = total_posts / active_days
     st.metric("📊 Posts/jour moyen", f"{posts_per_day:.1f}")
 
 with col_s4:
-    st.metric("🏠 Subreddits uniques", posts_df["subreddit"].nunique())
+    st.metric("🏠 Subreddits uniques", len(subreddit_totals))
+
+with col_s5:
+    if window_sketches and window_sketches["days"]:
+        st.metric(
+            "👤 Auteurs uniques",
+            f"~{window_sketches['authors'].count()}",
+            help="Estimation HyperLogLog (erreur ~2 %)"
+        )
+    else:
+        st.metric("👤 Auteurs uniques", "—")
 
 st.divider()
 
 # Comparaison avec période précédente
 st.header("📈 Croissance")
 
-# Calcul périodes (avec timezone UTC pour compatibilité)
-from datetime import timezone
-current_cutoff = datetime.now(timezone.utc) - timedelta(days=period_days // 2)
-current_posts = posts_df[posts_df["post_date"] >= current_cutoff]
-previous_posts = posts_df[posts_df["post_date"] < current_cutoff]
+# Calcul périodes (jours UTC, comme les agrégats)
+current_cutoff = (datetime.now(timezone.utc) - timedelta(days=period_days // 2)).date()
 
-growth = calculate_growth_rate(
-    current_posts.to_dict('records'),
-    previous_posts.to_dict('records')
-)
+growth = calculate_rollup_growth(daily_rollups, current_cutoff)
 
 col_g1, col_g2, col_g3, col_g4 = st.columns(4)
 
@@ -111,16 +126,6 @@ st.divider()
 # Graphiques temporels
 st.header("📊 Évolution dans le temps")
 
-# Agrégation par jour
-daily_stats = posts_df.groupby("date").agg({
-    "post_id": "count",
-    "score": "mean",
-    "num_comments": "mean",
-    "engagement_score": "mean"
-}).reset_index()
-
-daily_stats.columns = ["Date", "Nombre de posts", "Score moyen", "Commentaires moyens", "Engagement moyen"]
-
 # Graphique 1: Nombre de posts par jour
 st.subheader("📅 Posts collectés par jour")
 
@@ -182,52 +187,113 @@ st.divider()
 # Analyse par subreddit dans le temps
 st.header("🏠 Top subreddits dans le temps")
 
-top_subreddits = posts_df["subreddit"].value_counts().head(5).index.tolist()
+top_subreddits = subreddit_totals["name"].head(5).tolist()
 
-subreddit_time = posts_df[posts_df["subreddit"].isin(top_subreddits)].groupby(
-    ["date", "subreddit"]
-).size().reset_index(name="count")
+subreddit_time = get_daily_rollups(
+    user_id=user_id,
+    days=period_days,
+    dimension="subreddit",
+    names=top_subreddits
+)
 
 fig_subreddit = px.line(
     subreddit_time,
-    x="date",
-    y="count",
-    color="subreddit",
+    x="day",
+    y="total_posts",
+    color="name",
     markers=True,
+    labels={"day": "date", "total_posts": "count", "name": "subreddit"},
     title=f"Évolution des {len(top_subreddits)} subreddits les plus actifs"
 )
 
 st.plotly_chart(fig_subreddit, use_container_width=True)
 
+# Analyse par mot-clé dans le temps
+st.header("🔑 Top mots-clés dans le temps")
+
+keyword_totals = get_rollup_totals(user_id=user_id, days=period_days, dimension="keyword")
+
+if keyword_totals.empty:
+    st.info("Aucun mot-clé sur la période.")
+else:
+    top_keywords = keyword_totals["name"].head(5).tolist()
+    
+    keyword_time = get_daily_rollups(
+        user_id=user_id,
+        days=period_days,
+        dimension="keyword",
+        names=top_keywords
+    )
+    
+    fig_keyword = px.line(
+        keyword_time,
+        x="day",
+        y="total_posts",
+        color="name",
+        markers=True,
+        labels={"day": "date", "total_posts": "count", "name": "mot-clé"},
+        title=f"Évolution des {len(top_keywords)} mots-clés les plus fréquents"
+    )
+    
+    st.plotly_chart(fig_keyword, use_container_width=True)
+
 st.divider()
 
-# Heatmap des posts par jour de la semaine et heure
-st.header("🔥 Heatmap d'activité")
+# Sentiment (lexique local, sommé dans les agrégats journaliers)
+st.header("😊 Sentiment")
 
-posts_df["day_of_week"] = posts_df["post_date"].dt.day_name()
-posts_df["hour"] = posts_df["post_date"].dt.hour
+fig_sentiment = px.line(
+    daily_stats,
+    x="Date",
+    y="Sentiment moyen",
+    markers=True,
+    title="Sentiment moyen par jour (-1 négatif, +1 positif)"
+)
+fig_sentiment.update_traces(line_color="#8E24AA", marker_color="#8E24AA")
+fig_sentiment.add_hline(y=0, line_dash="dot", line_color="gray")
+st.plotly_chart(fig_sentiment, use_container_width=True)
+
+if not keyword_totals.empty and "positive_posts" in keyword_totals.columns:
+    sentiment_keywords = keyword_totals.head(10).copy()
+    total = sentiment_keywords["total_posts"].astype(float)
+    positive = sentiment_keywords["positive_posts"].astype(float) / total
+    negative = sentiment_keywords["negative_posts"].astype(float) / total
+    sentiment_share = pd.DataFrame({
+        "Mot-clé": sentiment_keywords["name"],
+        "Positif": positive,
+        "Neutre": 1 - positive - negative,
+        "Négatif": negative,
+    }).melt(id_vars="Mot-clé", var_name="Sentiment", value_name="Part")
+    
+    fig_sentiment_keywords = px.bar(
+        sentiment_share,
+        x="Mot-clé",
+        y="Part",
+        color="Sentiment",
+        color_discrete_map={"Positif": "#4CAF50", "Neutre": "#BDBDBD", "Négatif": "#E53935"},
+        title="Répartition du sentiment par mot-clé"
+    )
+    fig_sentiment_keywords.update_layout(yaxis_tickformat=".0%")
+    st.plotly_chart(fig_sentiment_keywords, use_container_width=True)
 
-# Mapping français des jours
-day_mapping = {
-    "Monday": "Lundi",
-    "Tuesday": "Mardi",
-    "Wednesday": "Mercredi",
-    "Thursday": "Jeudi",
-    "Friday": "Vendredi",
-    "Saturday": "Samedi",
-    "Sunday": "Dimanche"
-}
+st.divider()
 
-posts_df["day_of_week_fr"] = posts_df["day_of_week"].map(day_mapping)
+# Heatmap des posts par jour de la semaine et heure
+st.header("🔥 Heatmap d'activité")
 
-# Ordre des jours
+# Ordre des jours (day_of_week : 0 = lundi)
 day_order = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
 
-heatmap_data = posts_df.groupby(["day_of_week_fr", "hour"]).size().reset_index(name="count")
+# Au plus 7 × 24 lignes, agrégées côté base
+heatmap_data = get_activity_heatmap(user_id=user_id, days=period_days)
 
-# Pivot pour heatmap
-heatmap_pivot = heatmap_data.pivot(index="day_of_week_fr", columns="hour", values="count").fillna(0)
-heatmap_pivot = heatmap_pivot.reindex(day_order)
+# Pivot pour heatmap (heures UTC)
+heatmap_pivot = (
+    heatmap_data.pivot(index="day_of_week", columns="hour", values="total_posts")
+    .reindex(index=range(7), columns=range(24))
+    .fillna(0)
+)
+heatmap_pivot.index = day_order
 
 fig_heatmap = px.imshow(
     heatmap_pivot,
@@ -245,30 +311,92 @@ st.divider()
 # Distribution des scores
 st.header("📊 Distribution des métriques")
 
-col_d1, col_d2 = st.columns(2)
-
-with col_d1:
-    st.subheader("⬆️ Distribution des scores")
-    fig_score_dist = px.histogram(
-        posts_df,
-        x="score",
-        nbins=50,
-        title="Répartition des scores"
+# Quantiles et histogrammes lus dans les sketches journaliers : disponibles
+# sur toute la période, y compris au-delà de la rétention des posts bruts
+if not window_sketches or not window_sketches["score"].count:
+    st.info("Aucune distribution disponible sur la période (les sketches sont calculés à chaque scan).")
+else:
+    quantile_levels = [0.5, 0.75, 0.9, 0.99]
+    distributions = [
+        ("score", "Score", "⬆️ Distribution des scores", "Répartition des scores"),
+        ("engagement", "Engagement", "📊 Distribution de l'engagement", "Répartition de l'engagement"),
+    ]
+    
+    for column, (key, label, subheader, title) in zip(st.columns(2), distributions):
+        sketch = window_sketches[key]
+        
+        with column:
+            st.subheader(subheader)
+            
+            cols_q = st.columns(len(quantile_levels))
+            for col_q, q, value in zip(cols_q, quantile_levels, sketch.quantiles(quantile_levels)):
+                col_q.metric(f"p{int(q * 100)}", f"{value:.1f}")
+            
+            histogram = pd.DataFrame(sketch.histogram(bins=50))
+            histogram["bin_center"] = (histogram["bin_start"] + histogram["bin_end"]) / 2
+            
+            fig_dist = px.bar(
+                histogram,
+                x="bin_center",
+                y="count",
+                labels={"bin_center": label, "count": "count"},
+                title=title
+            )
+            fig_dist.update_layout(bargap=0)
+            st.plotly_chart(fig_dist, use_container_width=True)
+    
+    st.caption(
+        f"Distributions estimées sur {window_sketches['posts']} posts "
+        f"(quantiles à ±1 % près)"
     )
-    st.plotly_chart(fig_score_dist, use_container_width=True)
-
-with col_d2:
-    st.subheader("📊 Distribution de l'engagement")
-    fig_eng_dist = px.histogram(
-        posts_df,
-        x="engagement_score",
-        nbins=50,
-        title="Répartition de l'engagement"
-    )
-    st.plotly_chart(fig_eng_dist, use_container_width=True)
 
 st.divider()
 
+# Posts expirés : au-delà de la rétention, seuls les agrégats restent en base ;
+# les posts eux-mêmes sont lus dans l'archive Parquet (colonnes et mois de la
+# période seulement)
+if period_days > RETENTION_DAYS and is_archive_available():
+    st.header("📦 Posts archivés")
+    
+    archived_df = get_archived_posts(
+        user_id=user_id,
+        days=period_days,
+        columns=["title", "subreddit", "url", "post_date", "score", "num_comments", "engagement_score"]
+    )
+    
+    if archived_df.empty:
+        st.info(f"Aucun post archivé sur la période (posts de plus de {RETENTION_DAYS} jours, copiés au nettoyage).")
+    else:
+        st.caption(
+            f"{len(archived_df)} posts de plus de {RETENTION_DAYS} jours, "
+            f"lus depuis l'archive Parquet locale"
+        )
+        
+        top_archived = archived_df.nlargest(20, "engagement_score")
+        st.dataframe(
+            pd.DataFrame({
+                "Titre": top_archived["title"],
+                "Subreddit": top_archived["subreddit"],
+                "Date": top_archived["post_date"].dt.strftime("%d/%m/%Y %H:%M"),
+                "Score": top_archived["score"],
+                "Commentaires": top_archived["num_comments"],
+                "Engagement": top_archived["engagement_score"],
+                "Lien": top_archived["url"]
+            }).style.format({"Engagement": "{:.1f}"}),
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        st.download_button(
+            label="📥 Télécharger les posts archivés (CSV)",
+            data=archived_df.to_csv(index=False).encode("utf-8"),
+            file_name=f"reddit_archived_posts_{user_id}_{datetime.now().strftime('%Y%m%d')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    
+    st.divider()
+
 # Export des données temporelles
 st.header("💾 Export des données")
 
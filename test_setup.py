@@ -107,6 +107,39 @@ def test_dependencies():
     
     return True
 
+def test_formula():
+    """Test de l'évaluation des formules d'engagement (priorité de ^)"""
+    print("\n🔍 Test des formules d'engagement...")
+    
+    try:
+        import numpy as np
+        from utils.formula import compile_formula
+        
+        # score=100, commentaires=50, âge=4 h
+        components = np.array([[100.0, 50.0, 0.0, 0.9]])
+        age_hours = np.array([4.0])
+        weights = {"upvotes": 1.0, "comments": 1.0, "awards": 1.0, "upvote_ratio": 1.0}
+        
+        cases = [
+            ("log1p(score) * w1 + comments / age ^ 1.5", np.log1p(100) + 50 / 4 ** 1.5),
+            ("-2^2", -4.0),
+            ("2^3^2", 512.0),
+        ]
+        
+        ok = True
+        for formula, expected in cases:
+            value = compile_formula(formula).evaluate(components, age_hours, np.ones(1), weights)[0]
+            if abs(value - round(expected, 2)) > 1e-9:
+                print(f"❌ {formula} = {value} (attendu {expected:.2f})")
+                ok = False
+            else:
+                print(f"✅ {formula} = {value}")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ Erreur d'évaluation des formules: {e}")
+        return False
+
 def main():
     """Fonction principale"""
     print("=" * 50)
@@ -121,6 +154,9 @@ def main():
         print("   Exécutez: pip install -r requirements.txt")
         return
     
+    # Test formules
+    formula_ok = test_formula()
+    
     # Test Reddit
     reddit_ok = test_reddit_api()
     
@@ -132,10 +168,11 @@ def main():
     print("📊 RÉSUMÉ DES TESTS")
     print("=" * 50)
     print(f"Dépendances: {'✅ OK' if deps_ok else '❌ Erreur'}")
+    print(f"Formules:    {'✅ OK' if formula_ok else '❌ Erreur'}")
     print(f"Reddit API:  {'✅ OK' if reddit_ok else '❌ Erreur'}")
     print(f"Supabase:    {'✅ OK' if supabase_ok else '❌ Erreur'}")
     
-    if reddit_ok and supabase_ok:
+    if formula_ok and reddit_ok and supabase_ok:
         print("\n🎉 TOUT EST PRÊT!")
         print("   Lancez l'app avec: streamlit run app.py")
     else:
@@ -1,3 +1,4 @@
+from .storage import *
 from .database import *
 from .reddit_scraper import *
 from .analyzer import *
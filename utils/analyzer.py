@@ -1,14 +1,168 @@
 """
 Module d'analyse et calcul des métriques d'engagement
 """
-from typing import List, Dict
+from typing import List, Dict, Tuple, Iterable, Optional, Sequence
 from datetime import datetime, timedelta
+import hashlib
+import heapq
+from collections import OrderedDict
+from itertools import chain
+import numpy as np
 import pandas as pd
 
+from utils.formula import compile_formula
+from utils.filters import FilterSpec
+
+
+# Poids par défaut de la formule d'engagement
+DEFAULT_ENGAGEMENT_WEIGHTS = {
+    "upvotes": 1.0,
+    "comments": 2.0,
+    "awards": 5.0,
+    "upvote_ratio": 10.0,
+}
+
+# Composantes du score : (colonne du post, poids associé, valeur par défaut)
+ENGAGEMENT_COMPONENTS = [
+    ("score", "upvotes", 0.0),
+    ("num_comments", "comments", 0.0),
+    ("awards", "awards", 0.0),
+    ("upvote_ratio", "upvote_ratio", 0.5),
+]
+
+
+def engagement_weights_vector(weights: Dict = None) -> np.ndarray:
+    """
+    Poids dans l'ordre de ENGAGEMENT_COMPONENTS
+    """
+    weights = weights or DEFAULT_ENGAGEMENT_WEIGHTS
+    return np.array(
+        [weights.get(key, DEFAULT_ENGAGEMENT_WEIGHTS[key]) for _, key, _ in ENGAGEMENT_COMPONENTS],
+        dtype=np.float64
+    )
+
+
+def age_factor_batch(age_hours: np.ndarray) -> np.ndarray:
+    """
+    Facteur d'âge (les posts récents sont favorisés)
+    
+    Bonus de 20% pour les posts < 24h, décroissance ensuite, minimum 50%
+    """
+    age_hours = np.asarray(age_hours, dtype=np.float64)
+    # np.where imbriqués : même résultat que np.select, sans son surcoût fixe
+    factor = np.where(
+        age_hours < 24, 1.2,
+        np.where(
+            age_hours < 48, 1.1,
+            np.where(age_hours < 72, 1.0, 0.9 - age_hours / 1000)  # Décroissance lente
+        )
+    )
+    return np.maximum(factor, 0.5)
+
+
+def score_engagement_batch(
+    components: np.ndarray,
+    age_hours: np.ndarray,
+    weights: Dict = None,
+    formula: Optional[str] = None
+) -> np.ndarray:
+    """
+    Calcule les scores d'engagement d'un lot de posts en une passe vectorisée
+    
+    Args:
+        components: Matrice (n, 4) des colonnes score, num_comments, awards,
+            upvote_ratio (ordre de ENGAGEMENT_COMPONENTS)
+        age_hours: Âge des posts en heures (n,)
+        weights: Poids personnalisés (optionnel)
+        formula: Formule personnalisée (utils/formula.py), formule par défaut si vide
+    
+    Returns:
+        Scores arrondis à 2 décimales (n,)
+    
+    Raises:
+        FormulaError: formule invalide
+    """
+    components = np.asarray(components, dtype=np.float64)
+    weights_vector = engagement_weights_vector(weights)
+    age_factor = age_factor_batch(age_hours)
+    
+    if formula:
+        named_weights = dict(zip((key for _, key, _ in ENGAGEMENT_COMPONENTS), weights_vector))
+        return compile_formula(formula).evaluate(components, age_hours, age_factor, named_weights)
+    
+    return np.round((components @ weights_vector) * age_factor, 2)
+
+
+def engagement_components(posts) -> tuple:
+    """
+    Extrait (composantes (n, 4), age_hours (n,)) d'une liste de posts ou d'un DataFrame,
+    valeurs manquantes remplacées par les valeurs par défaut
+    """
+    df = posts if isinstance(posts, pd.DataFrame) else pd.DataFrame(posts)
+    n = len(df)
+    
+    columns = []
+    for column, _, default in ENGAGEMENT_COMPONENTS + [("age_hours", None, 0.0)]:
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            columns.append(np.where(np.isnan(values), default, values))
+        else:
+            columns.append(np.full(n, default))
+    
+    return np.column_stack(columns[:-1]) if n else np.empty((0, 4)), columns[-1]
+
+
+def score_posts_frame(posts, weights: Dict = None, formula: Optional[str] = None) -> np.ndarray:
+    """
+    Scores d'engagement d'une liste de posts ou d'un DataFrame
+    """
+    components, age_hours = engagement_components(posts)
+    return score_engagement_batch(components, age_hours, weights, formula)
+
+
+def build_score_matrix(posts) -> np.ndarray:
+    """
+    Matrice compacte (n, 4) des composantes du score, déjà multipliées par le
+    facteur d'âge : les scores pour des poids w valent matrice @ w (avant arrondi)
+    """
+    components, age_hours = engagement_components(posts)
+    return (components * age_factor_batch(age_hours)[:, None]).astype(np.float32)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices des k plus grandes valeurs, triés par valeur décroissante
+    (sélection O(n) avec argpartition, seul le top k est trié)
+    """
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def rank_with_weights(
+    score_matrix: np.ndarray,
+    weights: Dict = None,
+    k: int = 20
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classement simulé : top k des posts pour des poids donnés
+    
+    Returns:
+        (indices des posts dans la matrice, scores correspondants)
+    """
+    scores = score_matrix @ engagement_weights_vector(weights).astype(np.float32)
+    indices = top_k_indices(scores, k)
+    return indices, scores[indices]
+
 
 def calculate_engagement_score(
     post: Dict,
-    weights: Dict = None
+    weights: Dict = None,
+    formula: Optional[str] = None
 ) -> float:
     """
     Calcule le score d'engagement d'un post
@@ -19,170 +173,396 @@ def calculate_engagement_score(
     Args:
         post: Dictionnaire contenant les données du post
         weights: Poids personnalisés (optionnel)
+        formula: Formule personnalisée (optionnel, utils/formula.py)
     
     Returns:
         Score d'engagement (float)
     """
-    if weights is None:
-        weights = {
-            "upvotes": 1.0,
-            "comments": 2.0,
-            "awards": 5.0,
-            "upvote_ratio": 10.0,
-        }
-    
-    # Extraction des valeurs
-    upvotes = post.get("score", 0)
-    comments = post.get("num_comments", 0)
-    awards = post.get("awards", 0)
-    upvote_ratio = post.get("upvote_ratio", 0.5)
-    age_hours = post.get("age_hours", 0)
-    
-    # Calcul de base
-    base_score = (
-        upvotes * weights["upvotes"] +
-        comments * weights["comments"] +
-        awards * weights["awards"] +
-        upvote_ratio * weights["upvote_ratio"]
-    )
-    
-    # Pénalité d'âge (les posts récents sont favorisés)
-    # Bonus de 20% pour les posts < 24h, décroissance ensuite
-    if age_hours < 24:
-        age_factor = 1.2
-    elif age_hours < 48:
-        age_factor = 1.1
-    elif age_hours < 72:
-        age_factor = 1.0
-    else:
-        age_factor = 0.9 - (age_hours / 1000)  # Décroissance lente
-    
-    final_score = base_score * max(age_factor, 0.5)  # Minimum 50% du score
-    
-    return round(final_score, 2)
+    values = [_post_value(post, column, default) for column, _, default in ENGAGEMENT_COMPONENTS]
+    components = np.array([values], dtype=np.float64)
+    age_hours = np.array([_post_value(post, "age_hours", 0.0)], dtype=np.float64)
+    return float(score_engagement_batch(components, age_hours, weights, formula)[0])
+
+
+def _post_value(post: Dict, column: str, default: float) -> float:
+    # Valeur numérique d'un post, défaut si absente ou invalide (comme engagement_components)
+    try:
+        value = float(post.get(column))
+    except (TypeError, ValueError):
+        return default
+    return default if np.isnan(value) else value
 
 
 def enrich_posts_with_engagement(
     posts: List[Dict],
-    weights: Dict = None
+    weights: Dict = None,
+    formula: Optional[str] = None
 ) -> List[Dict]:
     """
-    Enrichit une liste de posts avec leur score d'engagement
+    Enrichit une liste de posts avec leur score d'engagement (calcul vectorisé,
+    formule personnalisée optionnelle)
     """
-    for post in posts:
-        post["engagement_score"] = calculate_engagement_score(post, weights)
+    if not posts:
+        return posts
+    
+    for post, engagement_score in zip(posts, score_posts_frame(posts, weights, formula).tolist()):
+        post["engagement_score"] = engagement_score
     
     return posts
 
 
+class TopK:
+    """
+    Sélection incrémentale des k meilleurs posts (tas de taille k, O(n log k))
+    
+    Alimentable au fil de l'eau (push / extend) pendant un scan ; items()
+    renvoie à tout moment le classement courant. À égalité, le premier
+    post reçu est classé devant (comme un tri stable).
+    
+    Args:
+        k: Nombre de posts conservés
+        keys: Champs de tri, comparés dans l'ordre, décroissants
+            (préfixe "-" pour un champ croissant, ex. "-age_hours")
+        unique_key: Champ identifiant (ex. "post_id") : un post déjà présent
+            n'est pas dupliqué, seule sa meilleure version est conservée
+    """
+    
+    def __init__(
+        self,
+        k: int,
+        keys: Sequence[str] = ("engagement_score",),
+        unique_key: Optional[str] = None
+    ):
+        self.k = k
+        self.keys = [(key.lstrip("-"), -1 if key.startswith("-") else 1) for key in keys]
+        self.unique_key = unique_key
+        self._heap = []
+        self._entries = {}
+        self._counter = 0
+    
+    def _sort_key(self, post: Dict) -> tuple:
+        return tuple(sign * (post.get(field) or 0) for field, sign in self.keys)
+    
+    def push(self, post: Dict) -> bool:
+        """
+        Propose un post ; retourne True s'il entre dans le top k
+        """
+        if self.k <= 0:
+            return False
+        
+        # Entrée du tas : (clé de tri, -ordre d'arrivée) ; la racine est le moins bon
+        self._counter += 1
+        entry = (self._sort_key(post), -self._counter, post)
+        
+        post_key = post.get(self.unique_key) if self.unique_key else None
+        if post_key is not None and post_key in self._entries:
+            existing = self._entries[post_key]
+            if entry[:2] <= existing[:2]:
+                return False
+            self._heap.remove(existing)
+            heapq.heapify(self._heap)
+        
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            evicted = heapq.heapreplace(self._heap, entry)
+            if self.unique_key:
+                self._entries.pop(evicted[2].get(self.unique_key), None)
+        else:
+            return False
+        
+        if post_key is not None:
+            self._entries[post_key] = entry
+        return True
+    
+    def extend(self, posts: Iterable[Dict]) -> "TopK":
+        for post in posts:
+            self.push(post)
+        return self
+    
+    def items(self) -> List[Dict]:
+        """
+        Posts du top k, du meilleur au moins bon
+        """
+        return [entry[2] for entry in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def top_k(
+    posts: Iterable[Dict],
+    k: int,
+    keys: Sequence[str] = ("engagement_score",),
+    unique_key: Optional[str] = None
+) -> List[Dict]:
+    """
+    Les k meilleurs posts selon keys, sans trier toute la liste (voir TopK)
+    """
+    return TopK(k, keys=keys, unique_key=unique_key).extend(posts).items()
+
+
 def rank_posts_by_engagement(
     posts: List[Dict],
     top_n: int = 20
 ) -> List[Dict]:
     """
-    Trie les posts par score d'engagement (décroissant)
+    Trie les posts par score d'engagement (décroissant), un post par
+    groupe de quasi-doublons
     """
-    sorted_posts = sorted(
-        posts,
-        key=lambda x: x.get("engagement_score", 0),
-        reverse=True
-    )
-    return sorted_posts[:top_n]
+    return top_k(posts, top_n, unique_key="cluster_id")
+
+
+def collapse_clusters(posts_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ne garde que le premier post (dans l'ordre du DataFrame) de chaque groupe
+    de quasi-doublons (cluster_id, voir utils/dedup.py)
+    
+    Colonnes ajoutées : cluster_size (nombre de versions dans le DataFrame)
+    et cluster_subreddits (subreddits des autres versions)
+    """
+    if posts_df.empty or "cluster_id" not in posts_df.columns:
+        return posts_df
+    
+    clusters = posts_df["cluster_id"].fillna(posts_df["post_id"])
+    first = ~clusters.duplicated()
+    
+    sizes = clusters.map(clusters.value_counts())
+    subreddits = posts_df["subreddit"].groupby(clusters).agg(lambda s: list(dict.fromkeys(s)))
+    
+    collapsed = posts_df[first].copy()
+    collapsed["cluster_size"] = sizes[first].to_numpy()
+    collapsed["cluster_subreddits"] = [
+        [sub for sub in subreddits[cluster] if sub != own]
+        for cluster, own in zip(clusters[first], collapsed["subreddit"])
+    ]
+    return collapsed
 
 
 def get_trending_posts(
     posts: List[Dict],
     hours_threshold: int = 24,
-    min_score: int = 100
+    min_score: int = 100,
+    top_n: Optional[int] = None
 ) -> List[Dict]:
     """
     Identifie les posts "trending" (récents avec bon score)
+    
+    Args:
+        top_n: Nombre maximum de posts retournés (tous par défaut)
     """
-    trending = [
+    trending = (
         post for post in posts
         if post.get("age_hours", 999) <= hours_threshold
         and post.get("score", 0) >= min_score
-    ]
+    )
     
-    return sorted(trending, key=lambda x: x.get("engagement_score", 0), reverse=True)
+    if top_n is None:
+        return sorted(trending, key=lambda x: x.get("engagement_score", 0), reverse=True)
+    
+    return top_k(trending, top_n, unique_key="cluster_id")
+
 
+# Mémoïsation de analyze_posts : posts récemment analysés (par empreinte du contenu)
+_ANALYSIS_CACHE = OrderedDict()
+_ANALYSIS_CACHE_SIZE = 8
 
-def analyze_by_subreddit(posts: List[Dict]) -> pd.DataFrame:
+# Colonnes lues par _compute_analysis (les seules qui entrent dans l'empreinte)
+_ANALYSIS_COLUMNS = ("subreddit", "score", "num_comments", "engagement_score", "awards")
+
+EMPTY_SUMMARY = {
+    "total_posts": 0,
+    "avg_score": 0,
+    "avg_comments": 0,
+    "avg_engagement": 0,
+    "top_subreddit": "N/A",
+    "total_subreddits": 0
+}
+
+
+def _numeric_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _group_means(codes: np.ndarray, values: np.ndarray, groups: int) -> np.ndarray:
+    # Moyenne par groupe en ignorant les valeurs manquantes (comme pandas)
+    present = ~np.isnan(values)
+    sums = np.bincount(codes, weights=np.where(present, values, 0.0), minlength=groups)
+    counts = np.bincount(codes, weights=present.astype(np.float64), minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def _keyword_lists(df: pd.DataFrame) -> pd.Series:
+    # Un post compte pour chacun de ses mots-clés
+    if "keywords" in df.columns:
+        return df["keywords"]
+    if "matched_keywords" in df.columns:
+        return df["matched_keywords"].fillna("").str.split(r",\s*")
+    return pd.Series([[]] * len(df), index=df.index)
+
+
+def _analysis_fingerprint(df: pd.DataFrame) -> Tuple:
     """
-    Analyse les posts par subreddit
+    Empreinte du contenu analysé : une modification en place des valeurs
+    (engagement_score, subreddit, mots-clés...) change l'empreinte
     """
-    if not posts:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(posts)
-    
-    subreddit_stats = df.groupby("subreddit").agg({
-        "post_id": "count",
-        "score": "mean",
-        "num_comments": "mean",
-        "engagement_score": "mean"
-    }).reset_index()
-    
-    subreddit_stats.columns = [
-        "Subreddit",
-        "Nombre de posts",
-        "Score moyen",
-        "Commentaires moyens",
-        "Engagement moyen"
-    ]
-    
-    subreddit_stats = subreddit_stats.sort_values("Engagement moyen", ascending=False)
+    columns = [column for column in _ANALYSIS_COLUMNS if column in df.columns]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    # Listes de mots-clés non hachables par pandas : longueurs et valeurs aplaties
+    keyword_lists = [kws if isinstance(kws, (list, tuple, np.ndarray)) else () for kws in _keyword_lists(df)]
+    digest.update(np.fromiter(map(len, keyword_lists), dtype=np.int64, count=len(df)).tobytes())
+    flat = pd.Series(list(chain.from_iterable(keyword_lists)), dtype=object)
+    digest.update(pd.util.hash_pandas_object(flat, index=False).to_numpy().tobytes())
+    return tuple(columns), len(df), digest.hexdigest()
+
+
+def _compute_analysis(df: pd.DataFrame) -> Dict:
+    n = len(df)
+    score = _numeric_column(df, "score")
+    comments = _numeric_column(df, "num_comments")
+    engagement = _numeric_column(df, "engagement_score")
+    awards = _numeric_column(df, "awards")
+    
+    # Par subreddit : codes entiers puis sommes groupées par bincount
+    codes, subreddits = pd.factorize(df["subreddit"])
+    valid = codes >= 0
+    groups = len(subreddits)
+    counts = np.bincount(codes[valid], minlength=groups)
+    
+    by_subreddit = pd.DataFrame({
+        "Subreddit": subreddits,
+        "Nombre de posts": counts,
+        "Score moyen": _group_means(codes[valid], score[valid], groups),
+        "Commentaires moyens": _group_means(codes[valid], comments[valid], groups),
+        "Engagement moyen": _group_means(codes[valid], engagement[valid], groups)
+    }).sort_values("Engagement moyen", ascending=False)
+    
+    # Par mot-clé : listes aplaties, chaque mot-clé renvoyant à la ligne de son post
+    keyword_lists = [kws if isinstance(kws, (list, tuple, np.ndarray)) else [] for kws in _keyword_lists(df)]
+    lengths = np.fromiter((len(kws) for kws in keyword_lists), dtype=np.int64, count=n)
+    rows = np.repeat(np.arange(n), lengths)
+    flat = pd.Series(list(chain.from_iterable(keyword_lists)), dtype=object)
+    kept = (flat.notna() & (flat != "")).to_numpy()
+    keyword_codes, keywords = pd.factorize(flat[kept])
+    keyword_rows = rows[kept]
+    keyword_groups = len(keywords)
+    
+    by_keyword = pd.DataFrame({
+        "Mot-clé": keywords,
+        "Nombre de posts": np.bincount(keyword_codes, minlength=keyword_groups),
+        "Score moyen": _group_means(keyword_codes, score[keyword_rows], keyword_groups),
+        "Engagement moyen": _group_means(keyword_codes, engagement[keyword_rows], keyword_groups)
+    }).sort_values("Engagement moyen", ascending=False)
+    
+    summary = {
+        "total_posts": n,
+        "avg_score": round(float(np.nanmean(score)), 1) if n else 0,
+        "avg_comments": round(float(np.nanmean(comments)), 1) if n else 0,
+        "avg_engagement": round(float(np.nanmean(engagement)), 2) if n else 0,
+        "top_subreddit": subreddits[int(np.argmax(counts))] if groups else "N/A",
+        "total_subreddits": groups,
+        "total_awards": int(np.nansum(awards))
+    }
     
-    return subreddit_stats
+    return {
+        "summary": summary,
+        "by_subreddit": by_subreddit,
+        "by_keyword": by_keyword
+    }
 
 
-def analyze_by_keyword(posts: List[Dict]) -> pd.DataFrame:
-    """
-    Analyse les posts par mot-clé
+def analyze_posts(posts) -> Dict:
     """
-    if not posts:
-        return pd.DataFrame()
+    Point d'entrée unique de l'analyse d'un ensemble de posts
     
-    df = pd.DataFrame(posts)
+    Calcule en une passe le résumé (generate_summary_stats), les statistiques
+    par subreddit (analyze_by_subreddit) et par mot-clé (analyze_by_keyword).
     
-    keyword_stats = df.groupby("matched_keywords").agg({
-        "post_id": "count",
-        "score": "mean",
-        "engagement_score": "mean"
-    }).reset_index()
+    Args:
+        posts: DataFrame (utilisé sans copie), dict de colonnes (tableaux
+            numpy / listes) ou liste de dicts
     
-    keyword_stats.columns = [
-        "Mot-clé",
-        "Nombre de posts",
-        "Score moyen",
-        "Engagement moyen"
-    ]
+    Returns:
+        Dict {summary, by_subreddit, by_keyword}
     
-    keyword_stats = keyword_stats.sort_values("Engagement moyen", ascending=False)
+    Des posts au contenu identique à une analyse récente (même objet non
+    modifié, ou copie servie par le cache des requêtes) sont servis depuis
+    le cache.
+    """
+    if isinstance(posts, pd.DataFrame):
+        df = posts
+    elif isinstance(posts, dict):
+        df = pd.DataFrame(posts, copy=False)
+    else:
+        df = pd.DataFrame(list(posts))
     
-    return keyword_stats
+    if df.empty or "subreddit" not in df.columns:
+        return {
+            "summary": dict(EMPTY_SUMMARY),
+            "by_subreddit": pd.DataFrame(),
+            "by_keyword": pd.DataFrame()
+        }
+    
+    cache_key = _analysis_fingerprint(df)
+    result = _ANALYSIS_CACHE.get(cache_key)
+    if result is not None:
+        _ANALYSIS_CACHE.move_to_end(cache_key)
+    else:
+        result = _compute_analysis(df)
+        _ANALYSIS_CACHE[cache_key] = result
+        if len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+    
+    # Copies (petites) : le résultat en cache reste intact
+    return {
+        "summary": dict(result["summary"]),
+        "by_subreddit": result["by_subreddit"].copy(),
+        "by_keyword": result["by_keyword"].copy()
+    }
 
 
-def get_time_series_data(posts: List[Dict], days: int = 7) -> pd.DataFrame:
+def analyze_by_subreddit(posts) -> pd.DataFrame:
+    """
+    Analyse les posts par subreddit (voir analyze_posts)
+    """
+    return analyze_posts(posts)["by_subreddit"]
+
+
+def analyze_by_keyword(posts) -> pd.DataFrame:
+    """
+    Analyse les posts par mot-clé (voir analyze_posts)
+    """
+    return analyze_posts(posts)["by_keyword"]
+
+
+def get_time_series_data(daily_rollups: pd.DataFrame) -> pd.DataFrame:
     """
     Prépare les données pour une visualisation temporelle
+    
+    Args:
+        daily_rollups: Agrégats journaliers (voir database.get_daily_rollups),
+            sommes par jour converties ici en moyennes
     """
-    if not posts:
+    if daily_rollups is None or len(daily_rollups) == 0:
         return pd.DataFrame()
     
-    df = pd.DataFrame(posts)
-    df["post_date"] = pd.to_datetime(df["post_date"])
-    df["date"] = df["post_date"].dt.date
+    df = pd.DataFrame(daily_rollups)
+    posts = df["total_posts"].astype(float)
     
-    daily_stats = df.groupby("date").agg({
-        "post_id": "count",
-        "score": "mean",
-        "engagement_score": "mean"
-    }).reset_index()
+    daily_stats = pd.DataFrame({
+        "Date": pd.to_datetime(df["day"]).dt.date,
+        "Nombre de posts": df["total_posts"].astype(int),
+        "Score moyen": df["score_sum"].astype(float) / posts,
+        "Commentaires moyens": df["comments_sum"].astype(float) / posts,
+        "Engagement moyen": df["engagement_sum"].astype(float) / posts,
+        "Sentiment moyen": _numeric_column(df, "sentiment_sum") / posts
+    })
     
-    daily_stats.columns = ["Date", "Nombre de posts", "Score moyen", "Engagement moyen"]
-    
-    return daily_stats
+    return daily_stats.sort_values("Date").reset_index(drop=True)
 
 
 def calculate_growth_rate(
@@ -224,55 +604,78 @@ def calculate_growth_rate(
     }
 
 
-def filter_posts_by_criteria(
-    posts: List[Dict],
-    min_score: int = 0,
-    min_comments: int = 0,
-    max_age_hours: int = 168,  # 7 jours par défaut
-    exclude_nsfw: bool = True
-) -> List[Dict]:
+def calculate_rollup_growth(daily_rollups: pd.DataFrame, cutoff_date) -> Dict:
     """
-    Filtre les posts selon des critères
+    Équivalent de calculate_growth_rate à partir des agrégats journaliers :
+    jours >= cutoff_date (période actuelle) contre jours antérieurs
     """
-    filtered = posts
-    
-    if min_score > 0:
-        filtered = [p for p in filtered if p.get("score", 0) >= min_score]
+    df = pd.DataFrame(daily_rollups)
+    if df.empty:
+        current_count = previous_count = 0
+    else:
+        current = pd.to_datetime(df["day"]).dt.date >= cutoff_date
+        current_count = int(df.loc[current, "total_posts"].sum())
+        previous_count = int(df.loc[~current, "total_posts"].sum())
     
-    if min_comments > 0:
-        filtered = [p for p in filtered if p.get("num_comments", 0) >= min_comments]
+    if current_count == 0:
+        growth_rate = -100.0 if previous_count > 0 else 0.0
+    elif previous_count == 0:
+        growth_rate = 100.0
+    else:
+        growth_rate = ((current_count - previous_count) / previous_count) * 100
     
-    if max_age_hours:
-        filtered = [p for p in filtered if p.get("age_hours", 999) <= max_age_hours]
+    current_engagement = (
+        float(df.loc[current, "engagement_sum"].astype(float).sum()) / current_count
+        if current_count > 0 else 0
+    )
+    previous_engagement = (
+        float(df.loc[~current, "engagement_sum"].astype(float).sum()) / previous_count
+        if previous_count > 0 else 0
+    )
     
-    if exclude_nsfw:
-        filtered = [p for p in filtered if not p.get("is_nsfw", False)]
+    engagement_growth = (
+        ((current_engagement - previous_engagement) / previous_engagement) * 100
+        if previous_engagement > 0 else 0
+    )
     
-    return filtered
+    return {
+        "posts_current": current_count,
+        "posts_previous": previous_count,
+        "posts_growth": round(growth_rate, 1),
+        "engagement_current": round(current_engagement, 2),
+        "engagement_previous": round(previous_engagement, 2),
+        "engagement_growth": round(engagement_growth, 1)
+    }
 
 
-def generate_summary_stats(posts: List[Dict]) -> Dict:
-    """
-    Génère des statistiques résumées
+def filter_posts_by_criteria(
+    posts,
+    min_score: int = 0,
+    min_comments: int = 0,
+    max_age_hours: int = 168,  # 7 jours par défaut
+    exclude_nsfw: bool = True,
+    filters: Optional[FilterSpec] = None
+):
     """
-    if not posts:
-        return {
-            "total_posts": 0,
-            "avg_score": 0,
-            "avg_comments": 0,
-            "avg_engagement": 0,
-            "top_subreddit": "N/A",
-            "total_subreddits": 0
-        }
+    Filtre les posts selon des critères (ou selon filters, voir utils/filters.py)
     
-    df = pd.DataFrame(posts)
+    DataFrame : masque vectorisé, une seule passe ; liste de posts : prédicat
+    compilé, une seule passe
+    """
+    filters = filters or FilterSpec(
+        min_score=min_score,
+        min_comments=min_comments,
+        max_age_hours=max_age_hours,
+        exclude_nsfw=exclude_nsfw
+    )
     
-    return {
-        "total_posts": len(posts),
-        "avg_score": round(df["score"].mean(), 1),
-        "avg_comments": round(df["num_comments"].mean(), 1),
-        "avg_engagement": round(df["engagement_score"].mean(), 2),
-        "top_subreddit": df["subreddit"].value_counts().index[0],
-        "total_subreddits": df["subreddit"].nunique(),
-        "total_awards": df["awards"].sum()
-    }
+    if isinstance(posts, pd.DataFrame):
+        return posts[filters.mask(posts)]
+    return filters.filter_posts(posts)
+
+
+def generate_summary_stats(posts) -> Dict:
+    """
+    Génère des statistiques résumées (voir analyze_posts)
+    """
+    return analyze_posts(posts)["summary"]
@@ -0,0 +1,186 @@
+"""
+Module d'archivage Parquet des posts expirés
+
+Avant la purge de rétention, les posts sont copiés dans des fichiers Parquet
+compressés, partitionnés par utilisateur et par mois (format Hive) :
+
+    ARCHIVE_DIR/user_id=<user>/month=<YYYY-MM>/part-<horodatage>.parquet
+
+La lecture passe par pyarrow.dataset : fichiers mappés en mémoire, seules les
+colonnes demandées sont lues et les filtres (utilisateur, mois, date) élaguent
+les partitions et les row groups. Dépendance optionnelle : pyarrow.
+"""
+import os
+import uuid
+from datetime import datetime
+from typing import List, Dict, Optional
+
+import pandas as pd
+
+from utils.filters import post_dates_utc
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - archivage désactivé sans pyarrow
+    pa = None
+
+# Schéma des fichiers archivés (user_id et month sont portés par les dossiers)
+ARCHIVE_COLUMNS = {
+    "post_id": "string",
+    "title": "string",
+    "content": "string",
+    "author": "string",
+    "subreddit": "string",
+    "url": "string",
+    "post_date": "timestamp",
+    "score": "int64",
+    "upvote_ratio": "float64",
+    "num_comments": "int64",
+    "awards": "int64",
+    "is_nsfw": "bool",
+    "matched_keywords": "string",
+    "keywords": "list<string>",
+    "age_hours": "float64",
+    "engagement_score": "float64",
+}
+
+
+def is_archive_available() -> bool:
+    """
+    Indique si l'archivage Parquet est utilisable (pyarrow installé)
+    """
+    return pa is not None
+
+
+def _arrow_schema():
+    types = {
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "list<string>": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in ARCHIVE_COLUMNS.items()])
+
+
+def _dataset_schema():
+    # Schéma complet lu par pyarrow.dataset (colonnes de partitionnement incluses)
+    return _arrow_schema().append(pa.field("user_id", pa.string())).append(pa.field("month", pa.string()))
+
+
+class ParquetArchiveWriter:
+    """
+    Écrit des lots de posts dans l'archive, un fichier par (utilisateur, mois)
+
+    Utilisation :
+        with ParquetArchiveWriter(archive_dir) as writer:
+            for batch in batches:
+                writer.write(batch)
+    """
+
+    def __init__(self, archive_dir: str, compression: str = "zstd"):
+        if pa is None:
+            raise RuntimeError("pyarrow est requis pour l'archivage Parquet")
+
+        self.archive_dir = archive_dir
+        self.compression = compression
+        self.schema = _arrow_schema()
+        self.run_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._writers = {}
+        self.rows_written = 0
+
+    def _writer(self, user_id: str, month: str):
+        key = (user_id, month)
+        if key not in self._writers:
+            directory = os.path.join(self.archive_dir, f"user_id={user_id}", f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{self.run_id}.parquet")
+            self._writers[key] = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        return self._writers[key]
+
+    def write(self, posts: List[Dict]) -> int:
+        """
+        Ajoute un lot de posts à l'archive
+
+        Returns:
+            Nombre de posts écrits
+        """
+        if not posts:
+            return 0
+
+        df = pd.DataFrame(posts)
+        # Dates sans fuseau (SQLite, scraper) : heure locale de la machine
+        df["post_date"] = post_dates_utc(df["post_date"]).to_numpy()
+        df["month"] = df["post_date"].dt.strftime("%Y-%m")
+
+        for column in ARCHIVE_COLUMNS:
+            if column not in df.columns:
+                df[column] = None
+
+        for (user_id, month), group in df.groupby(["user_id", "month"]):
+            table = pa.Table.from_pandas(
+                group[list(ARCHIVE_COLUMNS)],
+                schema=self.schema,
+                preserve_index=False
+            )
+            self._writer(user_id, month).write_table(table)
+
+        self.rows_written += len(df)
+        return len(df)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def load_archived_posts(
+    archive_dir: str,
+    user_id: str = "default",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Lit les posts archivés d'un utilisateur sur une période
+
+    Args:
+        since / until: Bornes de post_date (incluse / exclue), avec fuseau ou
+            naïves (heure locale de la machine, comme les dates stockées)
+        columns: Colonnes à lire (toutes par défaut)
+    """
+    if pa is None or not os.path.isdir(archive_dir):
+        return pd.DataFrame()
+
+    dataset = ds.dataset(
+        archive_dir,
+        format="parquet",
+        partitioning="hive",
+        schema=_dataset_schema(),
+        filesystem=pafs.LocalFileSystem(use_mmap=True)
+    )
+
+    # Filtres poussés au scan : dossiers (user_id, month) puis statistiques des row groups
+    condition = ds.field("user_id") == user_id
+    if since is not None:
+        since = post_dates_utc([since])[0]
+        condition &= ds.field("month") >= since.strftime("%Y-%m")
+        condition &= ds.field("post_date") >= pa.scalar(since.to_pydatetime(), pa.timestamp("us", tz="UTC"))
+    if until is not None:
+        until = post_dates_utc([until])[0]
+        condition &= ds.field("month") <= until.strftime("%Y-%m")
+        condition &= ds.field("post_date") < pa.scalar(until.to_pydatetime(), pa.timestamp("us", tz="UTC"))
+
+    table = dataset.to_table(columns=columns, filter=condition)
+    return table.to_pandas()
@@ -0,0 +1,533 @@
+"""
+Module de cache des requêtes des pages
+
+Chaque interaction relance le script Streamlit de la page : sans cache,
+les mêmes requêtes repartent vers la base à chaque clic. Les résultats
+sont conservés en mémoire, par processus, sous la clé (requête,
+utilisateur, paramètres) :
+- durée de vie (ttl) et taille bornée (éviction LRU)
+- version des données par utilisateur : incrémentée par les écritures
+  (save_posts, cleanup_old_posts, recalculs...), elle rend
+  immédiatement obsolètes tous les résultats de l'utilisateur
+- single-flight : des requêtes identiques simultanées (plusieurs
+  sessions, reruns rapprochés) n'interrogent la base qu'une fois, les
+  autres attendent le résultat du premier appel
+
+Les erreurs ne sont pas mises en cache. Les DataFrames sont copiés à la
+lecture (les pages peuvent les modifier) ; les autres valeurs sont
+partagées et ne doivent pas être modifiées.
+
+Avec plusieurs processus Streamlit (répartiteur de charge), un second
+niveau SharedCache (fichier SQLite local, sans service externe) est
+partagé par tous les processus : les versions des données y sont
+stockées, donc une écriture dans un processus invalide les résultats de
+tous, et un résultat calculé par un processus sert aux autres.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from config.settings import QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_ENTRIES, SHARED_CACHE_MAX_MB
+
+# Ligne de cache_versions portant la version commune à tous les utilisateurs
+_ALL_USERS = "*"
+
+# Les lectures du niveau partagé n'écrivent pas dans le fichier : last_access
+# n'est rafraîchi que s'il date de plus de _TOUCH_SECONDS, et ces mises à jour
+# comme les compteurs hits / misses sont écrits par lots, au plus toutes les
+# _FLUSH_SECONDS (ou avec l'écriture suivante d'un résultat)
+_TOUCH_SECONDS = 30.0
+_FLUSH_SECONDS = 10.0
+
+_SHARED_SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    epoch INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_access ON cache_entries(last_access);
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+    scope TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS cache_counters (
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, name)
+);
+"""
+
+
+class _Flight:
+    """
+    Chargement en cours, partagé par les appels identiques simultanés
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+def _copy(value):
+    return value.copy() if isinstance(value, pd.DataFrame) else value
+
+
+class SharedCache:
+    """
+    Niveau de cache partagé par les processus locaux (fichier SQLite en WAL)
+
+    Les valeurs sont sérialisées avec pickle (fichier écrit par l'application
+    seule). Les versions sont incrémentées atomiquement (une transaction) ;
+    la taille totale est bornée par éviction des résultats les moins
+    récemment lus ; les compteurs hits / misses sont communs aux processus.
+    Une lecture est un simple SELECT (WAL : jamais bloqué par les écritures) ;
+    les dates de dernière lecture et les compteurs sont écrits par lots.
+
+    Args:
+        path: Fichier SQLite du cache
+        scope: Identifiant de la base de données servie (plusieurs bases
+            peuvent partager le fichier sans se mélanger)
+        max_bytes: Taille maximale des valeurs stockées
+    """
+
+    def __init__(self, path: str, scope: str = "", max_bytes: int = SHARED_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.scope = scope
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._pending_touches: Dict[str, float] = {}
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(_SHARED_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Une connexion par thread (sessions Streamlit), réutilisée
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Transaction d'écriture (verrou pris dès le début : pas d'interblocage
+        entre processus), annulée en cas d'exception
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _key(self, cache_key: Tuple) -> str:
+        return hashlib.sha256(repr((self.scope, cache_key)).encode("utf-8")).hexdigest()
+
+    def _add_counter(self, conn: sqlite3.Connection, name: str, value: int) -> None:
+        conn.execute(
+            "INSERT INTO cache_counters (scope, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(scope, name) DO UPDATE SET value = value + excluded.value",
+            (self.scope, name, value)
+        )
+
+    def _take_pending(self) -> Tuple[Dict[str, int], Dict[str, float]]:
+        with self._pending_lock:
+            counts, touches = self._pending_counts, self._pending_touches
+            self._pending_counts = {"hits": 0, "misses": 0}
+            self._pending_touches = {}
+            self._last_flush = time.monotonic()
+        return counts, touches
+
+    def _restore_pending(self, counts: Dict[str, int], touches: Dict[str, float]) -> None:
+        # Écriture échouée : reportée au lot suivant
+        with self._pending_lock:
+            for name, value in counts.items():
+                self._pending_counts[name] += value
+            for key, accessed in touches.items():
+                self._pending_touches[key] = max(accessed, self._pending_touches.get(key, 0.0))
+
+    def _write_pending(self, conn: sqlite3.Connection, counts: Dict[str, int], touches: Dict[str, float]) -> None:
+        for name, value in counts.items():
+            if value:
+                self._add_counter(conn, name, value)
+        conn.executemany(
+            "UPDATE cache_entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+            [(accessed, key) for key, accessed in touches.items()]
+        )
+
+    def flush(self) -> None:
+        """
+        Écrit les compteurs et dates de lecture en attente (une transaction)
+        """
+        counts, touches = self._take_pending()
+        if not touches and not any(counts.values()):
+            return
+        try:
+            with self._transaction() as conn:
+                self._write_pending(conn, counts, touches)
+        except sqlite3.Error:
+            self._restore_pending(counts, touches)
+            raise
+
+    def version(self, user_id: str) -> Tuple[int, int]:
+        """
+        (version commune, version de l'utilisateur)
+        """
+        versions = dict(self._connection().execute(
+            "SELECT user_id, version FROM cache_versions WHERE scope = ? AND user_id IN (?, ?)",
+            (self.scope, _ALL_USERS, user_id)
+        ).fetchall())
+        return versions.get(_ALL_USERS, 0), versions.get(user_id, 0)
+
+    def bump(self, user_id: Optional[str] = None) -> None:
+        """
+        Nouvelle version des données de l'utilisateur (de tous si None)
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO cache_versions (scope, user_id, version) VALUES (?, ?, 1) "
+                "ON CONFLICT(scope, user_id) DO UPDATE SET version = version + 1",
+                (self.scope, user_id or _ALL_USERS)
+            )
+
+    def get(self, cache_key: Tuple, version: Tuple[int, int]) -> Tuple[bool, object]:
+        """
+        (trouvé, valeur) pour une entrée valide de cette version
+        """
+        key = self._key(cache_key)
+        # Lecture seule, hors transaction d'écriture ; une entrée obsolète est
+        # remplacée par le put suivant ou purgée à l'expiration
+        row = self._connection().execute(
+            "SELECT epoch, version, expires_at, last_access, value FROM cache_entries WHERE key = ?",
+            (key,)
+        ).fetchone()
+        now = time.time()
+        hit = row is not None and (row[0], row[1]) == tuple(version) and row[2] > now
+
+        with self._pending_lock:
+            self._pending_counts["hits" if hit else "misses"] += 1
+            if hit and now - row[3] > _TOUCH_SECONDS:
+                self._pending_touches[key] = now
+            due = time.monotonic() - self._last_flush >= _FLUSH_SECONDS
+
+        if due:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Fichier verrouillé : lot reporté, la lecture reste servie
+                pass
+
+        return (True, pickle.loads(row[4])) if hit else (False, None)
+
+    def put(self, cache_key: Tuple, version: Tuple[int, int], value, ttl: float) -> None:
+        """
+        Enregistre une valeur puis évince les entrées expirées et, au-delà de
+        max_bytes, les moins récemment lues
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+
+        now = time.time()
+        counts, touches = self._take_pending()
+        try:
+            with self._transaction() as conn:
+                # Dates de lecture en attente d'abord : ordre LRU à jour pour l'éviction
+                self._write_pending(conn, counts, touches)
+                self._put(conn, cache_key, version, blob, now, ttl)
+        except sqlite3.Error:
+            self._restore_pending(counts, touches)
+            raise
+
+    def _put(
+        self,
+        conn: sqlite3.Connection,
+        cache_key: Tuple,
+        version: Tuple[int, int],
+        blob: bytes,
+        now: float,
+        ttl: float
+    ) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries "
+            "(key, epoch, version, expires_at, last_access, size, value) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self._key(cache_key), version[0], version[1], now + ttl, now, len(blob), blob)
+        )
+        conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        evicted = conn.execute(
+            "DELETE FROM cache_entries WHERE key IN ("
+            "    SELECT key FROM ("
+            "        SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS total "
+            "        FROM cache_entries"
+            "    ) WHERE total > ?"
+            ")",
+            (self.max_bytes,)
+        ).rowcount
+        if evicted:
+            self._add_counter(conn, "evictions", evicted)
+
+    def stats(self) -> Dict:
+        """
+        Compteurs communs {hits, misses, evictions, entries, bytes, hit_rate}
+        (lots en attente de ce processus écrits d'abord)
+        """
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+        conn = self._connection()
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        stats.update(dict(conn.execute(
+            "SELECT name, value FROM cache_counters WHERE scope = ?", (self.scope,)
+        ).fetchall()))
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(entries=entries, bytes=size, hit_rate=stats["hits"] / lookups if lookups else 0.0)
+        return stats
+
+
+class QueryCache:
+    """
+    Cache mémoire des résultats de requêtes, versionné par utilisateur
+
+    Args:
+        ttl: Durée de vie par défaut d'un résultat (secondes)
+        max_entries: Nombre maximal de résultats conservés
+        shared: Niveau partagé entre processus (optionnel) : les versions y
+            sont lues, et les résultats absents de la mémoire y sont cherchés
+            avant d'interroger la base. S'il est indisponible (fichier
+            verrouillé, disque plein), les requêtes vont directement à la base ;
+            si une invalidation n'a pas pu y être écrite, les résultats de
+            l'utilisateur ne sont servis que par la mémoire (versions locales)
+            jusqu'à ce qu'elle réussisse.
+    """
+
+    def __init__(
+        self,
+        ttl: float = QUERY_CACHE_TTL_SECONDS,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        shared: Optional[SharedCache] = None
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple, float, object]]" = OrderedDict()
+        self._flights: Dict[Tuple, _Flight] = {}
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        # Invalidations non écrites dans le niveau partagé (user_id ou _ALL_USERS)
+        self._pending_bumps = set()
+        self._last_bump_retry = 0.0
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "bypassed": 0}
+
+    def _version(self, user_id: str) -> Tuple[Tuple, bool]:
+        """
+        (version des données de l'utilisateur, niveau partagé utilisable)
+        """
+        if self.shared is not None and self._shared_current(user_id):
+            return self.shared.version(user_id), True
+        with self._lock:
+            return ("local", self._epoch, self._versions.get(user_id, 0)), False
+
+    def _shared_current(self, user_id: str) -> bool:
+        """
+        Vrai si aucune invalidation de l'utilisateur n'attend d'être écrite
+        dans le niveau partagé (nouvel essai au plus toutes les _FLUSH_SECONDS)
+        """
+        with self._lock:
+            pending = set(self._pending_bumps)
+            retry = pending and time.monotonic() - self._last_bump_retry >= _FLUSH_SECONDS
+            if retry:
+                self._last_bump_retry = time.monotonic()
+
+        if retry:
+            for pending_user in pending:
+                try:
+                    self.shared.bump(None if pending_user == _ALL_USERS else pending_user)
+                except sqlite3.Error:
+                    continue
+                with self._lock:
+                    self._pending_bumps.discard(pending_user)
+
+        with self._lock:
+            return user_id not in self._pending_bumps and _ALL_USERS not in self._pending_bumps
+
+    def _bump_shared(self, user_id: str) -> None:
+        try:
+            self.shared.bump(None if user_id == _ALL_USERS else user_id)
+        except sqlite3.Error:
+            with self._lock:
+                self._pending_bumps.add(user_id)
+                self._last_bump_retry = time.monotonic()
+            raise
+
+    def get_or_load(
+        self,
+        namespace: str,
+        user_id: str,
+        key: Hashable,
+        loader: Callable[[], object],
+        ttl: Optional[float] = None
+    ):
+        """
+        Résultat en cache de (namespace, user_id, key), sinon loader()
+
+        Une exception de loader est propagée (à tous les appels en attente)
+        et rien n'est mis en cache.
+        """
+        cache_key = (namespace, user_id, key)
+        ttl = self.ttl if ttl is None else ttl
+
+        try:
+            version, use_shared = self._version(user_id)
+        except sqlite3.Error:
+            # Version partagée illisible : aucune garantie de fraîcheur
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+                self._entries.move_to_end(cache_key)
+                self._stats["hits"] += 1
+                return _copy(entry[2])
+
+            flight_key = (cache_key, version)
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return _copy(flight.value)
+
+        try:
+            found, value = self._shared_get(cache_key, version) if use_shared else (False, None)
+            if found:
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+            else:
+                with self._lock:
+                    self._stats["misses"] += 1
+                value = loader()
+            flight.value = value
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            # Données modifiées pendant le chargement : résultat non conservé
+            try:
+                current = self._version(user_id)[0] == version
+            except sqlite3.Error:
+                current = False
+
+            if current:
+                if use_shared and not found:
+                    self._shared_put(cache_key, version, value, ttl)
+                with self._lock:
+                    self._entries[cache_key] = (version, time.monotonic() + ttl, value)
+                    self._entries.move_to_end(cache_key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats["evictions"] += 1
+            return _copy(value)
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+            flight.done.set()
+
+    def _shared_get(self, cache_key: Tuple, version: Tuple[int, int]) -> Tuple[bool, object]:
+        if self.shared is None:
+            return False, None
+        try:
+            return self.shared.get(cache_key, version)
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Niveau partagé indisponible ou valeur illisible : lecture en base
+            return False, None
+
+    def _shared_put(self, cache_key: Tuple, version: Tuple[int, int], value, ttl: float) -> None:
+        if self.shared is None:
+            return
+        try:
+            self.shared.put(cache_key, version, value, ttl)
+        except (sqlite3.Error, pickle.PicklingError, TypeError, AttributeError):
+            # Valeur non sérialisable ou fichier verrouillé : mémoire seule
+            pass
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Rend obsolètes tous les résultats de l'utilisateur (nouvelle version,
+        dans tous les processus avec le niveau partagé)
+        """
+        # Mémoire d'abord : même si le fichier partagé est indisponible
+        # (sqlite3.Error propagée), ce processus ne sert plus de résultat périmé
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            for cache_key in [k for k in self._entries if k[1] == user_id]:
+                del self._entries[cache_key]
+        if self.shared is not None:
+            self._bump_shared(user_id)
+
+    def invalidate_all(self) -> None:
+        """
+        Rend obsolètes les résultats de tous les utilisateurs
+        """
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+        if self.shared is not None:
+            self._bump_shared(_ALL_USERS)
+
+    def stats(self) -> Dict:
+        """
+        Compteurs du processus {hits, shared_hits, misses, coalesced,
+        evictions, bypassed, entries, hit_rate} et, avec le niveau partagé,
+        ceux communs aux processus (clé shared, voir SharedCache.stats)
+        """
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        served = stats["hits"] + stats["shared_hits"] + stats["coalesced"]
+        lookups = served + stats["misses"] + stats["bypassed"]
+        stats["hit_rate"] = served / lookups if lookups else 0.0
+
+        if self.shared is not None:
+            try:
+                stats["shared"] = self.shared.stats()
+            except sqlite3.Error:
+                stats["shared"] = None
+        return stats
@@ -1,22 +1,163 @@
 """
-Module de gestion de la base de données Supabase
+Module de gestion de la base de données
+
+Point d'entrée unique des pages : délègue au backend de stockage configuré
+(Supabase ou SQLite embarqué, voir utils/storage.py), affiche les erreurs
+dans l'interface et convertit les résultats en DataFrame.
 """
+import os
+import sqlite3
 import streamlit as st
-from supabase import create_client, Client
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable, Iterable, Iterator
+
+from config.settings import (
+    STORAGE_BACKEND, SQLITE_PATH, ARCHIVE_ENABLED, ARCHIVE_DIR, RETENTION_DAYS, DISCOVERY_DAYS,
+    SHARED_CACHE_ENABLED, SHARED_CACHE_PATH
+)
+from .storage import StorageBackend, POST_COLUMNS, SORT_COLUMNS, resolve_columns
+from .archive import ParquetArchiveWriter, is_archive_available, load_archived_posts
+from .analyzer import build_score_matrix
+from .formula import compile_formula
+from .filters import FilterSpec
+from .sketches import build_daily_sketch, merge_daily_sketches
+from .dedup import post_signatures, band_keys, cluster_signatures
+from .keyword_mining import KeywordMiner
+from .discovery import summarize_activity, rank_subreddits
+from .sentiment import post_text, score_texts_parallel
+from .cache import QueryCache, SharedCache
+
+
+_storage: Optional[StorageBackend] = None
+
+# Résultats des lectures des pages, invalidés par les écritures (utils/cache.py)
+_query_cache: Optional[QueryCache] = None
+
+
+def _storage_setting(name: str) -> Optional[str]:
+    """
+    Lit un paramètre de la section [storage] de secrets.toml (optionnelle)
+    """
+    try:
+        return st.secrets.get("storage", {}).get(name)
+    except Exception:
+        return None
+
+
+def get_storage_backend_name() -> str:
+    """
+    Nom du backend de stockage configuré ("supabase" ou "sqlite")
+    
+    Ordre de priorité: variable d'environnement REDDIT_MONITOR_STORAGE,
+    section [storage] de secrets.toml, puis STORAGE_BACKEND (config/settings.py)
+    """
+    return (
+        os.environ.get("REDDIT_MONITOR_STORAGE")
+        or _storage_setting("backend")
+        or STORAGE_BACKEND
+    )
+
+
+def _sqlite_path() -> str:
+    return (
+        os.environ.get("REDDIT_MONITOR_SQLITE_PATH")
+        or _storage_setting("path")
+        or SQLITE_PATH
+    )
+
+
+def get_storage() -> StorageBackend:
+    """
+    Retourne le backend de stockage configuré (instance unique par processus)
+    """
+    global _storage
+    
+    if _storage is None:
+        if get_storage_backend_name() == "sqlite":
+            from .sqlite_storage import SQLiteStorage
+            
+            _storage = SQLiteStorage(_sqlite_path())
+        else:
+            from .supabase_storage import SupabaseStorage
+            
+            _storage = SupabaseStorage(
+                st.secrets["supabase"]["url"],
+                st.secrets["supabase"]["key"]
+            )
+    
+    return _storage
 
 
-def get_supabase_client() -> Client:
+def get_supabase_client():
     """
     Initialise et retourne le client Supabase
     """
+    from supabase import create_client
+    
     url = st.secrets["supabase"]["url"]
     key = st.secrets["supabase"]["key"]
     return create_client(url, key)
 
 
+def _get_query_cache() -> QueryCache:
+    """
+    Cache des lectures (instance unique par processus), avec le niveau
+    partagé entre processus si SHARED_CACHE_ENABLED
+    
+    Le fichier partagé est indiqué par REDDIT_MONITOR_CACHE_PATH, la clé
+    cache_path de la section [storage] de secrets.toml, ou SHARED_CACHE_PATH.
+    """
+    global _query_cache
+    
+    if _query_cache is None:
+        shared = None
+        if SHARED_CACHE_ENABLED:
+            backend = get_storage_backend_name()
+            if backend == "sqlite":
+                scope = f"sqlite:{os.path.abspath(_sqlite_path())}"
+            else:
+                scope = f"{backend}:{st.secrets['supabase']['url']}"
+            
+            path = (
+                os.environ.get("REDDIT_MONITOR_CACHE_PATH")
+                or _storage_setting("cache_path")
+                or SHARED_CACHE_PATH
+            )
+            try:
+                shared = SharedCache(path, scope=scope)
+            except (sqlite3.Error, OSError) as e:
+                st.warning(f"Cache partagé indisponible, cache mémoire seul: {e}")
+        
+        _query_cache = QueryCache(shared=shared)
+    
+    return _query_cache
+
+
+def invalidate_user_cache(user_id: Optional[str] = None) -> None:
+    """
+    Invalide les lectures en cache de l'utilisateur (de tous si None),
+    dans tous les processus, après une écriture
+    """
+    try:
+        if user_id is None:
+            _get_query_cache().invalidate_all()
+        else:
+            _get_query_cache().invalidate(user_id)
+    except sqlite3.Error as e:
+        st.warning(f"Cache partagé non invalidé (résultats possiblement périmés jusqu'à expiration): {e}")
+
+
+def get_cache_stats() -> Dict:
+    """
+    Compteurs du cache des lectures de ce processus {hits, shared_hits,
+    misses, coalesced, evictions, bypassed, entries, hit_rate} et du niveau
+    partagé (clé shared : hits, misses, evictions, entries, bytes, hit_rate)
+    """
+    return _get_query_cache().stats()
+
+
 def init_database():
     """
     Initialise les tables de la base de données si elles n'existent pas
@@ -27,10 +168,10 @@ def init_database():
     - posts: Posts Reddit collectés
     - user_configs: Configuration par utilisateur
     """
-    client = get_supabase_client()
-    
-    # Note: Les tables doivent être créées manuellement dans Supabase
-    # Voir le fichier SQL fourni: database_schema.sql
+    # Note: Avec Supabase, les tables doivent être créées manuellement
+    # (voir database_schema.sql). Le backend SQLite applique
+    # database_schema_sqlite.sql automatiquement.
+    get_storage()
     return True
 
 
@@ -39,14 +180,8 @@ def add_keyword(keyword: str, user_id: str = "default") -> bool:
     Ajoute un mot-clé à surveiller
     """
     try:
-        client = get_supabase_client()
-        data = {
-            "keyword": keyword.lower().strip(),
-            "user_id": user_id,
-            "active": True,
-            "created_at": datetime.now().isoformat()
-        }
-        client.table("keywords").insert(data).execute()
+        get_storage().add_keyword(keyword, user_id)
+        invalidate_user_cache(user_id)
         return True
     except Exception as e:
         st.error(f"Erreur lors de l'ajout du mot-clé: {e}")
@@ -58,14 +193,10 @@ def get_keywords(user_id: str = "default", active_only: bool = True) -> List[str
     Récupère la liste des mots-clés
     """
     try:
-        client = get_supabase_client()
-        query = client.table("keywords").select("keyword").eq("user_id", user_id)
-        
-        if active_only:
-            query = query.eq("active", True)
-        
-        response = query.execute()
-        return [item["keyword"] for item in response.data]
+        return _get_query_cache().get_or_load(
+            "keywords", user_id, active_only,
+            lambda: get_storage().get_keywords(user_id, active_only)
+        )
     except Exception as e:
         st.error(f"Erreur lors de la récupération des mots-clés: {e}")
         return []
@@ -76,8 +207,8 @@ def delete_keyword(keyword: str, user_id: str = "default") -> bool:
     Supprime un mot-clé
     """
     try:
-        client = get_supabase_client()
-        client.table("keywords").delete().eq("keyword", keyword).eq("user_id", user_id).execute()
+        get_storage().delete_keyword(keyword, user_id)
+        invalidate_user_cache(user_id)
         return True
     except Exception as e:
         st.error(f"Erreur lors de la suppression: {e}")
@@ -89,15 +220,8 @@ def add_subreddit(subreddit: str, list_type: str = "whitelist", user_id: str = "
     Ajoute un subreddit à la whitelist ou blacklist
     """
     try:
-        client = get_supabase_client()
-        data = {
-            "subreddit": subreddit.lower().strip(),
-            "list_type": list_type,
-            "user_id": user_id,
-            "active": True,
-            "created_at": datetime.now().isoformat()
-        }
-        client.table("subreddits").insert(data).execute()
+        get_storage().add_subreddit(subreddit, list_type, user_id)
+        invalidate_user_cache(user_id)
         return True
     except Exception as e:
         st.error(f"Erreur lors de l'ajout du subreddit: {e}")
@@ -109,16 +233,10 @@ def get_subreddits(list_type: str = "whitelist", user_id: str = "default") -> Li
     Récupère la liste des subreddits
     """
     try:
-        client = get_supabase_client()
-        response = (
-            client.table("subreddits")
-            .select("subreddit")
-            .eq("user_id", user_id)
-            .eq("list_type", list_type)
-            .eq("active", True)
-            .execute()
+        return _get_query_cache().get_or_load(
+            "subreddits", user_id, list_type,
+            lambda: get_storage().get_subreddits(list_type, user_id)
         )
-        return [item["subreddit"] for item in response.data]
     except Exception as e:
         st.error(f"Erreur lors de la récupération des subreddits: {e}")
         return []
@@ -129,8 +247,8 @@ def delete_subreddit(subreddit: str, user_id: str = "default") -> bool:
     Supprime un subreddit
     """
     try:
-        client = get_supabase_client()
-        client.table("subreddits").delete().eq("subreddit", subreddit).eq("user_id", user_id).execute()
+        get_storage().delete_subreddit(subreddit, user_id)
+        invalidate_user_cache(user_id)
         return True
     except Exception as e:
         st.error(f"Erreur lors de la suppression: {e}")
@@ -141,19 +259,93 @@ def save_posts(posts_data: List[Dict]) -> bool:
     """
     Sauvegarde les posts collectés dans la base de données
     """
+    user_ids = {post.get("user_id", "default") for post in posts_data}
+    
     try:
-        client = get_supabase_client()
-        
         # Préparation des données
         for post in posts_data:
             post["created_at"] = datetime.now().isoformat()
+            
+            # Mots-clés normalisés (text[]) : filtrage indexé, sans faux positifs
+            if not post.get("keywords"):
+                post["keywords"] = [
+                    kw.strip() for kw in (post.get("matched_keywords") or "").split(",")
+                    if kw.strip()
+                ]
         
-        # Insertion par batch (éviter les doublons via post_id unique)
-        client.table("posts").upsert(posts_data, on_conflict="post_id").execute()
-        return True
+        storage = get_storage()
+        signature_rows = assign_clusters(posts_data)
+        storage.save_posts(posts_data)
+        if signature_rows:
+            storage.save_signatures(signature_rows)
     except Exception as e:
         st.error(f"Erreur lors de la sauvegarde des posts: {e}")
+        for user_id in user_ids:
+            invalidate_user_cache(user_id)
         return False
+    
+    # Sketches des jours touchés (les posts sont déjà enregistrés)
+    days_by_user = {}
+    for post in posts_data:
+        if post.get("post_date"):
+            days_by_user.setdefault(post.get("user_id", "default"), set()).add(str(post["post_date"])[:10])
+    
+    for user_id, days in days_by_user.items():
+        refresh_daily_sketches(user_id, days)
+    
+    posts_by_user = {}
+    for post in posts_data:
+        posts_by_user.setdefault(post.get("user_id", "default"), []).append(post)
+    
+    for user_id, posts in posts_by_user.items():
+        update_keyword_mining(user_id, posts)
+        refresh_subreddit_discovery(user_id, {post["subreddit"] for post in posts if post.get("subreddit")})
+    
+    # Posts, agrégats et sketches modifiés : les pages relisent la base
+    for user_id in user_ids:
+        invalidate_user_cache(user_id)
+    
+    return True
+
+
+def assign_clusters(posts_data: List[Dict]) -> List[Dict]:
+    """
+    Renseigne cluster_id sur chaque post (groupes de quasi-doublons, voir
+    utils/dedup.py), en rattachant les posts aux groupes déjà en base
+    
+    Returns:
+        Signatures à enregistrer (storage.save_signatures) ; liste vide si
+        le regroupement a échoué (chaque post forme alors son propre groupe)
+    """
+    for post in posts_data:
+        post["cluster_id"] = post["post_id"]
+    
+    try:
+        storage = get_storage()
+        rows = []
+        posts_by_user = {}
+        for post in posts_data:
+            posts_by_user.setdefault(post.get("user_id", "default"), []).append(post)
+        
+        for user_id, posts in posts_by_user.items():
+            signatures = post_signatures(posts)
+            keys = sorted({key for signature in signatures.values() for key in band_keys(signature)})
+            known = storage.get_signature_candidates(user_id, keys) if keys else []
+            
+            cluster_ids, user_rows = cluster_signatures(signatures, known)
+            dates = {post["post_id"]: post["post_date"] for post in posts}
+            
+            for post in posts:
+                post["cluster_id"] = cluster_ids.get(post["post_id"], post["post_id"])
+            rows += [
+                {**row, "user_id": user_id, "post_date": dates[row["post_id"]]}
+                for row in user_rows
+            ]
+        
+        return rows
+    except Exception as e:
+        st.warning(f"Regroupement des doublons ignoré: {e}")
+        return []
 
 
 def get_posts(
@@ -161,36 +353,66 @@ def get_posts(
     days: int = 7,
     limit: int = 100,
     subreddit: Optional[str] = None,
-    keyword: Optional[str] = None
+    keyword: Optional[str] = None,
+    columns: str = "export",
+    sort_by: str = "engagement_score",
+    cursor: Optional[Tuple] = None,
+    filters: Optional[FilterSpec] = None
 ) -> pd.DataFrame:
     """
     Récupère les posts de la base de données
+    
+    Args:
+        subreddit, keyword: Raccourcis, ajoutés aux critères de filters
+        columns: Nom d'une projection de POST_COLUMNS ("list", "analytics",
+            "export") ou liste de colonnes ("a, b" ou ["a", "b"]). Le contenu
+            complet (stocké à part) n'est chargé que pour "export" ou si
+            "content" est demandé explicitement.
+        sort_by: Colonne de tri décroissant (voir SORT_COLUMNS)
+        cursor: Curseur de pagination (valeur de tri, id) du dernier post de
+            la page précédente, voir get_next_cursor
+        filters: Critères (utils/filters.py), poussés dans la requête
     """
-    try:
-        client = get_supabase_client()
-        
-        # Date limite
-        date_limit = (datetime.now() - timedelta(days=days)).isoformat()
-        
-        query = (
-            client.table("posts")
-            .select("*")
-            .eq("user_id", user_id)
-            .gte("post_date", date_limit)
-            .order("engagement_score", desc=True)
-            .limit(limit)
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Tri non supporté: {sort_by}")
+    
+    filters = (filters or FilterSpec()).merged(subreddit=subreddit, keyword=keyword)
+    
+    columns = resolve_columns(columns)
+    with_content = columns is None or "content" in columns
+    if columns is not None and with_content:
+        columns = [col for col in columns if col != "content"]
+        if "post_id" not in columns:
+            columns.append("post_id")
+    
+    def load() -> List[Dict]:
+        storage = get_storage()
+        posts = storage.get_posts(
+            user_id=user_id,
+            days=days,
+            limit=limit,
+            filters=filters,
+            columns=columns,
+            sort_by=sort_by,
+            cursor=cursor
         )
         
-        if subreddit:
-            query = query.eq("subreddit", subreddit)
-        
-        if keyword:
-            query = query.ilike("matched_keywords", f"%{keyword}%")
-        
-        response = query.execute()
+        # Contenu complet : une seule requête pour toute la page
+        if posts and with_content:
+            bodies = storage.get_post_bodies([post["post_id"] for post in posts])
+            for post in posts:
+                post["content"] = bodies.get(post["post_id"], "")
+        return posts
+    
+    try:
+        posts = _get_query_cache().get_or_load(
+            "posts", user_id,
+            (days, limit, tuple(columns) if columns else None, with_content, sort_by, cursor, filters),
+            load
+        )
         
-        if response.data:
-            return pd.DataFrame(response.data)
+        if posts:
+            return pd.DataFrame(posts)
         else:
             return pd.DataFrame()
             
@@ -199,6 +421,91 @@ def get_posts(
         return pd.DataFrame()
 
 
+def get_next_cursor(
+    posts_df: pd.DataFrame,
+    sort_by: str = "engagement_score",
+    limit: int = 100
+) -> Optional[Tuple]:
+    """
+    Calcule le curseur de la page suivante à partir d'une page de get_posts
+    
+    Returns:
+        (valeur de tri, id) du dernier post, ou None s'il n'y a plus de page
+    """
+    if posts_df.empty or len(posts_df) < limit or "id" not in posts_df.columns:
+        return None
+    
+    last_post = posts_df.iloc[-1]
+    value = last_post[sort_by]
+    
+    # Scalaires numpy -> types Python (sérialisables par tous les backends)
+    if hasattr(value, "item"):
+        value = value.item()
+    
+    return (value, int(last_post["id"]))
+
+
+def get_post_content(post_id: str) -> str:
+    """
+    Récupère le contenu complet (selftext) d'un post, à la demande
+    """
+    try:
+        return get_storage().get_post_content(post_id)
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération du contenu: {e}")
+        return ""
+
+
+def search_posts(
+    user_id: str = "default",
+    query: str = "",
+    days: int = 30,
+    subreddit: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    filters: Optional[FilterSpec] = None
+) -> pd.DataFrame:
+    """
+    Recherche plein texte (titre + contenu)
+    
+    La requête utilise la syntaxe websearch ("phrase exacte", OR,
+    -exclusion). Les résultats sont triés par pertinence et contiennent
+    en plus les colonnes title_highlight / content_highlight (termes en gras),
+    rank et total_count (nombre total de résultats, pour la pagination).
+    
+    Args:
+        subreddit: Raccourci, ajouté aux critères de filters
+        filters: Critères (utils/filters.py), appliqués dans la requête
+            comme pour get_posts
+    """
+    if not query.strip():
+        return pd.DataFrame()
+    
+    filters = (filters or FilterSpec()).merged(subreddit=subreddit)
+    
+    try:
+        posts = _get_query_cache().get_or_load(
+            "search", user_id, (query, days, filters, limit, offset),
+            lambda: get_storage().search_posts(
+                user_id=user_id,
+                query=query,
+                days=days,
+                filters=filters,
+                limit=limit,
+                offset=offset
+            )
+        )
+        
+        if posts:
+            return pd.DataFrame(posts)
+        else:
+            return pd.DataFrame()
+            
+    except Exception as e:
+        st.error(f"Erreur lors de la recherche: {e}")
+        return pd.DataFrame()
+
+
 def get_top_posts_weekly(user_id: str = "default", limit: int = 20) -> pd.DataFrame:
     """
     Récupère les top posts de la semaine
@@ -209,36 +516,22 @@ def get_top_posts_weekly(user_id: str = "default", limit: int = 20) -> pd.DataFr
 def get_stats(user_id: str = "default", days: int = 7) -> Dict:
     """
     Récupère les statistiques globales
+
+    Agrégation côté base (RPC get_user_stats avec Supabase) :
+    une seule ligne transite au lieu des posts bruts.
     """
     try:
-        client = get_supabase_client()
-        date_limit = (datetime.now() - timedelta(days=days)).isoformat()
-        
-        # Nombre total de posts
-        response = (
-            client.table("posts")
-            .select("*", count="exact")
-            .eq("user_id", user_id)
-            .gte("post_date", date_limit)
-            .execute()
+        data = _get_query_cache().get_or_load(
+            "stats", user_id, days, lambda: get_storage().get_stats(user_id, days, top=5)
         )
         
-        total_posts = response.count if response.count else 0
-        
-        # Subreddits les plus actifs
-        posts_df = get_posts(user_id=user_id, days=days, limit=1000)
-        
-        if not posts_df.empty:
-            top_subreddits = posts_df["subreddit"].value_counts().head(5).to_dict()
-            avg_engagement = posts_df["engagement_score"].mean()
-        else:
-            top_subreddits = {}
-            avg_engagement = 0
-        
         return {
-            "total_posts": total_posts,
-            "top_subreddits": top_subreddits,
-            "avg_engagement": avg_engagement,
+            "total_posts": data.get("total_posts", 0),
+            "top_subreddits": {
+                item["subreddit"]: item["total_posts"]
+                for item in data.get("top_subreddits", [])
+            },
+            "avg_engagement": float(data.get("avg_engagement") or 0),
             "period_days": days
         }
         
@@ -252,36 +545,533 @@ def get_stats(user_id: str = "default", days: int = 7) -> Dict:
         }
 
 
-def cleanup_old_posts(days: int = 30) -> bool:
+def get_subreddit_stats(
+    user_id: str = "default",
+    days: int = 7,
+    subreddit: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Statistiques par subreddit calculées côté base
+    
+    Même format que analyze_by_subreddit (colonnes en français)
+    """
+    try:
+        rows = _get_query_cache().get_or_load(
+            "subreddit_stats", user_id, (days, subreddit),
+            lambda: get_storage().get_subreddit_stats(user_id, days, subreddit)
+        )
+        
+        if not rows:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame(rows)
+        df = df[["subreddit", "total_posts", "avg_score", "avg_comments", "avg_engagement"]]
+        df.columns = [
+            "Subreddit",
+            "Nombre de posts",
+            "Score moyen",
+            "Commentaires moyens",
+            "Engagement moyen"
+        ]
+        return df
+        
+    except Exception as e:
+        st.error(f"Erreur lors du calcul des stats par subreddit: {e}")
+        return pd.DataFrame()
+
+
+def get_keyword_stats(
+    user_id: str = "default",
+    days: int = 7,
+    subreddit: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Statistiques par mot-clé calculées côté base
+    
+    Même format que analyze_by_keyword (colonnes en français)
+    """
+    try:
+        rows = _get_query_cache().get_or_load(
+            "keyword_stats", user_id, (days, subreddit),
+            lambda: get_storage().get_keyword_stats(user_id, days, subreddit)
+        )
+        
+        if not rows:
+            return pd.DataFrame()
+        
+        df = pd.DataFrame(rows)
+        df = df[["keyword", "total_posts", "avg_score", "avg_engagement"]]
+        df.columns = [
+            "Mot-clé",
+            "Nombre de posts",
+            "Score moyen",
+            "Engagement moyen"
+        ]
+        return df
+        
+    except Exception as e:
+        st.error(f"Erreur lors du calcul des stats par mot-clé: {e}")
+        return pd.DataFrame()
+
+
+def get_daily_rollups(
+    user_id: str = "default",
+    days: int = 30,
+    dimension: Optional[str] = None,
+    names: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Série journalière lue dans les agrégats (rollups) maintenus à l'écriture
+
+    Une ligne par jour (dimension None) ou par jour et subreddit / mot-clé
+    (dimension "subreddit" / "keyword", colonne name), limitée à names si fourni.
+    Le volume lu ne dépend que du nombre de jours, pas du nombre de posts.
+    """
+    try:
+        rows = _get_query_cache().get_or_load(
+            "daily_rollups", user_id, (days, dimension, tuple(names) if names else None),
+            lambda: get_storage().get_daily_rollups(user_id, days, dimension=dimension, names=names)
+        )
+        
+        if rows:
+            return pd.DataFrame(rows)
+        else:
+            return pd.DataFrame()
+            
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération des agrégats: {e}")
+        return pd.DataFrame()
+
+
+def get_rollup_totals(
+    user_id: str = "default",
+    days: int = 30,
+    dimension: str = "subreddit"
+) -> pd.DataFrame:
+    """
+    Totaux de la période par subreddit ou mot-clé (colonnes name,
+    total_posts, engagement_sum), du plus actif au moins actif
+    """
+    try:
+        rows = _get_query_cache().get_or_load(
+            "rollup_totals", user_id, (days, dimension),
+            lambda: get_storage().get_rollup_totals(user_id, days, dimension=dimension)
+        )
+        
+        if rows:
+            return pd.DataFrame(rows)
+        else:
+            return pd.DataFrame()
+            
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération des agrégats: {e}")
+        return pd.DataFrame()
+
+
+def get_active_subreddits(user_id: str = "default", days: int = 30) -> List[str]:
+    """
+    Subreddits ayant des posts sur la période, triés par nom (depuis les
+    agrégats : aucun post n'est lu)
+    """
+    totals = get_rollup_totals(user_id, days=days, dimension="subreddit")
+    return sorted(totals["name"].tolist()) if not totals.empty else []
+
+
+def get_activity_heatmap(user_id: str = "default", days: int = 30) -> pd.DataFrame:
+    """
+    Nombre de posts par jour de la semaine (0 = lundi) et heure, depuis les agrégats
+    """
+    try:
+        rows = _get_query_cache().get_or_load(
+            "activity_heatmap", user_id, days,
+            lambda: get_storage().get_activity_heatmap(user_id, days)
+        )
+        
+        if rows:
+            return pd.DataFrame(rows)
+        else:
+            return pd.DataFrame()
+            
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération de la heatmap: {e}")
+        return pd.DataFrame()
+
+
+# Colonnes des posts lues pour reconstruire les sketches d'un jour
+SKETCH_SOURCE_COLUMNS = ["author", "subreddit", "score", "engagement_score"]
+
+
+def _iter_day_posts(storage: StorageBackend, user_id: str, day: str, batch_size: int) -> Iterator[Dict]:
+    after_id = 0
+    while True:
+        batch = storage.get_day_posts(user_id, day, SKETCH_SOURCE_COLUMNS, after_id=after_id, limit=batch_size)
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        after_id = batch[-1]["id"]
+
+
+def refresh_daily_sketches(user_id: str, days: Iterable[str], batch_size: int = 1000) -> bool:
+    """
+    Reconstruit les sketches journaliers (utils/sketches.py) des jours donnés
+    ("YYYY-MM-DD") depuis les posts stockés
+    
+    Les jours déjà touchés par la rétention sont ignorés : leurs sketches,
+    calculés quand tous les posts étaient présents, restent valables.
+    """
+    oldest_day = (datetime.now() - timedelta(days=RETENTION_DAYS - 1)).date().isoformat()
+    
+    try:
+        storage = get_storage()
+        rows = [
+            build_daily_sketch(user_id, day, _iter_day_posts(storage, user_id, day, batch_size))
+            for day in sorted(set(days))
+            if day >= oldest_day
+        ]
+        
+        if rows:
+            storage.save_daily_sketches(rows)
+        return True
+    except Exception as e:
+        st.warning(f"Sketches journaliers non mis à jour: {e}")
+        return False
+
+
+def get_window_sketches(user_id: str = "default", days: int = 30) -> Optional[Dict]:
+    """
+    Sketches de la période, fusionnés depuis les lignes journalières
+    
+    Returns:
+        Dict {posts, days, authors, subreddits (HyperLogLog : .count()),
+        score, engagement (DDSketch : .quantile(q), .histogram())},
+        None en cas d'erreur
+    """
+    try:
+        return _get_query_cache().get_or_load(
+            "window_sketches", user_id, days,
+            lambda: merge_daily_sketches(get_storage().get_daily_sketches(user_id, days))
+        )
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération des sketches: {e}")
+        return None
+
+
+def update_keyword_mining(user_id: str, posts: List[Dict]) -> bool:
+    """
+    Ajoute les titres des posts à l'état incrémental de fouille des termes
+    (utils/keyword_mining.py) ; les posts déjà comptés sont ignorés
+    """
+    try:
+        storage = get_storage()
+        miner = KeywordMiner.from_text(storage.get_keyword_mining_state(user_id))
+        if miner.update(posts, storage.get_keywords(user_id)):
+            storage.save_keyword_mining_state(user_id, miner.to_text())
+        return True
+    except Exception as e:
+        st.warning(f"Suggestions de mots-clés non mises à jour: {e}")
+        return False
+
+
+def get_keyword_miner(user_id: str = "default") -> Optional[KeywordMiner]:
+    """
+    État de fouille des termes de l'utilisateur (.suggestions(keywords),
+    .redundant_pairs(keywords)), None en cas d'erreur
+    """
+    try:
+        return KeywordMiner.from_text(get_storage().get_keyword_mining_state(user_id))
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération des suggestions: {e}")
+        return None
+
+
+def refresh_subreddit_discovery(user_id: str, subreddits: Optional[Iterable[str]] = None) -> bool:
+    """
+    Recalcule depuis les agrégats le classement de découverte (utils/discovery.py)
+    des subreddits donnés (tous si None)
+    """
+    try:
+        storage = get_storage()
+        names = sorted(set(subreddits)) if subreddits is not None else None
+        if names == []:
+            return True
+        
+        rows = summarize_activity(user_id, storage.get_subreddit_activity(user_id, DISCOVERY_DAYS, names))
+        if rows:
+            storage.save_subreddit_discovery(rows)
+        return True
+    except Exception as e:
+        st.warning(f"Classement des subreddits non mis à jour: {e}")
+        return False
+
+
+def get_subreddit_candidates(user_id: str = "default", limit: int = 20) -> pd.DataFrame:
+    """
+    Subreddits à ajouter à une liste, du plus pertinent au moins pertinent
+    (colonnes subreddit, score, recent_hits, hit_rate, engagement_per_post,
+    keywords_matched, posts, last_day) ; ceux déjà en whitelist ou blacklist
+    sont exclus
+    """
+    try:
+        storage = get_storage()
+        listed = storage.get_subreddits("whitelist", user_id) + storage.get_subreddits("blacklist", user_id)
+        discovery = _get_query_cache().get_or_load(
+            "subreddit_discovery", user_id, None,
+            lambda: storage.get_subreddit_discovery(user_id)
+        )
+        rows = rank_subreddits(discovery, exclude=listed, limit=limit)
+        return pd.DataFrame(rows) if rows else pd.DataFrame()
+    except Exception as e:
+        st.error(f"Erreur lors du classement des subreddits: {e}")
+        return pd.DataFrame()
+
+
+def archive_expiring_posts(days: int = 30, batch_size: int = 1000) -> int:
+    """
+    Copie dans l'archive Parquet les posts que cleanup_old_posts va supprimer
+    
+    Returns:
+        Nombre de posts archivés
+    """
+    storage = get_storage()
+    after_id = 0
+    
+    with ParquetArchiveWriter(ARCHIVE_DIR) as writer:
+        while True:
+            batch = storage.get_expiring_posts(days, after_id=after_id, limit=batch_size)
+            if not batch:
+                break
+            
+            # L'archive conserve le contenu complet (stocké à part dans la base)
+            bodies = storage.get_post_bodies([post["post_id"] for post in batch])
+            for post in batch:
+                post["content"] = bodies.get(post["post_id"], "")
+            
+            writer.write(batch)
+            after_id = max(post["id"] for post in batch)
+        
+        return writer.rows_written
+
+
+def get_archived_posts(
+    user_id: str = "default",
+    days: int = 365,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Posts archivés (Parquet) de l'utilisateur sur les `days` derniers jours :
+    posts expirés, absents de la base au-delà de la rétention
+    
+    Seules les colonnes demandées et les partitions (utilisateur, mois) de la
+    période sont lues. L'archive ne change qu'au nettoyage, qui invalide le
+    cache de tous les utilisateurs.
+    """
+    if not is_archive_available():
+        return pd.DataFrame()
+    
+    try:
+        return _get_query_cache().get_or_load(
+            "archived_posts", user_id, (days, tuple(columns or ())),
+            lambda: load_archived_posts(
+                ARCHIVE_DIR,
+                user_id=user_id,
+                since=datetime.now(timezone.utc) - timedelta(days=days),
+                columns=columns
+            )
+        )
+    except Exception as e:
+        st.warning(f"Archive Parquet illisible: {e}")
+        return pd.DataFrame()
+
+
+def cleanup_old_posts(days: int = 30, archive: bool = ARCHIVE_ENABLED) -> bool:
     """
     Supprime les posts plus vieux que X jours
+    
+    Avec Supabase, la table posts étant partitionnée par mois, les partitions
+    entièrement expirées sont détachées puis supprimées (coût constant). Un
+    post est donc conservé jusqu'à ce que tout son mois dépasse la rétention.
+    Les partitions des mois à venir sont créées au passage.
+    
+    Si archive est actif (et pyarrow installé), les posts expirés sont d'abord
+    copiés en Parquet ; en cas d'échec de l'archivage, rien n'est supprimé.
     """
     try:
-        client = get_supabase_client()
-        date_limit = (datetime.now() - timedelta(days=days)).isoformat()
+        if archive and is_archive_available():
+            archive_expiring_posts(days)
         
-        client.table("posts").delete().lt("post_date", date_limit).execute()
+        get_storage().cleanup_old_posts(days)
+        invalidate_user_cache()
         return True
     except Exception as e:
         st.error(f"Erreur lors du nettoyage: {e}")
         return False
 
 
+def rescore_user_posts(
+    user_id: str = "default",
+    weights: Optional[Dict] = None,
+    batch_size: int = 1000,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    formula: Optional[str] = None
+) -> Optional[int]:
+    """
+    Recalcule le score d'engagement de tous les posts d'un utilisateur
+    (après un changement de poids ou de formule), par lots
+    
+    Avec Supabase, le calcul et la mise à jour se font côté base (RPC
+    rescore_posts_batch) ; avec SQLite ou une formule personnalisée, chaque
+    lot est scoré en une passe vectorisée. Seuls les posts dont le score
+    change sont réécrits.
+    
+    Args:
+        weights: Poids à appliquer (ceux de la configuration par défaut)
+        progress_callback: Appelée avec (posts traités, total) après chaque lot
+        formula: Formule personnalisée (celle de la configuration par défaut,
+            "" pour la formule par défaut)
+    
+    Returns:
+        Nombre de posts dont le score a changé, None en cas d'erreur
+    """
+    try:
+        storage = get_storage()
+        
+        if weights is None or formula is None:
+            config = get_user_config(user_id)
+            weights = config["engagement_weights"] if weights is None else weights
+            formula = config.get("engagement_formula") if formula is None else formula
+        
+        # Formule invalide : erreur avant tout lot
+        if formula:
+            compile_formula(formula)
+        
+        total = storage.count_posts(user_id)
+        processed = updated = 0
+        after_id = 0
+        
+        while True:
+            result = storage.rescore_posts(user_id, weights, after_id=after_id, limit=batch_size, formula=formula or None)
+            if not result["processed"]:
+                break
+            
+            processed += result["processed"]
+            updated += result["updated"]
+            after_id = result["last_id"]
+            
+            if progress_callback:
+                progress_callback(min(processed, total), total)
+        
+        # Distributions d'engagement des jours encore présents en base
+        if updated:
+            active_days = storage.get_daily_rollups(user_id, RETENTION_DAYS)
+            refresh_daily_sketches(user_id, [str(row["day"])[:10] for row in active_days])
+            refresh_subreddit_discovery(user_id)
+            invalidate_user_cache(user_id)
+        
+        return updated
+    except Exception as e:
+        st.error(f"Erreur lors du recalcul des scores: {e}")
+        return None
+
+
+def backfill_sentiment(
+    user_id: str = "default",
+    missing_only: bool = True,
+    workers: Optional[int] = None,
+    batch_size: int = 5000,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Optional[int]:
+    """
+    Calcule le sentiment (utils/sentiment.py) des posts déjà enregistrés, par lots
+    
+    Chaque lot est lu avec son contenu complet puis scoré en une passe
+    vectorisée, répartie sur workers processus pour les gros volumes. Les
+    agrégats journaliers suivent par trigger.
+    
+    Args:
+        missing_only: Seulement les posts sans sentiment (sinon tous, après
+            une modification du lexique)
+        progress_callback: Appelée avec (posts traités, total) après chaque lot
+    
+    Returns:
+        Nombre de posts dont le sentiment a changé, None en cas d'erreur
+    """
+    try:
+        storage = get_storage()
+        total = storage.count_posts(user_id)
+        processed = updated = 0
+        after_id = 0
+        
+        while True:
+            batch = storage.get_sentiment_batch(user_id, after_id=after_id, limit=batch_size, missing_only=missing_only)
+            if not batch:
+                break
+            
+            bodies = storage.get_post_bodies([row["post_id"] for row in batch])
+            texts = [post_text({**row, "content": bodies.get(row["post_id"])}) for row in batch]
+            scores = score_texts_parallel(texts, workers=workers)
+            
+            updated += storage.update_sentiments(user_id, {
+                row["post_id"]: round(score, 3) for row, score in zip(batch, scores.tolist())
+            })
+            processed += len(batch)
+            after_id = batch[-1]["id"]
+            
+            if progress_callback:
+                progress_callback(min(processed, total), total)
+        
+        if updated:
+            invalidate_user_cache(user_id)
+        return updated
+    except Exception as e:
+        st.error(f"Erreur lors du calcul du sentiment: {e}")
+        return None
+
+
+def get_score_matrix(
+    user_id: str = "default",
+    days: int = 30,
+    limit: int = 100000
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Composantes du score des posts récents, mises en cache par utilisateur
+    et période (10 minutes, invalidées par les écritures) pour la simulation
+    de poids
+    
+    Returns:
+        (DataFrame des posts avec les composantes brutes, pour les formules
+        personnalisées ; matrice (n, 4) de analyzer.build_score_matrix,
+        lignes alignées)
+    """
+    def load() -> Tuple[pd.DataFrame, np.ndarray]:
+        posts = get_storage().get_posts(
+            user_id=user_id,
+            days=days,
+            limit=limit,
+            columns=resolve_columns("scoring"),
+            sort_by="post_date"
+        )
+        if not posts:
+            return pd.DataFrame(), np.empty((0, 4), dtype=np.float32)
+        
+        posts_df = pd.DataFrame(posts)
+        return posts_df, build_score_matrix(posts_df)
+    
+    try:
+        return _get_query_cache().get_or_load("score_matrix", user_id, (days, limit), load, ttl=600)
+    except Exception as e:
+        st.error(f"Erreur lors de la récupération des posts: {e}")
+        return pd.DataFrame(), np.empty((0, 4), dtype=np.float32)
+
+
 def get_user_config(user_id: str = "default") -> Dict:
     """
     Récupère la configuration utilisateur
     """
     try:
-        client = get_supabase_client()
-        response = (
-            client.table("user_configs")
-            .select("*")
-            .eq("user_id", user_id)
-            .execute()
-        )
+        config = get_storage().get_user_config(user_id)
         
-        if response.data:
-            return response.data[0]
+        if config:
+            return config
         else:
             # Configuration par défaut
             return {
@@ -292,6 +1082,7 @@ def get_user_config(user_id: str = "default") -> Dict:
                     "awards": 5.0,
                     "upvote_ratio": 10.0
                 },
+                "engagement_formula": None,
                 "telegram_chat_id": None
             }
     except Exception as e:
@@ -304,11 +1095,10 @@ def update_user_config(user_id: str, config: Dict) -> bool:
     Met à jour la configuration utilisateur
     """
     try:
-        client = get_supabase_client()
         config["user_id"] = user_id
         config["updated_at"] = datetime.now().isoformat()
         
-        client.table("user_configs").upsert(config, on_conflict="user_id").execute()
+        get_storage().update_user_config(user_id, config)
         return True
     except Exception as e:
         st.error(f"Erreur lors de la mise à jour: {e}")
@@ -0,0 +1,190 @@
+"""
+Module de détection des quasi-doublons (crossposts, reprises d'une même actualité)
+
+Chaque post reçoit une signature MinHash de ses shingles (5-grammes de
+caractères du titre et du début du contenu normalisés). La signature est
+découpée en LSH_BANDS bandes de LSH_ROWS valeurs : deux posts partageant
+une bande sont candidats, puis retenus si leur similarité de Jaccard
+estimée atteint DEDUP_SIMILARITY. Les candidats sont trouvés par table de
+hachage, sans comparer toutes les paires : le coût est linéaire en
+nombre de posts.
+
+Les posts retenus partagent un cluster_id (celui du groupe déjà connu en
+base s'il existe, sinon le plus petit post_id du groupe).
+"""
+import base64
+import hashlib
+import zlib
+from typing import List, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from utils.text import normalize_text
+
+
+# Taille de la signature MinHash (= LSH_BANDS × LSH_ROWS)
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = 4
+
+# Similarité de Jaccard estimée minimale entre deux quasi-doublons
+DEDUP_SIMILARITY = 0.5
+
+# Longueur des shingles (caractères) et du contenu pris en compte
+SHINGLE_SIZE = 5
+DEDUP_CONTENT_LENGTH = 1000
+
+# Permutations h(x) = (a·x + b) mod p sur des hachages 32 bits (p premier > 2^32) :
+# a·x + b tient dans un uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, 2 ** 32 - 1, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 32 - 1, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def post_shingles(post: Dict) -> set:
+    """
+    Ensemble des 5-grammes de caractères du titre et du début du contenu
+    """
+    content = (post.get("content") or post.get("content_preview") or "")[:DEDUP_CONTENT_LENGTH]
+    text = normalize_text(f"{post.get('title') or ''} {content}")
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingles: Iterable[str]) -> Optional[np.ndarray]:
+    """
+    Signature MinHash (NUM_PERMUTATIONS valeurs uint32), None sans shingle
+    """
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+        dtype=np.uint64
+    )
+    if not hashes.size:
+        return None
+
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> List[str]:
+    """
+    Clés LSH de la signature, une par bande ("<bande>-<hachage>")
+    """
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+        keys.append(f"{band}-{hashlib.blake2b(rows, digest_size=8).hexdigest()}")
+    return keys
+
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Similarité de Jaccard estimée (part des valeurs MinHash égales)
+    """
+    return float(np.mean(a == b))
+
+
+def signature_to_text(signature: np.ndarray) -> str:
+    return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+
+def signature_from_text(text: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype="<u4").astype(np.uint32)
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, node):
+        self.parent.setdefault(node, node)
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def post_signatures(posts: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Signatures MinHash d'un lot de posts, {post_id: signature}
+    (posts sans texte exclus)
+    """
+    signatures = {}
+    for post in posts:
+        signature = minhash_signature(post_shingles(post))
+        if signature is not None:
+            signatures[post["post_id"]] = signature
+    return signatures
+
+
+def cluster_signatures(
+    signatures: Dict[str, np.ndarray],
+    known: Optional[List[Dict]] = None,
+    similarity: float = DEDUP_SIMILARITY
+) -> Tuple[Dict[str, str], List[Dict]]:
+    """
+    Regroupe les quasi-doublons d'un lot de signatures
+
+    Args:
+        signatures: Signatures du lot (voir post_signatures)
+        known: Signatures déjà en base partageant une bande avec le lot
+            ({post_id, cluster_id, signature})
+        similarity: Similarité minimale retenue
+
+    Returns:
+        ({post_id: cluster_id} pour chaque post du lot,
+         lignes {post_id, cluster_id, signature, bands} à enregistrer)
+    """
+    known_clusters = {}
+    all_signatures = {}
+    for row in known or []:
+        all_signatures[row["post_id"]] = signature_from_text(row["signature"])
+        known_clusters[row["post_id"]] = row.get("cluster_id") or row["post_id"]
+    all_signatures.update(signatures)
+
+    # Buckets LSH : chaque post n'est comparé qu'au premier post de ses buckets
+    buckets = {}
+    keys_by_post = {}
+    groups = _UnionFind()
+    compared = set()
+
+    for post_id, signature in all_signatures.items():
+        keys_by_post[post_id] = band_keys(signature)
+        for key in keys_by_post[post_id]:
+            first = buckets.setdefault(key, post_id)
+            if first == post_id or (first, post_id) in compared:
+                continue
+            compared.add((first, post_id))
+            if estimated_similarity(all_signatures[first], signature) >= similarity:
+                groups.union(first, post_id)
+
+    # Identifiant de groupe : celui d'un post déjà en base, sinon le plus petit post_id
+    members_by_root = {}
+    for post_id in all_signatures:
+        members_by_root.setdefault(groups.find(post_id), []).append(post_id)
+
+    cluster_ids = {}
+    for members in members_by_root.values():
+        existing = [known_clusters[m] for m in members if m in known_clusters]
+        cluster_id = min(existing) if existing else min(members)
+        for post_id in members:
+            cluster_ids[post_id] = cluster_id
+
+    rows = [
+        {
+            "post_id": post_id,
+            "cluster_id": cluster_ids[post_id],
+            "signature": signature_to_text(signature),
+            "bands": keys_by_post[post_id],
+        }
+        for post_id, signature in signatures.items()
+    ]
+
+    return {post_id: cluster_ids[post_id] for post_id in signatures}, rows
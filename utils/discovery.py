@@ -0,0 +1,111 @@
+"""
+Module de découverte de subreddits (classement des candidats à la whitelist)
+
+Calculé depuis les agrégats journaliers (rollup_daily_subreddit et
+rollup_daily_keyword), sans relire les posts, pour les seuls subreddits
+touchés par un scan : chaque ligne de subreddit_discovery résume la fenêtre
+de DISCOVERY_DAYS jours.
+
+Le score d'un subreddit combine :
+- les occurrences de mots-clés à décroissance exponentielle (demi-vie
+  DISCOVERY_HALF_LIFE_DAYS) : volume et fraîcheur
+- le taux d'occurrence (occurrences par post : > 1 quand les posts
+  contiennent plusieurs mots-clés)
+- l'engagement moyen par post (échelle logarithmique)
+
+    score = occurrences décrues × taux × ln(1 + engagement moyen)
+
+La décroissance est stockée au jour du calcul (as_of) et prolongée à la
+lecture : les lignes calculées à des jours différents restent comparables.
+"""
+import math
+from datetime import date
+from typing import List, Dict, Iterable, Optional
+
+from config.settings import DISCOVERY_HALF_LIFE_DAYS
+
+
+def _decay(days: float, half_life_days: float = DISCOVERY_HALF_LIFE_DAYS) -> float:
+    return 0.5 ** (max(days, 0.0) / half_life_days)
+
+
+def summarize_activity(user_id: str, activity: Iterable[Dict], today: Optional[date] = None) -> List[Dict]:
+    """
+    Résume l'activité journalière par subreddit (lignes de get_subreddit_activity)
+
+    Returns:
+        Lignes de subreddit_discovery {user_id, subreddit, posts, keyword_hits,
+        keywords_matched, engagement_sum, decayed_hits, last_day, as_of}
+    """
+    today = today or date.today()
+    summaries = {}
+
+    for row in activity:
+        summary = summaries.setdefault(row["subreddit"], {
+            "user_id": user_id,
+            "subreddit": row["subreddit"],
+            "posts": 0,
+            "keyword_hits": 0,
+            "keywords": set(),
+            "engagement_sum": 0.0,
+            "decayed_hits": 0.0,
+            "last_day": None,
+            "as_of": today.isoformat(),
+        })
+        day = str(row["day"])[:10]
+        hits = int(row.get("keyword_hits") or 0)
+
+        summary["posts"] += int(row.get("posts") or 0)
+        summary["keyword_hits"] += hits
+        summary["keywords"].update(row.get("keywords") or [])
+        summary["engagement_sum"] += float(row.get("engagement_sum") or 0)
+        summary["decayed_hits"] += hits * _decay((today - date.fromisoformat(day)).days)
+        summary["last_day"] = max(summary["last_day"] or day, day)
+
+    rows = []
+    for summary in summaries.values():
+        summary["keywords_matched"] = len(summary.pop("keywords"))
+        summary["engagement_sum"] = round(summary["engagement_sum"], 2)
+        rows.append(summary)
+    return rows
+
+
+def discovery_score(row: Dict, today: Optional[date] = None) -> Dict:
+    """
+    Ajoute à une ligne de subreddit_discovery les indicateurs du classement
+    (recent_hits, hit_rate, engagement_per_post, score), ramenés à today
+    """
+    today = today or date.today()
+    posts = row.get("posts") or 0
+    as_of = date.fromisoformat(str(row["as_of"])[:10])
+
+    recent_hits = float(row.get("decayed_hits") or 0) * _decay((today - as_of).days)
+    hit_rate = (row.get("keyword_hits") or 0) / posts if posts else 0.0
+    engagement_per_post = float(row.get("engagement_sum") or 0) / posts if posts else 0.0
+
+    return {
+        **row,
+        "recent_hits": round(recent_hits, 2),
+        "hit_rate": round(hit_rate, 2),
+        "engagement_per_post": round(engagement_per_post, 1),
+        "score": round(recent_hits * hit_rate * math.log1p(max(engagement_per_post, 0.0)), 2),
+    }
+
+
+def rank_subreddits(
+    rows: Iterable[Dict],
+    exclude: Iterable[str] = (),
+    limit: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[Dict]:
+    """
+    Subreddits candidats par score décroissant, hors exclude (listes existantes)
+    """
+    excluded = {name.lower() for name in exclude}
+    ranked = [
+        discovery_score(row, today)
+        for row in rows
+        if row["subreddit"].lower() not in excluded
+    ]
+    ranked.sort(key=lambda row: (-row["score"], -row["recent_hits"], row["subreddit"]))
+    return ranked[:limit] if limit else ranked
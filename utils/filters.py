@@ -0,0 +1,374 @@
+"""
+Module des filtres de posts (spécification déclarative unique)
+
+Un FilterSpec décrit les critères une seule fois (score minimum,
+commentaires minimum, âge maximum, NSFW, subreddit, mot-clé, subreddits
+exclus) sous forme de conditions neutres (colonne, opérateur, valeur),
+traduites au plus tôt là où les posts passent :
+- predicate() : fonction post -> bool appliquée au fil du scan, avant le
+  calcul des scores (seules les conditions actives sont testées)
+- mask() : masque booléen vectorisé sur un DataFrame (analyzer)
+- sql_clauses() : clauses SQL paramétrées (backend SQLite)
+- apply_postgrest() : filtres PostgREST (backend Supabase)
+
+L'âge maximum est traduit en date limite sur post_date, identique en base et
+en mémoire (age_hours n'est que l'âge au moment du scan). La limite est un
+instant UTC : les dates avec fuseau (TIMESTAMPTZ Supabase) sont comparées en
+UTC, les dates sans fuseau (écrites par le scraper et stockées telles quelles
+en SQLite) sont l'heure locale de la machine et comparées à la limite
+convertie en heure locale.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
+
+
+# Longueur des dates comparées (YYYY-MM-DDTHH:MM:SS, sans fuseau)
+_DATE_LENGTH = 19
+
+# Date texte portant un fuseau (Z, +00:00, -0500...)
+_OFFSET_PATTERN = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+
+def _local_naive(moment: datetime) -> datetime:
+    """
+    Instant avec fuseau -> heure locale de la machine, sans fuseau
+    """
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def _date_at_least(value, cutoff: datetime) -> bool:
+    """
+    post_date >= cutoff (instant UTC), pour une date texte ou datetime,
+    avec ou sans fuseau (sans fuseau : heure locale)
+    """
+    if value is None or value == "":
+        return False
+    try:
+        moment = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return False
+    if pd.isna(moment):
+        return False
+    if moment.tzinfo is None:
+        return moment >= _local_naive(cutoff)
+    return moment >= cutoff
+
+
+def post_dates_utc(values) -> pd.Series:
+    """
+    Dates de posts en instants UTC (datetime64 UTC, NaT si absente ou
+    invalide) : dates avec fuseau converties, dates sans fuseau lues en
+    heure locale de la machine (même convention que les filtres)
+    """
+    series = pd.Series(values).reset_index(drop=True)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is None:
+            return _localize(series)
+        return series.dt.tz_convert("UTC")
+
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns, UTC]")
+    text = series.where(series.notna(), "").astype(str)
+    aware = text.str.contains(_OFFSET_PATTERN, regex=True).to_numpy()
+    if aware.any():
+        result[aware] = pd.to_datetime(text[aware], utc=True, format="ISO8601", errors="coerce")
+    if (~aware).any():
+        result[~aware] = _localize(pd.to_datetime(text[~aware], format="ISO8601", errors="coerce"))
+    return result
+
+
+def _localize(naive: pd.Series) -> pd.Series:
+    # Heure locale de la machine (changements d'heure compris) -> UTC ;
+    # heure ambiguë : heure d'été, heure inexistante : décalée après le saut
+    return naive.dt.tz_localize(
+        tzlocal(),
+        ambiguous=np.ones(len(naive), dtype=bool),
+        nonexistent="shift_forward"
+    ).dt.tz_convert("UTC")
+
+
+class FilterSpec:
+    """
+    Critères de filtrage des posts (tous optionnels, combinés par ET)
+
+    Args:
+        min_score: Score Reddit minimum
+        min_comments: Nombre de commentaires minimum
+        max_age_hours: Âge maximum des posts (heures)
+        exclude_nsfw: Exclure les posts NSFW
+        subreddit: Subreddit exact
+        keyword: Mot-clé normalisé (colonne keywords)
+        exclude_subreddits: Subreddits exclus (blacklist, sans distinction de casse)
+    """
+
+    def __init__(
+        self,
+        min_score: int = 0,
+        min_comments: int = 0,
+        max_age_hours: Optional[float] = None,
+        exclude_nsfw: bool = False,
+        subreddit: Optional[str] = None,
+        keyword: Optional[str] = None,
+        exclude_subreddits: Optional[Iterable[str]] = None
+    ):
+        self.min_score = min_score or 0
+        self.min_comments = min_comments or 0
+        self.max_age_hours = max_age_hours
+        self.exclude_nsfw = exclude_nsfw
+        self.subreddit = subreddit or None
+        self.keyword = keyword.lower().strip() if keyword else None
+        self.exclude_subreddits = frozenset(name.lower() for name in exclude_subreddits or ())
+
+    def key(self) -> Tuple:
+        """
+        Tuple hashable des critères (clés de session, de cache)
+        """
+        return (
+            self.min_score, self.min_comments, self.max_age_hours, self.exclude_nsfw,
+            self.subreddit, self.keyword, tuple(sorted(self.exclude_subreddits))
+        )
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FilterSpec) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+    def __repr__(self) -> str:
+        # Stable d'un processus à l'autre (sert de clé au cache partagé)
+        return f"FilterSpec{self.key()!r}"
+
+    def merged(self, **changes) -> "FilterSpec":
+        """
+        Copie avec les critères donnés remplacés (les valeurs None sont ignorées)
+        """
+        values = {
+            "min_score": self.min_score,
+            "min_comments": self.min_comments,
+            "max_age_hours": self.max_age_hours,
+            "exclude_nsfw": self.exclude_nsfw,
+            "subreddit": self.subreddit,
+            "keyword": self.keyword,
+            "exclude_subreddits": self.exclude_subreddits,
+        }
+        values.update({name: value for name, value in changes.items() if value is not None})
+        return FilterSpec(**values)
+
+    def conditions(self, now: Optional[datetime] = None) -> List[Tuple[str, str, object]]:
+        """
+        Conditions actives (colonne, opérateur, valeur), des plus sélectives
+        et moins coûteuses aux plus chères
+
+        Opérateurs : gte, eq, not_true, has (élément d'un tableau),
+        not_in_ci (hors liste, sans distinction de casse)
+        
+        La limite de post_date est un datetime UTC avec fuseau.
+        """
+        conditions = []
+        if self.subreddit:
+            conditions.append(("subreddit", "eq", self.subreddit))
+        if self.min_score > 0:
+            conditions.append(("score", "gte", self.min_score))
+        if self.min_comments > 0:
+            conditions.append(("num_comments", "gte", self.min_comments))
+        if self.max_age_hours:
+            now = now or datetime.now(timezone.utc)
+            if now.tzinfo is None:
+                now = now.astimezone()
+            cutoff = now.astimezone(timezone.utc) - timedelta(hours=self.max_age_hours)
+            conditions.append(("post_date", "gte", cutoff))
+        if self.exclude_nsfw:
+            conditions.append(("is_nsfw", "not_true", None))
+        if self.exclude_subreddits:
+            conditions.append(("subreddit", "not_in_ci", sorted(self.exclude_subreddits)))
+        if self.keyword:
+            conditions.append(("keywords", "has", self.keyword))
+        return conditions
+
+    def is_empty(self) -> bool:
+        return not self.conditions()
+
+    # ----- Scan : prédicat appliqué post par post -----
+
+    def predicate(self) -> Callable[[Dict], bool]:
+        """
+        Fonction post -> bool, compilée une fois : seules les conditions
+        actives sont testées, la première qui échoue arrête l'évaluation
+        """
+        checks = []
+        for column, op, value in self.conditions():
+            if op == "gte" and column == "post_date":
+                checks.append(lambda p, v=value: _date_at_least(p.get("post_date"), v))
+            elif op == "gte":
+                checks.append(lambda p, c=column, v=value: (p.get(c) or 0) >= v)
+            elif op == "eq":
+                checks.append(lambda p, c=column, v=value: p.get(c) == v)
+            elif op == "not_true":
+                checks.append(lambda p, c=column: not p.get(c))
+            elif op == "not_in_ci":
+                excluded = frozenset(value)
+                checks.append(lambda p, c=column, v=excluded: (p.get(c) or "").lower() not in v)
+            elif op == "has":
+                checks.append(lambda p, c=column, v=value: v in (p.get(c) or ()))
+
+        if not checks:
+            return lambda post: True
+        return lambda post: all(check(post) for check in checks)
+
+    def filter_posts(self, posts: Iterable[Dict]) -> List[Dict]:
+        """
+        Posts qui satisfont les critères (une seule passe)
+        """
+        if self.is_empty():
+            return list(posts)
+        keep = self.predicate()
+        return [post for post in posts if keep(post)]
+
+    # ----- Analyse : masque vectorisé -----
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Masque booléen (n,) des lignes d'un DataFrame qui satisfont les critères
+        (colonne absente : valeur par défaut du post, comme predicate)
+        """
+        n = len(df)
+        keep = np.ones(n, dtype=bool)
+
+        for column, op, value in self.conditions():
+            series = df[column] if column in df.columns else pd.Series([None] * n, index=df.index, dtype=object)
+            if op == "gte" and column == "post_date":
+                keep &= self._date_mask(series, value)
+            elif op == "gte":
+                values = pd.to_numeric(series, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+                keep &= values >= value
+            elif op == "eq":
+                keep &= (series == value).to_numpy()
+            elif op == "not_true":
+                keep &= ~series.fillna(False).astype(bool).to_numpy()
+            elif op == "not_in_ci":
+                keep &= ~series.fillna("").astype(str).str.lower().isin(value).to_numpy()
+            elif op == "has":
+                keep &= np.fromiter(
+                    (value in (keywords if isinstance(keywords, (list, tuple, np.ndarray)) else ())
+                     for keywords in series),
+                    dtype=bool,
+                    count=n
+                )
+        return keep
+
+    @staticmethod
+    def _date_mask(series: pd.Series, cutoff: datetime) -> np.ndarray:
+        """
+        Masque post_date >= cutoff (instant UTC), comme _date_at_least
+        """
+        local_cutoff = pd.Timestamp(_local_naive(cutoff))
+        if pd.api.types.is_datetime64_any_dtype(series):
+            if series.dt.tz is None:
+                return (series >= local_cutoff).to_numpy()
+            return (series >= pd.Timestamp(cutoff)).to_numpy()
+
+        keep = np.zeros(len(series), dtype=bool)
+        text = series.where(series.notna(), "").astype(str)
+        aware = text.str.contains(_OFFSET_PATTERN, regex=True).to_numpy()
+        if aware.any():
+            moments = pd.to_datetime(text[aware], utc=True, format="ISO8601", errors="coerce")
+            keep[aware] = (moments >= pd.Timestamp(cutoff)).to_numpy()
+        if (~aware).any():
+            moments = pd.to_datetime(text[~aware], format="ISO8601", errors="coerce")
+            keep[~aware] = (moments >= local_cutoff).to_numpy()
+        return keep
+
+    # ----- Bases de données : clauses poussées dans la requête -----
+
+    def sql_clauses(self, alias: str = "p") -> Tuple[List[str], List]:
+        """
+        Clauses SQL (SQLite) et paramètres, à joindre par AND
+        """
+        clauses, params = [], []
+        for column, op, value in self.conditions():
+            if op == "gte" and column == "post_date":
+                # post_date SQLite : texte en heure locale sans fuseau (comme le
+                # scraper l'écrit) ; la limite y est convertie, l'index reste utilisé
+                clauses.append(f"{alias}.{column} >= ?")
+                params.append(_local_naive(value).isoformat()[:_DATE_LENGTH])
+            elif op == "gte":
+                clauses.append(f"{alias}.{column} >= ?")
+                params.append(value)
+            elif op == "eq":
+                clauses.append(f"{alias}.{column} = ?")
+                params.append(value)
+            elif op == "not_true":
+                clauses.append(f"COALESCE({alias}.{column}, 0) = 0")
+            elif op == "not_in_ci":
+                clauses.append(f"lower({alias}.{column}) NOT IN (SELECT value FROM json_each(?))")
+                params.append(json.dumps(value))
+            elif op == "has":
+                # Table de jointure post_keywords : servie par son index
+                clauses.append(
+                    f"{alias}.post_id IN (SELECT post_id FROM post_keywords WHERE keyword = ?)"
+                )
+                params.append(value)
+        return clauses, params
+
+    def rpc_params(self) -> Dict:
+        """
+        Critères en paramètres des fonctions SQL Supabase (search_posts),
+        NULL / valeurs neutres pour les critères inactifs
+        """
+        params = {
+            "p_subreddit": None,
+            "p_min_score": 0,
+            "p_min_comments": 0,
+            "p_since": None,
+            "p_exclude_nsfw": False,
+            "p_exclude_subreddits": None,
+            "p_keyword": None,
+        }
+        for column, op, value in self.conditions():
+            if op == "eq" and column == "subreddit":
+                params["p_subreddit"] = value
+            elif op == "gte" and column == "score":
+                params["p_min_score"] = value
+            elif op == "gte" and column == "num_comments":
+                params["p_min_comments"] = value
+            elif op == "gte" and column == "post_date":
+                # TIMESTAMPTZ : instant envoyé avec son fuseau
+                params["p_since"] = value.isoformat()
+            elif op == "not_true":
+                params["p_exclude_nsfw"] = True
+            elif op == "not_in_ci":
+                params["p_exclude_subreddits"] = list(value)
+            elif op == "has":
+                params["p_keyword"] = value
+        return params
+
+    def apply_postgrest(self, query):
+        """
+        Ajoute les critères à une requête PostgREST (client supabase)
+        """
+        for column, op, value in self.conditions():
+            if op == "gte" and column == "post_date":
+                # TIMESTAMPTZ : instant envoyé avec son fuseau
+                query = query.gte(column, value.isoformat())
+            elif op == "gte":
+                query = query.gte(column, value)
+            elif op == "eq":
+                query = query.eq(column, value)
+            elif op == "not_true":
+                query = query.not_.is_(column, "true")
+            elif op == "not_in_ci":
+                # ilike sans joker : égalité sans distinction de casse
+                for name in value:
+                    query = query.not_.ilike(column, _escape_like(name))
+            elif op == "has":
+                # keywords @> '{keyword}' : servi par l'index GIN idx_posts_keywords
+                query = query.contains(column, [value])
+        return query
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
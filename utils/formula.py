@@ -0,0 +1,317 @@
+"""
+Module des formules d'engagement personnalisées
+
+Une formule saisie par l'utilisateur, par exemple
+
+    log1p(score) * w1 + comments / max(age, 1) ^ 1.5
+
+est analysée avec le module ast puis vérifiée nœud par nœud : seuls les
+nombres, les variables et fonctions listées ci-dessous, les opérateurs
+arithmétiques, les comparaisons et `a if condition else b` sont acceptés.
+L'arbre validé est compilé une fois en fonctions Python appelant numpy
+(aucun eval / exec) : l'évaluation traite tous les posts d'un lot à la
+fois. Les formules compilées sont mises en cache par texte, donc par
+configuration utilisateur.
+
+Variables (tableaux, une valeur par post) :
+    score / upvotes, comments, awards, ratio / upvote_ratio,
+    age (heures), age_days, age_factor (facteur d'âge de la formule par défaut)
+Poids de la configuration (scalaires) :
+    w1 / w_upvotes, w2 / w_comments, w3 / w_awards, w4 / w_ratio
+
+`^` est une puissance (comme `**`, remplacé avant l'analyse : même priorité,
+associatif à droite, `-2^2` vaut -4). Les résultats non finis (division par
+zéro, dépassement) valent 0.
+"""
+import ast
+import io
+import tokenize
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Formule équivalente au calcul par défaut (analyzer.score_engagement_batch)
+DEFAULT_FORMULA = "(score * w1 + comments * w2 + awards * w3 + ratio * w4) * age_factor"
+
+MAX_FORMULA_LENGTH = 500
+MAX_FORMULA_NODES = 200
+
+# Variable -> (source, clé) : colonne du lot ou poids de la configuration
+VARIABLES = {
+    "score": ("column", "score"),
+    "upvotes": ("column", "score"),
+    "comments": ("column", "num_comments"),
+    "awards": ("column", "awards"),
+    "ratio": ("column", "upvote_ratio"),
+    "upvote_ratio": ("column", "upvote_ratio"),
+    "age": ("column", "age_hours"),
+    "age_days": ("column", "age_days"),
+    "age_factor": ("column", "age_factor"),
+    "w1": ("weight", "upvotes"),
+    "w_upvotes": ("weight", "upvotes"),
+    "w2": ("weight", "comments"),
+    "w_comments": ("weight", "comments"),
+    "w3": ("weight", "awards"),
+    "w_awards": ("weight", "awards"),
+    "w4": ("weight", "upvote_ratio"),
+    "w_ratio": ("weight", "upvote_ratio"),
+}
+
+# Fonction -> (implémentation numpy, nombre d'arguments min, max)
+FUNCTIONS = {
+    "log": (np.log, 1, 1),
+    "log1p": (np.log1p, 1, 1),
+    "log10": (np.log10, 1, 1),
+    "sqrt": (np.sqrt, 1, 1),
+    "exp": (np.exp, 1, 1),
+    "abs": (np.abs, 1, 1),
+    "min": (lambda *args: _reduce(np.minimum, args), 2, 8),
+    "max": (lambda *args: _reduce(np.maximum, args), 2, 8),
+    "clip": (np.clip, 3, 3),
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+}
+
+_COMPARE_OPERATORS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_BOOLEAN_OPERATORS = {
+    ast.And: np.logical_and,
+    ast.Or: np.logical_or,
+}
+
+
+class FormulaError(ValueError):
+    """
+    Formule invalide (syntaxe, nom ou opération non autorisés)
+    """
+
+
+def _reduce(function, args):
+    result = args[0]
+    for arg in args[1:]:
+        result = function(result, arg)
+    return result
+
+
+Env = Dict[str, object]
+
+
+def _replace_caret(text: str) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Remplace les opérateurs `^` par `**` (hors chaînes), pour que l'analyse
+    leur donne la priorité de la puissance et non celle du ou exclusif
+
+    Returns:
+        Texte converti et positions (ligne, colonne) des `^` remplacés
+    """
+    try:
+        carets = [
+            token.start for token in tokenize.generate_tokens(io.StringIO(text).readline)
+            if token.type == tokenize.OP and token.string == "^"
+        ]
+    except (tokenize.TokenError, SyntaxError):
+        # Texte non découpable : ast.parse signalera l'erreur
+        return text, []
+
+    lines = text.splitlines(keepends=True)
+    for row, col in reversed(carets):
+        line = lines[row - 1]
+        lines[row - 1] = line[:col] + "**" + line[col + 1:]
+    return "".join(lines), carets
+
+
+def _compile_node(node: ast.AST) -> Callable[[Env], object]:
+    """
+    Convertit un nœud validé en fonction env -> valeur (tableau ou scalaire)
+    """
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise FormulaError(f"Valeur non autorisée: {node.value!r}")
+        try:
+            value = np.float64(node.value)
+        except OverflowError:
+            raise FormulaError(f"Nombre trop grand: {str(node.value)[:20]}...") from None
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in VARIABLES:
+            raise FormulaError(
+                f"Variable inconnue: {node.id} (disponibles : {', '.join(sorted(VARIABLES))})"
+            )
+        source, key = VARIABLES[node.id]
+        return lambda env: env[source][key]
+
+    if isinstance(node, ast.BinOp):
+        function = _BINARY_OPERATORS.get(type(node.op))
+        if function is None:
+            raise FormulaError(f"Opérateur non autorisé: {type(node.op).__name__}")
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda env: function(left(env), right(env))
+
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            operand = _compile_node(node.operand)
+            return lambda env: np.logical_not(operand(env))
+        function = _UNARY_OPERATORS.get(type(node.op))
+        if function is None:
+            raise FormulaError(f"Opérateur non autorisé: {type(node.op).__name__}")
+        operand = _compile_node(node.operand)
+        return lambda env: function(operand(env))
+
+    if isinstance(node, ast.Compare):
+        parts = [_compile_node(node.left)] + [_compile_node(c) for c in node.comparators]
+        functions = []
+        for op in node.ops:
+            if type(op) not in _COMPARE_OPERATORS:
+                raise FormulaError(f"Comparaison non autorisée: {type(op).__name__}")
+            functions.append(_COMPARE_OPERATORS[type(op)])
+
+        def compare(env):
+            values = [part(env) for part in parts]
+            result = functions[0](values[0], values[1])
+            for i, function in enumerate(functions[1:], start=1):
+                result = np.logical_and(result, function(values[i], values[i + 1]))
+            return result
+        return compare
+
+    if isinstance(node, ast.BoolOp):
+        function = _BOOLEAN_OPERATORS[type(node.op)]
+        values = [_compile_node(value) for value in node.values]
+        return lambda env: _reduce(function, [value(env) for value in values])
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = _compile_node(node.test), _compile_node(node.body), _compile_node(node.orelse)
+        return lambda env: np.where(test(env), body(env), orelse(env))
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            name = node.func.id if isinstance(node.func, ast.Name) else ast.dump(node.func)
+            raise FormulaError(
+                f"Fonction non autorisée: {name} (disponibles : {', '.join(sorted(FUNCTIONS))})"
+            )
+        if node.keywords:
+            raise FormulaError(f"{node.func.id} : arguments nommés non autorisés")
+        function, min_args, max_args = FUNCTIONS[node.func.id]
+        if not min_args <= len(node.args) <= max_args:
+            raise FormulaError(f"{node.func.id} : {min_args} à {max_args} arguments attendus")
+        args = [_compile_node(arg) for arg in node.args]
+        return lambda env: function(*[arg(env) for arg in args])
+
+    raise FormulaError(f"Élément non autorisé: {type(node).__name__}")
+
+
+class CompiledFormula:
+    """
+    Formule validée, évaluable sur un lot de posts
+    """
+
+    def __init__(self, text: str, function: Callable[[Env], object]):
+        self.text = text
+        self._function = function
+
+    def evaluate(
+        self,
+        components: np.ndarray,
+        age_hours: np.ndarray,
+        age_factor: np.ndarray,
+        weights: Dict
+    ) -> np.ndarray:
+        """
+        Scores du lot, arrondis à 2 décimales
+
+        Args:
+            components: Matrice (n, 4) score, num_comments, awards, upvote_ratio
+            age_hours: Âge des posts en heures (n,)
+            age_factor: Facteur d'âge par défaut (n,)
+            weights: Poids de la configuration
+        """
+        components = np.asarray(components, dtype=np.float64)
+        age_hours = np.asarray(age_hours, dtype=np.float64)
+        env = {
+            "column": {
+                "score": components[:, 0],
+                "num_comments": components[:, 1],
+                "awards": components[:, 2],
+                "upvote_ratio": components[:, 3],
+                "age_hours": age_hours,
+                "age_days": age_hours / 24.0,
+                "age_factor": np.asarray(age_factor, dtype=np.float64),
+            },
+            "weight": {key: np.float64(value) for key, value in weights.items()},
+        }
+
+        with np.errstate(all="ignore"):
+            scores = np.broadcast_to(
+                np.asarray(self._function(env), dtype=np.float64), age_hours.shape
+            )
+            scores = np.where(np.isfinite(scores), scores, 0.0)
+        return np.round(scores, 2)
+
+
+@lru_cache(maxsize=64)
+def compile_formula(text: str) -> CompiledFormula:
+    """
+    Analyse, valide et compile une formule (mise en cache par texte)
+
+    Raises:
+        FormulaError: formule vide, trop longue, invalide ou non autorisée
+    """
+    text = (text or "").strip()
+    if not text:
+        raise FormulaError("Formule vide")
+    if len(text) > MAX_FORMULA_LENGTH:
+        raise FormulaError(f"Formule trop longue (maximum {MAX_FORMULA_LENGTH} caractères)")
+
+    source, carets = _replace_caret(text)
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        # Colonne dans le texte saisi (chaque `^` remplacé décale d'un caractère)
+        offset = e.offset
+        if offset is not None:
+            shift = 0
+            for row, col in carets:
+                if row == e.lineno and col + shift + 1 < offset:
+                    shift += 1
+            offset -= shift
+        raise FormulaError(f"Syntaxe invalide (colonne {offset}): {e.msg}") from None
+
+    if sum(1 for _ in ast.walk(tree)) > MAX_FORMULA_NODES:
+        raise FormulaError(f"Formule trop complexe (maximum {MAX_FORMULA_NODES} éléments)")
+
+    return CompiledFormula(text, _compile_node(tree))
+
+
+def validate_formula(text: str) -> Optional[str]:
+    """
+    Message d'erreur de la formule, None si elle est valide
+    """
+    try:
+        compile_formula(text)
+        return None
+    except FormulaError as e:
+        return str(e)
@@ -0,0 +1,382 @@
+"""
+Module de fouille des termes associés aux mots-clés
+
+État incrémental, mis à jour à chaque sauvegarde de posts (sans relire le
+corpus) et enregistré par utilisateur (table keyword_mining) :
+
+- Space-Saving : les MINING_TERM_CAPACITY termes (unigrammes et bigrammes
+  des titres) les plus fréquents, erreur de comptage bornée
+- Count-min sketch : co-occurrences (mot-clé, terme) en mémoire fixe,
+  surestimées d'au plus ~e/largeur du total
+- Compteurs exacts des mots-clés et des paires de mots-clés (peu nombreux)
+
+Les comptes décroissent avec une demi-vie de MINING_HALF_LIFE_DAYS jours :
+les termes émergents remontent, les anciens s'effacent. Un post déjà vu
+(nouveau scan) n'est pas recompté.
+"""
+import base64
+import hashlib
+import heapq
+import json
+import zlib
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import List, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.text import normalize_text, tokenize, content_terms
+
+
+# Dimensions du count-min sketch des co-occurrences (largeur × profondeur)
+CMS_WIDTH = 4096
+CMS_DEPTH = 4
+
+# Nombre de termes suivis par Space-Saving
+MINING_TERM_CAPACITY = 500
+
+# Demi-vie des comptes (jours)
+MINING_HALF_LIFE_DAYS = 14.0
+
+# Nombre de post_id mémorisés pour ne pas recompter un post re-scanné
+MINING_SEEN_POSTS = 20000
+
+_SEP = "\x1f"
+
+
+def _hash_bytes(value: str, size: int) -> bytes:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=size).digest()
+
+
+def _post_hash(post_id: str) -> int:
+    return int.from_bytes(_hash_bytes(str(post_id), 4), "big")
+
+
+class CountMinSketch:
+    """
+    Comptes approchés (jamais sous-estimés) d'un grand nombre de clés
+    en mémoire fixe
+    """
+
+    def __init__(self, width: int = CMS_WIDTH, depth: int = CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.float32)
+
+    def _indexes(self, key: str) -> np.ndarray:
+        digest = np.frombuffer(_hash_bytes(key, 4 * self.depth), dtype=">u4")
+        return digest.astype(np.int64) % self.width
+
+    def add(self, key: str, count: float = 1.0) -> None:
+        self.table[np.arange(self.depth), self._indexes(key)] += count
+
+    def estimate(self, key: str) -> float:
+        return float(self.table[np.arange(self.depth), self._indexes(key)].min())
+
+    def scale(self, factor: float) -> None:
+        self.table *= factor
+
+    def to_text(self) -> str:
+        header = self.width.to_bytes(4, "big") + self.depth.to_bytes(1, "big")
+        payload = header + zlib.compress(self.table.astype("<f4").tobytes())
+        return base64.b64encode(payload).decode("ascii")
+
+    @classmethod
+    def from_text(cls, text: Optional[str]) -> "CountMinSketch":
+        if not text:
+            return cls()
+        payload = base64.b64decode(text)
+        sketch = cls(int.from_bytes(payload[:4], "big"), payload[4])
+        table = np.frombuffer(zlib.decompress(payload[5:]), dtype="<f4")
+        sketch.table = table.reshape(sketch.depth, sketch.width).astype(np.float32)
+        return sketch
+
+
+class SpaceSaving:
+    """
+    Termes les plus fréquents (Space-Saving pondéré) : un terme absent
+    remplace le moins compté, dont il hérite du compte comme erreur
+    """
+
+    def __init__(self, capacity: int = MINING_TERM_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, List[float]] = {}  # terme -> [compte, erreur]
+        self._heap: List[Tuple[float, str]] = []
+
+    def _push(self, term: str) -> None:
+        heapq.heappush(self._heap, (self.counts[term][0], term))
+        # Tas paresseux : reconstruit quand les entrées périmées dominent
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(entry[0], t) for t, entry in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> str:
+        while True:
+            count, term = heapq.heappop(self._heap)
+            if term in self.counts and self.counts[term][0] == count:
+                return term
+
+    def add(self, term: str, count: float = 1.0) -> None:
+        if term in self.counts:
+            self.counts[term][0] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[term] = [count, 0.0]
+        else:
+            evicted = self._pop_min()
+            floor = self.counts.pop(evicted)[0]
+            self.counts[term] = [floor + count, floor]
+        self._push(term)
+
+    def update(self, counts: Dict[str, float]) -> "SpaceSaving":
+        # Termes les plus fréquents d'abord : ils évincent plutôt qu'ils ne sont évincés
+        for term, count in sorted(counts.items(), key=lambda item: -item[1]):
+            self.add(term, count)
+        return self
+
+    def scale(self, factor: float) -> None:
+        for entry in self.counts.values():
+            entry[0] *= factor
+            entry[1] *= factor
+        self._heap = [(entry[0], term) for term, entry in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, float, float]]:
+        """
+        (terme, compte, erreur) par compte décroissant
+        """
+        items = sorted(self.counts.items(), key=lambda item: -item[1][0])
+        return [(term, count, error) for term, (count, error) in items[:n]]
+
+    def to_dict(self) -> Dict:
+        return {"capacity": self.capacity, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "SpaceSaving":
+        data = data or {}
+        summary = cls(data.get("capacity", MINING_TERM_CAPACITY))
+        summary.counts = {term: list(entry) for term, entry in data.get("counts", {}).items()}
+        summary.scale(1.0)
+        return summary
+
+
+def keyword_tokens(keyword: str) -> List[str]:
+    """
+    Mots d'un mot-clé, découpés comme les titres
+    """
+    return tokenize(keyword)
+
+
+def post_keywords(post: Dict, keywords: Iterable[str]) -> Set[str]:
+    """
+    Mots-clés d'un post : ceux de la recherche qui l'a trouvé, plus les mots-clés
+    configurés présents dans son titre
+    """
+    found = {kw.strip().lower() for kw in post.get("keywords") or [] if kw and kw.strip()}
+    title = f" {normalize_text(post.get('title'))} "
+    for keyword in keywords:
+        phrase = normalize_text(keyword)
+        if phrase and f" {phrase} " in title:
+            found.add(keyword.strip().lower())
+    return found
+
+
+class KeywordMiner:
+    """
+    Co-occurrences mots-clés / termes des titres, mises à jour par lot de posts
+    """
+
+    def __init__(self):
+        self.updated_at: Optional[datetime] = None
+        self.total_posts = 0.0
+        self.terms = SpaceSaving()
+        self.cooccurrences = CountMinSketch()
+        self.keyword_counts: Dict[str, float] = {}
+        self.pair_counts: Dict[str, float] = {}
+        self.seen = deque(maxlen=MINING_SEEN_POSTS)
+        self._seen_set: Set[int] = set()
+
+    def _decay(self, now: datetime) -> None:
+        if self.updated_at is not None:
+            elapsed_days = max((now - self.updated_at).total_seconds(), 0.0) / 86400
+            factor = 0.5 ** (elapsed_days / MINING_HALF_LIFE_DAYS)
+            if factor < 1.0:
+                self.total_posts *= factor
+                self.terms.scale(factor)
+                self.cooccurrences.scale(factor)
+                for counts in (self.keyword_counts, self.pair_counts):
+                    for key in counts:
+                        counts[key] *= factor
+        self.updated_at = now
+
+    def _mark_seen(self, post_id: str) -> bool:
+        """
+        Mémorise le post ; False s'il a déjà été compté
+        """
+        h = _post_hash(post_id)
+        if h in self._seen_set:
+            return False
+        if len(self.seen) == self.seen.maxlen:
+            self._seen_set.discard(self.seen[0])
+        self.seen.append(h)
+        self._seen_set.add(h)
+        return True
+
+    def update(
+        self,
+        posts: Iterable[Dict],
+        keywords: Iterable[str] = (),
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Ajoute un lot de posts (titres) aux comptes
+
+        Args:
+            posts: Posts collectés (title, keywords, post_id)
+            keywords: Mots-clés configurés (détectés aussi dans les titres)
+            now: Date de la mise à jour (décroissance des comptes)
+
+        Returns:
+            Nombre de posts nouveaux pris en compte
+        """
+        self._decay(now or datetime.now(timezone.utc))
+        keywords = list(keywords)
+
+        term_counts = Counter()
+        added = 0
+
+        for post in posts:
+            if post.get("post_id") and not self._mark_seen(post["post_id"]):
+                continue
+            added += 1
+
+            terms = set(content_terms(tokenize(post.get("title"))))
+            matched = sorted(post_keywords(post, keywords))
+
+            term_counts.update(terms)
+            for keyword in matched:
+                self.keyword_counts[keyword] = self.keyword_counts.get(keyword, 0.0) + 1
+                for term in terms:
+                    self.cooccurrences.add(f"{keyword}{_SEP}{term}")
+            for i, a in enumerate(matched):
+                for b in matched[i + 1:]:
+                    key = f"{a}{_SEP}{b}"
+                    self.pair_counts[key] = self.pair_counts.get(key, 0.0) + 1
+
+        self.total_posts += added
+        self.terms.update(term_counts)
+        return added
+
+    def cooccurrence(self, keyword: str, term: str) -> float:
+        return self.cooccurrences.estimate(f"{keyword.strip().lower()}{_SEP}{term}")
+
+    def suggestions(self, keywords: Iterable[str], limit: int = 20, min_count: float = 3.0) -> List[Dict]:
+        """
+        Termes fréquents absents des mots-clés configurés
+
+        Returns:
+            Lignes {term, count, error, keyword, share, lift} par compte
+            décroissant : keyword = mot-clé le plus associé, share = part des
+            posts du terme contenant ce mot-clé, lift = share / fréquence du
+            mot-clé (> 1 : association plus forte que le hasard)
+        """
+        keywords = [kw.strip().lower() for kw in keywords if kw and kw.strip()]
+        covered = {token for kw in keywords for token in keyword_tokens(kw)}
+
+        rows = []
+        for term, count, error in self.terms.top():
+            if count < min_count:
+                break
+            # Terme déjà couvert par un mot-clé configuré
+            if set(term.split()) <= covered:
+                continue
+
+            # Mot-clé le plus spécifiquement associé (lift maximal, support minimal)
+            best, best_co, best_lift = None, 0.0, 0.0
+            for keyword in keywords:
+                keyword_count = self.keyword_counts.get(keyword, 0.0)
+                co = min(self.cooccurrence(keyword, term), count)
+                if co < min_count or not keyword_count:
+                    continue
+                if co / keyword_count > best_lift:
+                    best, best_co, best_lift = keyword, co, co / keyword_count
+
+            share = best_co / count if count else 0.0
+            keyword_share = self.keyword_counts.get(best, 0.0) / self.total_posts if best and self.total_posts else 0.0
+            rows.append({
+                "term": term,
+                "count": round(count, 1),
+                "error": round(error, 1),
+                "keyword": best,
+                "share": round(min(share, 1.0), 3),
+                "lift": round(share / keyword_share, 2) if keyword_share else None,
+            })
+            if len(rows) >= limit:
+                break
+
+        return rows
+
+    def redundant_pairs(
+        self,
+        keywords: Optional[Iterable[str]] = None,
+        min_support: float = 5.0,
+        min_overlap: float = 0.8
+    ) -> List[Dict]:
+        """
+        Paires de mots-clés dont les posts se recouvrent presque entièrement
+
+        Returns:
+            Lignes {keyword_a, keyword_b, together, overlap} ; overlap = part
+            des posts du mot-clé le moins fréquent contenant aussi l'autre
+        """
+        active = {kw.strip().lower() for kw in keywords} if keywords is not None else None
+
+        rows = []
+        for key, together in self.pair_counts.items():
+            a, b = key.split(_SEP)
+            if active is not None and not {a, b} <= active:
+                continue
+            smaller = min(self.keyword_counts.get(a, 0.0), self.keyword_counts.get(b, 0.0))
+            if together < min_support or not smaller:
+                continue
+            overlap = together / smaller
+            if overlap >= min_overlap:
+                rows.append({
+                    "keyword_a": a,
+                    "keyword_b": b,
+                    "together": round(together, 1),
+                    "overlap": round(min(overlap, 1.0), 3),
+                })
+
+        return sorted(rows, key=lambda row: (-row["overlap"], -row["together"]))
+
+    def to_text(self) -> str:
+        seen = np.array(self.seen, dtype="<u4").tobytes()
+        return json.dumps({
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "total_posts": self.total_posts,
+            "terms": self.terms.to_dict(),
+            "cooccurrences": self.cooccurrences.to_text(),
+            "keyword_counts": self.keyword_counts,
+            "pair_counts": self.pair_counts,
+            "seen": base64.b64encode(zlib.compress(seen)).decode("ascii"),
+        })
+
+    @classmethod
+    def from_text(cls, text: Optional[str]) -> "KeywordMiner":
+        miner = cls()
+        if not text:
+            return miner
+
+        data = json.loads(text)
+        if data.get("updated_at"):
+            miner.updated_at = datetime.fromisoformat(data["updated_at"])
+        miner.total_posts = data.get("total_posts", 0.0)
+        miner.terms = SpaceSaving.from_dict(data.get("terms"))
+        miner.cooccurrences = CountMinSketch.from_text(data.get("cooccurrences"))
+        miner.keyword_counts = data.get("keyword_counts", {})
+        miner.pair_counts = data.get("pair_counts", {})
+        if data.get("seen"):
+            seen = np.frombuffer(zlib.decompress(base64.b64decode(data["seen"])), dtype="<u4")
+            miner.seen.extend(int(h) for h in seen)
+            miner._seen_set = set(miner.seen)
+        return miner
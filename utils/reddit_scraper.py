@@ -22,6 +22,9 @@ import random
 import json
 import re
 
+from utils.analyzer import enrich_posts_with_engagement
+from utils.filters import FilterSpec
+
 # Liste de User-Agents réalistes pour rotation
 USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -118,10 +121,17 @@ def parse_score(score_str: str) -> int:
 def scrape_reddit_search(
     keyword: str,
     time_filter: str = "week",
-    limit: int = 50
+    limit: int = 50,
+    matched_keyword: Optional[str] = None
 ) -> List[Dict]:
-    """Scrape les résultats de recherche Reddit pour un mot-clé"""
+    """
+    Scrape les résultats de recherche Reddit pour un mot-clé
+    
+    matched_keyword: mot-clé enregistré sur les posts, si la requête
+    envoyée à Reddit diffère (ex: "crypto subreddit:python")
+    """
     posts = []
+    matched_keyword = matched_keyword or keyword
     
     try:
         url = f"https://www.reddit.com/search.json"
@@ -168,7 +178,8 @@ def scrape_reddit_search(
                     'num_comments': post_data.get('num_comments', 0),
                     'awards': post_data.get('total_awards_received', 0),
                     'is_nsfw': post_data.get('over_18', False),
-                    'matched_keywords': keyword,
+                    'matched_keywords': matched_keyword,
+                    'keywords': [matched_keyword],
                     'age_hours': (datetime.now() - datetime.fromtimestamp(post_data.get('created_utc', 0))).total_seconds() / 3600,
                     'engagement_score': 0
                 })
@@ -189,11 +200,35 @@ def scan_keywords_batch(
     subreddits: Optional[List[str]] = None,
     blacklist: Optional[List[str]] = None,
     time_filter: str = "week",
-    progress_callback=None
+    progress_callback=None,
+    posts_callback=None,
+    filters: Optional[FilterSpec] = None,
+    engagement_weights: Optional[Dict] = None,
+    engagement_formula: Optional[str] = None
 ) -> List[Dict]:
-    """Scanne plusieurs mots-clés avec rate limiting strict"""
+    """
+    Scanne plusieurs mots-clés avec rate limiting strict
+    
+    Les critères de filters (utils/filters.py) et la blacklist sont appliqués
+    à chaque lot dès sa récupération, avant tout calcul de score ; les posts
+    retenus reçoivent ensuite leur engagement_score (poids et formule de la
+    configuration, défauts sinon), une seule fois par lot.
+    posts_callback (optionnel) reçoit chaque lot filtré et noté (avant
+    dédoublonnage), pour un affichage en direct
+    """
     all_posts = []
     total_keywords = len(keywords)
+    filters = (filters or FilterSpec()).merged(exclude_subreddits=blacklist or None)
+    active = not filters.is_empty()
+    keep = filters.predicate()
+    
+    def collect(posts: List[Dict]):
+        if active:
+            posts = [p for p in posts if keep(p)]
+        enrich_posts_with_engagement(posts, engagement_weights, engagement_formula)
+        all_posts.extend(posts)
+        if posts_callback and posts:
+            posts_callback(posts)
     
     st.warning("⏳ Scraping en cours... Cela peut prendre 10-15 minutes. Patience !")
     st.info("🛡️ Rate limiting actif : 10-15 secondes entre chaque requête pour éviter les bans.")
@@ -206,27 +241,28 @@ def scan_keywords_batch(
         if subreddits:
             for subreddit in subreddits:
                 search_query = f"{keyword} subreddit:{subreddit}"
-                posts = scrape_reddit_search(search_query, time_filter, limit=25)
-                all_posts.extend(posts)
+                posts = scrape_reddit_search(search_query, time_filter, limit=25, matched_keyword=keyword)
+                collect(posts)
                 safe_sleep()
         else:
             posts = scrape_reddit_search(keyword, time_filter, limit=50)
-            all_posts.extend(posts)
+            collect(posts)
         
         if i < total_keywords - 1:
             safe_sleep()
     
-    # Filtrer blacklist
-    if blacklist:
-        all_posts = [p for p in all_posts if p["subreddit"].lower() not in [b.lower() for b in blacklist]]
-    
-    # Dédupliquer
-    seen_ids = set()
-    unique_posts = []
+    # Dédupliquer (un post trouvé par plusieurs mots-clés les cumule)
+    posts_by_id = {}
     for post in all_posts:
-        if post["post_id"] not in seen_ids:
-            seen_ids.add(post["post_id"])
-            unique_posts.append(post)
+        existing = posts_by_id.get(post["post_id"])
+        if existing is None:
+            posts_by_id[post["post_id"]] = post
+        else:
+            for kw in post["keywords"]:
+                if kw not in existing["keywords"]:
+                    existing["keywords"].append(kw)
+            existing["matched_keywords"] = ", ".join(existing["keywords"])
+    unique_posts = list(posts_by_id.values())
     
     if progress_callback:
         progress_callback(total_keywords, total_keywords, f"Terminé! {len(unique_posts)} posts uniques")
@@ -0,0 +1,213 @@
+"""
+Module de sentiment par lexique (local, sans service externe)
+
+Chaque mot du titre et du début du contenu reçoit la valence du lexique
+(-3 à +3, anglais et français), avec trois règles :
+- négation : un mot précédé (2 mots au plus) d'une négation est inversé et
+  atténué (× NEGATION_SCALAR)
+- intensifieur / atténuateur : le mot suivant est multiplié
+- contraste ("but", "mais", "however") : ce qui suit pèse plus que ce qui précède
+
+La somme est normalisée dans [-1, 1] (score / √(score² + α), comme VADER).
+Le découpage est celui de utils/text.py (mêmes mots que les mots-clés) ; les
+règles sont appliquées sur tout le lot à la fois (tableaux numpy), sans
+boucle Python par mot. Les gros volumes (recalcul de l'historique) peuvent
+être répartis sur plusieurs processus (score_texts_parallel).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.text import tokenize
+
+
+# Seuils des libellés positif / négatif
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+SENTIMENT_EMOJIS = {"positif": "😊", "neutre": "😐", "négatif": "😠"}
+
+# Longueur du contenu prise en compte (le titre est toujours entier)
+SENTIMENT_CONTENT_LENGTH = 2000
+
+NEGATION_SCALAR = -0.74
+NEGATION_WINDOW = 2
+CONTRAST_BEFORE = 0.5
+CONTRAST_AFTER = 1.5
+NORMALIZATION_ALPHA = 15.0
+
+# Taille des lots envoyés à chaque processus
+PARALLEL_CHUNK_SIZE = 2000
+
+# Valences (mots sans accents, découpés comme par tokenize)
+LEXICON = {
+    # Anglais positif
+    "good": 1.9, "great": 3.1, "excellent": 3.2, "amazing": 2.8, "awesome": 3.1,
+    "love": 3.2, "loved": 2.9, "loving": 2.9, "liked": 1.8, "best": 3.2,
+    "better": 1.9, "nice": 1.8, "happy": 2.7, "glad": 2.0, "thanks": 1.9, "thank": 1.5,
+    "helpful": 1.9, "useful": 1.9, "recommend": 1.5, "recommended": 1.6, "perfect": 2.7,
+    "fantastic": 2.6, "wonderful": 2.7, "brilliant": 2.8, "impressive": 2.3, "impressed": 2.1,
+    "easy": 1.9, "fast": 1.2, "reliable": 1.8, "solid": 1.4, "works": 1.0, "worked": 1.0,
+    "fixed": 1.1, "win": 2.4, "wins": 2.4, "success": 2.7, "successful": 2.8, "cool": 1.3,
+    "fun": 2.3, "enjoy": 2.2, "enjoyed": 2.3, "beautiful": 2.9, "favorite": 2.0, "favourite": 2.0,
+    "smooth": 1.4, "clean": 1.5, "improved": 1.9, "improvement": 1.7,
+    "worth": 0.9, "exciting": 2.2, "excited": 1.8, "superb": 3.0, "incredible": 2.4,
+    "pleased": 1.9, "satisfied": 1.8, "appreciate": 1.7, "appreciated": 1.9, "kudos": 2.3,
+    # Anglais négatif
+    "bad": -2.5, "worse": -2.1, "worst": -3.1, "terrible": -2.1, "awful": -2.0,
+    "horrible": -2.5, "hate": -2.7, "hated": -3.2, "dislike": -1.6, "sucks": -1.5, "suck": -1.9,
+    "broken": -2.2, "bug": -1.2, "bugs": -1.2, "buggy": -1.8, "crash": -1.7, "crashes": -1.7,
+    "crashed": -1.7, "fail": -2.5, "failed": -2.3, "fails": -2.3, "failure": -2.3,
+    "error": -1.7, "errors": -1.4, "issue": -0.8, "issues": -0.8, "problem": -1.7,
+    "problems": -1.7, "slow": -1.1, "expensive": -1.1, "scam": -2.8, "fraud": -2.8,
+    "disappointed": -1.9, "disappointing": -2.2, "disappointment": -2.3, "annoying": -1.9,
+    "annoyed": -1.6, "frustrating": -1.9, "frustrated": -1.8, "useless": -1.8,
+    "waste": -1.8, "wasted": -2.2, "angry": -2.3, "sad": -2.1, "poor": -2.1, "lost": -1.3,
+    "lose": -1.7, "loss": -1.3, "wrong": -2.1, "complaint": -1.5, "complain": -1.2,
+    "refund": -0.8, "ripoff": -2.4, "garbage": -2.3, "trash": -1.8, "unusable": -2.3,
+    "avoid": -1.2, "warning": -1.4, "ridiculous": -1.7, "stupid": -2.4, "hell": -3.6,
+    "dead": -3.3, "down": -0.5, "outage": -1.8, "unreliable": -1.9, "confusing": -1.3,
+    "difficult": -1.4, "hard": -0.4, "ugly": -2.3, "lag": -1.0, "laggy": -1.4,
+    # Français positif (sans accents)
+    "bon": 1.9, "bonne": 1.9, "bien": 1.6, "super": 2.9, "genial": 3.0, "excellente": 3.2,
+    "parfait": 2.7, "parfaite": 2.7, "merci": 1.9, "top": 2.0,
+    "adore": 3.0, "aime": 2.0, "content": 2.0, "contente": 2.0, "ravi": 2.5, "ravie": 2.5,
+    "pratique": 1.5, "efficace": 1.9, "rapide": 1.2, "fiable": 1.8, "meilleur": 2.7,
+    "meilleure": 2.7, "magnifique": 2.9, "incroyable": 2.4, "recommande": 1.5, "bravo": 2.3,
+    "reussi": 2.4, "reussite": 2.6, "agreable": 2.0, "satisfait": 1.8, "satisfaite": 1.8,
+    # Français négatif (sans accents)
+    "mauvais": -2.5, "mauvaise": -2.5, "nul": -2.2, "nulle": -2.2, "pire": -3.0,
+    "deteste": -2.7, "decu": -1.9, "decue": -1.9, "decevant": -2.2,
+    "decevante": -2.2, "arnaque": -2.8, "probleme": -1.7, "problemes": -1.7,
+    "panne": -1.8, "lent": -1.1, "lente": -1.1, "cher": -1.0, "chere": -1.0, "inutile": -1.8,
+    "penible": -1.9, "enerve": -1.6, "triste": -2.1, "erreur": -1.7, "echec": -2.3,
+    "plainte": -1.5, "remboursement": -0.8, "catastrophe": -2.8, "honte": -2.1,
+    "inadmissible": -2.4, "galere": -1.7, "casse": -1.8,
+}
+
+# Négations ("don't" est découpé en "don" + "t")
+NEGATIONS = frozenset([
+    "not", "no", "never", "none", "nothing", "neither", "nor", "without", "t",
+    "cannot", "dont", "doesnt", "didnt", "isnt", "wasnt", "arent", "wont", "cant",
+    "pas", "jamais", "aucun", "aucune", "rien", "sans", "ni",
+])
+
+# Multiplicateurs appliqués au mot suivant
+BOOSTERS = {
+    "very": 1.3, "really": 1.3, "so": 1.2, "extremely": 1.5, "super": 1.3, "totally": 1.3,
+    "absolutely": 1.4, "incredibly": 1.4, "completely": 1.3, "highly": 1.3, "quite": 1.1,
+    "tres": 1.3, "vraiment": 1.3, "trop": 1.3, "tellement": 1.4, "completement": 1.3,
+    "totalement": 1.3, "hyper": 1.4,
+    "slightly": 0.7, "somewhat": 0.8, "barely": 0.6, "kinda": 0.8, "bit": 0.8,
+    "peu": 0.7, "assez": 0.9, "plutot": 0.9,
+}
+
+CONTRASTS = frozenset(["but", "however", "although", "though", "mais", "pourtant", "cependant"])
+
+
+def post_text(post: Dict) -> str:
+    """
+    Titre et début du contenu d'un post
+    """
+    content = (post.get("content") or post.get("content_preview") or "")[:SENTIMENT_CONTENT_LENGTH]
+    return f"{post.get('title') or ''}. {content}"
+
+
+def _shifted(values: np.ndarray, docs: np.ndarray, shift: int, fill) -> np.ndarray:
+    """
+    values décalé de shift positions vers la droite, sans franchir les limites
+    entre textes (fill aux positions sans prédécesseur dans le même texte)
+    """
+    out = np.full_like(values, fill)
+    if shift < len(values):
+        same_doc = docs[shift:] == docs[:-shift]
+        out[shift:] = np.where(same_doc, values[:-shift], fill)
+    return out
+
+
+def score_texts(texts: Sequence[str]) -> np.ndarray:
+    """
+    Scores de sentiment d'un lot de textes, dans [-1, 1] (0 sans mot du lexique)
+    """
+    n = len(texts)
+    if not n:
+        return np.zeros(0, dtype=np.float64)
+
+    token_lists = [tokenize(text) for text in texts]
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=n)
+    tokens = [token for token_list in token_lists for token in token_list]
+    if not tokens:
+        return np.zeros(n, dtype=np.float64)
+
+    docs = np.repeat(np.arange(n), lengths)
+    valence = np.fromiter((LEXICON.get(token, 0.0) for token in tokens), dtype=np.float64, count=len(tokens))
+    negation = np.fromiter((token in NEGATIONS for token in tokens), dtype=bool, count=len(tokens))
+    booster = np.fromiter((BOOSTERS.get(token, 1.0) for token in tokens), dtype=np.float64, count=len(tokens))
+    contrast = np.fromiter((token in CONTRASTS for token in tokens), dtype=bool, count=len(tokens))
+
+    # Intensité portée par le mot précédent
+    valence = valence * _shifted(booster, docs, 1, 1.0)
+
+    # Négation dans les NEGATION_WINDOW mots précédents
+    negated = np.zeros(len(tokens), dtype=bool)
+    for shift in range(1, NEGATION_WINDOW + 1):
+        negated |= _shifted(negation, docs, shift, False)
+    valence = np.where(negated, valence * NEGATION_SCALAR, valence)
+
+    # Contraste : position de chaque mot par rapport au premier "mais" de son texte
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    positions = np.arange(len(tokens)) - np.repeat(starts, lengths)
+    first_contrast = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(first_contrast, docs[contrast], positions[contrast])
+    pivot = first_contrast[docs]
+    has_contrast = pivot != np.iinfo(np.int64).max
+    weights = np.where(has_contrast, np.where(positions < pivot, CONTRAST_BEFORE, CONTRAST_AFTER), 1.0)
+
+    totals = np.bincount(docs, weights=valence * weights, minlength=n)
+    return totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+
+
+def score_texts_parallel(
+    texts: Sequence[str],
+    workers: Optional[int] = None,
+    chunk_size: int = PARALLEL_CHUNK_SIZE
+) -> np.ndarray:
+    """
+    score_texts réparti par lots de chunk_size textes sur un pool de processus
+    (workers processus, le nombre de CPU par défaut) ; en un seul lot local
+    quand il n'y a qu'un lot
+    """
+    texts = list(texts)
+    if len(texts) <= chunk_size or workers == 1:
+        return score_texts(texts)
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(score_texts, chunks)))
+
+
+def sentiment_label(score: Optional[float]) -> str:
+    """
+    "positif", "négatif" ou "neutre"
+    """
+    if score is None:
+        return "neutre"
+    if score >= POSITIVE_THRESHOLD:
+        return "positif"
+    if score <= NEGATIVE_THRESHOLD:
+        return "négatif"
+    return "neutre"
+
+
+def enrich_posts_with_sentiment(posts: List[Dict], workers: Optional[int] = None) -> List[Dict]:
+    """
+    Ajoute le score de sentiment (colonne sentiment) à une liste de posts
+    """
+    if not posts:
+        return posts
+
+    scores = score_texts_parallel([post_text(post) for post in posts], workers=workers)
+    for post, score in zip(posts, scores.tolist()):
+        post["sentiment"] = round(score, 3)
+
+    return posts
@@ -0,0 +1,285 @@
+"""
+Module de sketches probabilistes fusionnables
+
+Résumés de taille bornée calculés par utilisateur et par jour (table
+rollup_daily_sketches) et combinables sur une fenêtre quelconque :
+
+- HyperLogLog : nombre de valeurs distinctes (auteurs, subreddits),
+  erreur relative ~1,6 % avec 4096 registres
+- DDSketch : quantiles d'une distribution (score, engagement), erreur
+  relative bornée par RELATIVE_ACCURACY sur la valeur retournée
+
+La fusion de deux sketches donne exactement le sketch de l'union des
+données : une fenêtre de 90 jours coûte 90 petites lignes, quel que soit
+le nombre de posts.
+"""
+import base64
+import hashlib
+import json
+import math
+import zlib
+from collections import defaultdict
+from typing import List, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+# Précision HyperLogLog : 2^p registres d'un octet
+HLL_PRECISION = 12
+
+# Erreur relative garantie sur les quantiles DDSketch
+RELATIVE_ACCURACY = 0.01
+
+
+def _hash64(value) -> int:
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """
+    Estimateur du nombre de valeurs distinctes (HyperLogLog, correction
+    linear counting pour les petits effectifs)
+    """
+
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add(self, value) -> None:
+        if value is None or value == "":
+            return
+        h = _hash64(value)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        # Rang du premier bit à 1 dans les 64 - p bits restants
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable) -> "HyperLogLog":
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Précisions HyperLogLog différentes")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_text(self) -> str:
+        payload = bytes([self.p]) + zlib.compress(self.registers.tobytes())
+        return base64.b64encode(payload).decode("ascii")
+
+    @classmethod
+    def from_text(cls, text: Optional[str]) -> "HyperLogLog":
+        if not text:
+            return cls()
+        payload = base64.b64decode(text)
+        sketch = cls(payload[0])
+        sketch.registers = np.frombuffer(zlib.decompress(payload[1:]), dtype=np.uint8).copy()
+        return sketch
+
+
+class DDSketch:
+    """
+    Sketch de quantiles à erreur relative bornée (DDSketch)
+
+    Chaque valeur est comptée dans un bucket logarithmique ; les valeurs
+    négatives et nulles ont leur propre store. Fusion = somme des buckets.
+    """
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = defaultdict(int)
+        self.negative = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value: float) -> int:
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value) -> None:
+        if value is None:
+            return
+        value = float(value)
+        if math.isnan(value):
+            return
+
+        if value > 0:
+            self.positive[self._key(value)] += 1
+        elif value < 0:
+            self.negative[self._key(-value)] += 1
+        else:
+            self.zero_count += 1
+
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update(self, values: Iterable) -> "DDSketch":
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Précisions DDSketch différentes")
+        for key, n in other.positive.items():
+            self.positive[key] += n
+        for key, n in other.negative.items():
+            self.negative[key] += n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _buckets(self) -> List[tuple]:
+        # (valeur représentative, effectif) par valeur croissante
+        buckets = [(-self._value(key), self.negative[key]) for key in sorted(self.negative, reverse=True)]
+        if self.zero_count:
+            buckets.append((0.0, self.zero_count))
+        buckets.extend((self._value(key), self.positive[key]) for key in sorted(self.positive))
+        return buckets
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, n in self._buckets():
+            seen += n
+            if seen > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        return [self.quantile(q) for q in qs]
+
+    def histogram(self, bins: int = 50) -> List[Dict]:
+        """
+        Histogramme approché (buckets regroupés en intervalles réguliers)
+
+        Returns:
+            Lignes {bin_start, bin_end, count}
+        """
+        if not self.count:
+            return []
+
+        low, high = self.min, self.max
+        if high <= low:
+            return [{"bin_start": low, "bin_end": high, "count": self.count}]
+
+        edges = np.linspace(low, high, bins + 1)
+        values, counts = zip(*self._buckets())
+        values = np.clip(np.asarray(values), low, high)
+        counts_per_bin, _ = np.histogram(values, bins=edges, weights=np.asarray(counts))
+
+        return [
+            {"bin_start": float(edges[i]), "bin_end": float(edges[i + 1]), "count": int(counts_per_bin[i])}
+            for i in range(bins)
+        ]
+
+    def to_text(self) -> str:
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "p": self.positive,
+            "n": self.negative,
+            "z": self.zero_count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_text(cls, text: Optional[str]) -> "DDSketch":
+        if not text:
+            return cls()
+        data = json.loads(text)
+        sketch = cls(data["a"])
+        sketch.positive.update({int(key): n for key, n in data["p"].items()})
+        sketch.negative.update({int(key): n for key, n in data["n"].items()})
+        sketch.zero_count = data["z"]
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+def build_daily_sketch(user_id: str, day: str, posts: Iterable[Dict]) -> Dict:
+    """
+    Ligne de rollup_daily_sketches pour les posts d'un utilisateur sur un jour
+    """
+    authors, subreddits = HyperLogLog(), HyperLogLog()
+    scores, engagement = DDSketch(), DDSketch()
+    total = 0
+
+    for post in posts:
+        authors.add(post.get("author"))
+        subreddits.add(post.get("subreddit"))
+        scores.add(post.get("score"))
+        engagement.add(post.get("engagement_score"))
+        total += 1
+
+    return {
+        "user_id": user_id,
+        "day": day,
+        "posts": total,
+        "authors_hll": authors.to_text(),
+        "subreddits_hll": subreddits.to_text(),
+        "score_sketch": scores.to_text(),
+        "engagement_sketch": engagement.to_text(),
+    }
+
+
+def merge_daily_sketches(rows: Iterable[Dict]) -> Dict:
+    """
+    Fusionne des lignes de rollup_daily_sketches en sketches de fenêtre
+
+    Returns:
+        Dict {posts, days, authors, subreddits (HyperLogLog),
+        score, engagement (DDSketch)}
+    """
+    window = {
+        "posts": 0,
+        "days": 0,
+        "authors": HyperLogLog(),
+        "subreddits": HyperLogLog(),
+        "score": DDSketch(),
+        "engagement": DDSketch(),
+    }
+
+    for row in rows:
+        window["posts"] += row.get("posts") or 0
+        window["days"] += 1
+        window["authors"].merge(HyperLogLog.from_text(row.get("authors_hll")))
+        window["subreddits"].merge(HyperLogLog.from_text(row.get("subreddits_hll")))
+        window["score"].merge(DDSketch.from_text(row.get("score_sketch")))
+        window["engagement"].merge(DDSketch.from_text(row.get("engagement_sketch")))
+
+    return window
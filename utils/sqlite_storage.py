@@ -0,0 +1,805 @@
+"""
+Backend de stockage SQLite embarqué (déploiement mono-machine, CI, benchmarks)
+
+Même modèle de données, index et agrégations que database_schema.sql,
+adaptés à SQLite : schéma dans database_schema_sqlite.sql, appliqué
+automatiquement à l'ouverture de la base.
+"""
+import json
+import os
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+from .storage import StorageBackend, split_post_bodies, ROLLUP_DIMENSIONS
+from .filters import FilterSpec
+from .analyzer import engagement_components, score_engagement_batch
+
+SCHEMA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "database_schema_sqlite.sql"
+)
+
+# Colonnes de posts et valeurs par défaut à l'insertion
+POST_FIELDS = {
+    "post_id": None,
+    "user_id": "default",
+    "title": "",
+    "content_preview": None,
+    "author": None,
+    "subreddit": "",
+    "url": "",
+    "post_date": None,
+    "score": 0,
+    "upvote_ratio": 0.5,
+    "num_comments": 0,
+    "awards": 0,
+    "is_nsfw": False,
+    "matched_keywords": None,
+    "keywords": [],
+    "age_hours": None,
+    "engagement_score": 0,
+    "cluster_id": None,
+    "sentiment": None,
+    "created_at": None,
+}
+
+# Colonnes mises à jour quand un post déjà connu est re-scanné
+POST_UPDATE_FIELDS = [
+    "title", "content_preview", "score", "upvote_ratio", "num_comments", "awards",
+    "is_nsfw", "age_hours", "engagement_score", "cluster_id", "sentiment"
+]
+
+# Union triée des mots-clés existants et nouveaux (équivalent du trigger merge_post_keywords)
+MERGED_KEYWORDS_SQL = (
+    "SELECT value FROM json_each(posts.keywords) "
+    "UNION SELECT value FROM json_each(excluded.keywords) ORDER BY value"
+)
+
+SELECTABLE_COLUMNS = {"id"} | set(POST_FIELDS)
+
+# Niveau de compression zlib des corps de posts
+BODY_COMPRESSION_LEVEL = 6
+
+
+def _compress_body(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"), BODY_COMPRESSION_LEVEL)
+
+
+def _body_text(blob: Optional[bytes]) -> Optional[str]:
+    """
+    Décompresse un corps de post (fonction SQL body_text)
+    """
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """
+    Traduit une requête au format websearch ("phrase", OR, -exclusion) en requête FTS5
+    """
+    positives, negatives = [], []
+
+    for negated, term in re.findall(r'(-?)("[^"]*"|\S+)', query):
+        if term.upper() == "OR" and not negated:
+            if positives and positives[-1] != "OR":
+                positives.append("OR")
+            continue
+
+        phrase = term.strip('"').replace('"', '""').strip()
+        if phrase:
+            (negatives if negated else positives).append(f'"{phrase}"')
+
+    while positives and positives[-1] == "OR":
+        positives.pop()
+
+    if not positives:
+        return None
+
+    fts_query = " ".join(positives)
+    for term in negatives:
+        fts_query += f" NOT {term}"
+    return fts_query
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Stockage dans un fichier SQLite local
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(SCHEMA_PATH, encoding="utf-8") as schema_file:
+            schema = schema_file.read()
+
+        with self._transaction() as conn:
+            conn.executescript(schema)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Connexion dédiée, validée en fin de bloc (annulée en cas d'exception)
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("body_text", 1, _body_text, deterministic=True)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _since(days: int) -> str:
+        return (datetime.now() - timedelta(days=days)).isoformat()
+
+    @staticmethod
+    def _since_day(days: int) -> str:
+        return (datetime.now() - timedelta(days=days)).date().isoformat()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        if "keywords" in data and isinstance(data["keywords"], str):
+            data["keywords"] = json.loads(data["keywords"])
+        if "is_nsfw" in data and data["is_nsfw"] is not None:
+            data["is_nsfw"] = bool(data["is_nsfw"])
+        return data
+
+    # ----- Mots-clés -----
+
+    def add_keyword(self, keyword: str, user_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO keywords (keyword, user_id, active, created_at) VALUES (?, ?, 1, ?)",
+                (keyword.lower().strip(), user_id, datetime.now().isoformat())
+            )
+
+    def get_keywords(self, user_id: str, active_only: bool = True) -> List[str]:
+        sql = "SELECT keyword FROM keywords WHERE user_id = ?"
+        if active_only:
+            sql += " AND active = 1"
+
+        with self._transaction() as conn:
+            return [row["keyword"] for row in conn.execute(sql, (user_id,))]
+
+    def delete_keyword(self, keyword: str, user_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM keywords WHERE keyword = ? AND user_id = ?",
+                (keyword, user_id)
+            )
+
+    # ----- Subreddits -----
+
+    def add_subreddit(self, subreddit: str, list_type: str, user_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO subreddits (subreddit, list_type, user_id, active, created_at) "
+                "VALUES (?, ?, ?, 1, ?)",
+                (subreddit.lower().strip(), list_type, user_id, datetime.now().isoformat())
+            )
+
+    def get_subreddits(self, list_type: str, user_id: str) -> List[str]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT subreddit FROM subreddits WHERE user_id = ? AND list_type = ? AND active = 1",
+                (user_id, list_type)
+            )
+            return [row["subreddit"] for row in rows]
+
+    def delete_subreddit(self, subreddit: str, user_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM subreddits WHERE subreddit = ? AND user_id = ?",
+                (subreddit, user_id)
+            )
+
+    # ----- Posts -----
+
+    def save_posts(self, posts_data: List[Dict]) -> None:
+        columns = list(POST_FIELDS)
+        updates = [f"{col} = excluded.{col}" for col in POST_UPDATE_FIELDS]
+        updates.append(f"keywords = (SELECT json_group_array(value) FROM ({MERGED_KEYWORDS_SQL}))")
+        updates.append(f"matched_keywords = (SELECT group_concat(value, ', ') FROM ({MERGED_KEYWORDS_SQL}))")
+
+        sql = (
+            f"INSERT INTO posts ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(post_id) DO UPDATE SET {', '.join(updates)}"
+        )
+
+        posts, bodies = split_post_bodies(posts_data)
+
+        rows = []
+        for post in posts:
+            values = []
+            for col, default in POST_FIELDS.items():
+                value = post.get(col, default)
+                if col == "keywords":
+                    value = json.dumps(value or [])
+                values.append(value)
+            rows.append(values)
+
+        post_ids = json.dumps([post["post_id"] for post in posts])
+        batch_ids = "SELECT p.id FROM posts p JOIN json_each(?) j ON j.value = p.post_id"
+
+        with self._transaction() as conn:
+            # Index plein texte : anciennes entrées retirées avant la mise à jour
+            # des corps (l'index external content a besoin des valeurs indexées)
+            conn.execute(
+                "INSERT INTO posts_fts (posts_fts, rowid, title, content) "
+                f"SELECT 'delete', id, title, content FROM posts_search_source WHERE id IN ({batch_ids})",
+                (post_ids,)
+            )
+
+            conn.executemany(
+                "INSERT INTO post_bodies (post_id, content) VALUES (?, ?) "
+                "ON CONFLICT(post_id) DO UPDATE SET content = excluded.content",
+                [(body["post_id"], _compress_body(body["content"])) for body in bodies]
+            )
+            conn.executemany(sql, rows)
+
+            conn.execute(
+                "INSERT INTO posts_fts (rowid, title, content) "
+                f"SELECT id, title, content FROM posts_search_source WHERE id IN ({batch_ids})",
+                (post_ids,)
+            )
+
+    def get_posts(
+        self,
+        user_id: str,
+        days: int,
+        limit: int,
+        filters: Optional[FilterSpec] = None,
+        columns: Optional[List[str]] = None,
+        sort_by: str = "engagement_score",
+        cursor: Optional[Tuple] = None
+    ) -> List[Dict]:
+        if columns:
+            unknown = set(columns) - SELECTABLE_COLUMNS
+            if unknown:
+                raise ValueError(f"Colonnes inconnues: {', '.join(sorted(unknown))}")
+            select = ", ".join(f"p.{col}" for col in columns)
+        else:
+            select = "p.*"
+
+        sql = f"SELECT {select} FROM posts p WHERE p.user_id = ? AND p.post_date >= ?"
+        params = [user_id, self._since(days)]
+
+        # Pagination keyset : (sort_by, id) < curseur, servie par l'index composite
+        if cursor:
+            sql += f" AND (p.{sort_by}, p.id) < (?, ?)"
+            params.extend(cursor)
+
+        if filters:
+            clauses, filter_params = filters.sql_clauses("p")
+            sql += "".join(f" AND {clause}" for clause in clauses)
+            params.extend(filter_params)
+
+        sql += f" ORDER BY p.{sort_by} DESC, p.id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._transaction() as conn:
+            return [self._row_to_dict(row) for row in conn.execute(sql, params)]
+
+    def get_post_bodies(self, post_ids: List[str]) -> Dict[str, str]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT b.post_id, b.content FROM post_bodies b "
+                "JOIN json_each(?) j ON j.value = b.post_id",
+                (json.dumps(list(post_ids)),)
+            )
+            return {row["post_id"]: _body_text(row["content"]) for row in rows}
+
+    def get_signature_candidates(self, user_id: str, band_keys: List[str]) -> List[Dict]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT s.post_id, s.cluster_id, s.signature FROM post_signatures s "
+                "WHERE s.post_id IN ("
+                "    SELECT b.post_id FROM post_lsh_bands b "
+                "    JOIN json_each(?) j ON b.user_id = ? AND b.band_key = j.value"
+                ")",
+                (json.dumps(list(band_keys)), user_id)
+            )
+            return [dict(row) for row in rows]
+
+    def save_signatures(self, rows: List[Dict]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO post_signatures (post_id, user_id, cluster_id, signature) "
+                "VALUES (:post_id, :user_id, :cluster_id, :signature) "
+                "ON CONFLICT(post_id) DO UPDATE SET "
+                "cluster_id = excluded.cluster_id, signature = excluded.signature",
+                rows
+            )
+            conn.executemany(
+                "DELETE FROM post_lsh_bands WHERE post_id = ?",
+                [(row["post_id"],) for row in rows]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO post_lsh_bands (user_id, band_key, post_id) VALUES (?, ?, ?)",
+                [(row["user_id"], key, row["post_id"]) for row in rows for key in row["bands"]]
+            )
+
+    def search_posts(
+        self,
+        user_id: str,
+        query: str,
+        days: int,
+        filters: Optional[FilterSpec] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict]:
+        fts_query = _fts_query(query)
+        if not fts_query:
+            return []
+
+        # Mêmes critères que la liste des posts (utils/filters.py)
+        clauses, filter_params = (filters or FilterSpec()).sql_clauses("p")
+        where = "".join(f"\n            AND {clause}" for clause in clauses)
+
+        # bm25 : titre pondéré x10 par rapport au contenu (poids A/B côté Postgres)
+        sql = f"""
+            WITH matches AS (
+                SELECT rowid, -bm25(posts_fts, 10.0, 1.0) AS rank
+                FROM posts_fts
+                WHERE posts_fts MATCH ?
+            )
+            SELECT
+                p.id, p.post_id, p.title, p.author, p.subreddit, p.url, p.post_date,
+                p.score, p.upvote_ratio, p.num_comments, p.awards, p.is_nsfw,
+                p.matched_keywords, p.engagement_score, p.content_preview,
+                p.cluster_id, p.sentiment,
+                m.rank,
+                COUNT(*) OVER () AS total_count
+            FROM matches m
+            JOIN posts p ON p.id = m.rowid
+            WHERE p.user_id = ?
+            AND p.post_date >= ?{where}
+            ORDER BY m.rank DESC, p.id DESC
+            LIMIT ? OFFSET ?
+        """
+        params = (fts_query, user_id, self._since(days), *filter_params, limit, offset)
+
+        with self._transaction() as conn:
+            results = [self._row_to_dict(row) for row in conn.execute(sql, params)]
+
+            # Surlignage calculé uniquement pour les lignes de la page
+            ids = [post["id"] for post in results]
+            highlights = {}
+            if ids:
+                rows = conn.execute(
+                    f"""
+                    SELECT
+                        rowid,
+                        highlight(posts_fts, 0, '**', '**') AS title_highlight,
+                        NULLIF(snippet(posts_fts, 1, '**', '**', '', 30), '') AS content_highlight
+                    FROM posts_fts
+                    WHERE posts_fts MATCH ? AND rowid IN ({', '.join('?' for _ in ids)})
+                    """,
+                    [fts_query] + ids
+                )
+                highlights = {row["rowid"]: dict(row) for row in rows}
+
+        for post in results:
+            highlight = highlights.get(post["id"], {})
+            post["title_highlight"] = highlight.get("title_highlight")
+            post["content_highlight"] = highlight.get("content_highlight")
+
+        return results
+
+    def get_expiring_posts(self, days: int, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM posts WHERE post_date < ? AND id > ? ORDER BY id LIMIT ?",
+                (self._since(days), after_id, limit)
+            )
+            return [self._row_to_dict(row) for row in rows]
+
+    def cleanup_old_posts(self, days: int) -> None:
+        # Pas de partitionnement dans SQLite : DELETE classique (volumes locaux)
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM posts WHERE post_date < ?", (self._since(days),))
+
+    def count_posts(self, user_id: str) -> int:
+        with self._transaction() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM posts WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def rescore_posts(
+        self,
+        user_id: str,
+        weights: Dict,
+        after_id: int = 0,
+        limit: int = 1000,
+        formula: Optional[str] = None
+    ) -> Dict:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, score, num_comments, awards, upvote_ratio, age_hours, engagement_score "
+                "FROM posts WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (user_id, after_id, limit)
+            ).fetchall()
+
+            if not rows:
+                return {"processed": 0, "updated": 0, "last_id": None}
+
+            # Lot converti en colonnes puis scoré en une passe vectorisée
+            components, age_hours = engagement_components([dict(row) for row in rows])
+            scores = score_engagement_batch(components, age_hours, weights, formula).tolist()
+
+            # Seules les lignes dont le score change sont réécrites
+            changes = [
+                (score, row["id"]) for score, row in zip(scores, rows)
+                if score != row["engagement_score"]
+            ]
+            conn.executemany("UPDATE posts SET engagement_score = ? WHERE id = ?", changes)
+
+        return {"processed": len(rows), "updated": len(changes), "last_id": rows[-1]["id"]}
+
+    def get_sentiment_batch(
+        self,
+        user_id: str,
+        after_id: int = 0,
+        limit: int = 1000,
+        missing_only: bool = True
+    ) -> List[Dict]:
+        sql = (
+            "SELECT id, post_id, title, content_preview FROM posts "
+            "WHERE user_id = ? AND id > ? "
+            + ("AND sentiment IS NULL " if missing_only else "")
+            + "ORDER BY id LIMIT ?"
+        )
+        with self._transaction() as conn:
+            return [dict(row) for row in conn.execute(sql, (user_id, after_id, limit))]
+
+    def update_sentiments(self, user_id: str, scores: Dict[str, float]) -> int:
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "UPDATE posts SET sentiment = ? "
+                "WHERE user_id = ? AND post_id = ? AND sentiment IS NOT ?",
+                [(score, user_id, post_id, score) for post_id, score in scores.items()]
+            )
+            return cursor.rowcount
+
+    # ----- Agrégations -----
+
+    def get_stats(self, user_id: str, days: int, top: int = 5) -> Dict:
+        params = (user_id, self._since(days))
+
+        with self._transaction() as conn:
+            totals = conn.execute(
+                "SELECT COUNT(*) AS total_posts, COALESCE(AVG(engagement_score), 0) AS avg_engagement "
+                "FROM posts WHERE user_id = ? AND post_date >= ?",
+                params
+            ).fetchone()
+            top_subreddits = conn.execute(
+                "SELECT subreddit, COUNT(*) AS total_posts FROM posts "
+                "WHERE user_id = ? AND post_date >= ? "
+                "GROUP BY subreddit ORDER BY total_posts DESC, subreddit LIMIT ?",
+                params + (top,)
+            ).fetchall()
+
+        return {
+            "total_posts": totals["total_posts"],
+            "avg_engagement": totals["avg_engagement"],
+            "top_subreddits": [dict(row) for row in top_subreddits],
+        }
+
+    def get_subreddit_stats(
+        self,
+        user_id: str,
+        days: int,
+        subreddit: Optional[str] = None
+    ) -> List[Dict]:
+        sql = """
+            SELECT
+                subreddit,
+                COUNT(*) AS total_posts,
+                AVG(score) AS avg_score,
+                AVG(num_comments) AS avg_comments,
+                AVG(engagement_score) AS avg_engagement,
+                MAX(post_date) AS last_post_date
+            FROM posts
+            WHERE user_id = ? AND post_date >= ?
+            AND (? IS NULL OR subreddit = ?)
+            GROUP BY subreddit
+            ORDER BY avg_engagement DESC
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(sql, (user_id, self._since(days), subreddit, subreddit))
+            return [dict(row) for row in rows]
+
+    def get_keyword_stats(
+        self,
+        user_id: str,
+        days: int,
+        subreddit: Optional[str] = None
+    ) -> List[Dict]:
+        sql = """
+            SELECT
+                k.keyword,
+                COUNT(*) AS total_posts,
+                AVG(p.score) AS avg_score,
+                AVG(p.engagement_score) AS avg_engagement
+            FROM posts p
+            JOIN post_keywords k ON k.post_id = p.post_id
+            WHERE p.user_id = ? AND p.post_date >= ?
+            AND (? IS NULL OR p.subreddit = ?)
+            GROUP BY k.keyword
+            ORDER BY avg_engagement DESC
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(sql, (user_id, self._since(days), subreddit, subreddit))
+            return [dict(row) for row in rows]
+
+    # ----- Agrégats journaliers -----
+
+    def get_daily_rollups(
+        self,
+        user_id: str,
+        days: int,
+        dimension: Optional[str] = None,
+        names: Optional[List[str]] = None
+    ) -> List[Dict]:
+        if dimension is not None and dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"Dimension inconnue: {dimension}")
+
+        if dimension == "keyword":
+            sql = """
+                SELECT day, keyword AS name, SUM(posts) AS total_posts, SUM(score_sum) AS score_sum,
+                    NULL AS comments_sum, SUM(engagement_sum) AS engagement_sum,
+                    SUM(sentiment_sum) AS sentiment_sum
+                FROM rollup_daily_keyword
+                WHERE user_id = ? AND day >= ?
+                AND (? IS NULL OR keyword IN (SELECT value FROM json_each(?)))
+                GROUP BY day, keyword
+                HAVING SUM(posts) > 0
+                ORDER BY day, keyword
+            """
+        elif dimension == "subreddit":
+            sql = """
+                SELECT day, subreddit AS name, posts AS total_posts, score_sum,
+                    comments_sum, engagement_sum, sentiment_sum
+                FROM rollup_daily_subreddit
+                WHERE user_id = ? AND day >= ?
+                AND (? IS NULL OR subreddit IN (SELECT value FROM json_each(?)))
+                AND posts > 0
+                ORDER BY day, subreddit
+            """
+        else:
+            sql = """
+                SELECT day, NULL AS name, SUM(posts) AS total_posts, SUM(score_sum) AS score_sum,
+                    SUM(comments_sum) AS comments_sum, SUM(engagement_sum) AS engagement_sum,
+                    SUM(sentiment_sum) AS sentiment_sum
+                FROM rollup_daily_subreddit
+                WHERE user_id = ? AND day >= ?
+                GROUP BY day
+                HAVING SUM(posts) > 0
+                ORDER BY day
+            """
+
+        params = [user_id, self._since_day(days)]
+        if dimension is not None:
+            names_json = json.dumps(names) if names is not None else None
+            params += [names_json, names_json]
+
+        with self._transaction() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def get_rollup_totals(self, user_id: str, days: int, dimension: str = "subreddit") -> List[Dict]:
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"Dimension inconnue: {dimension}")
+
+        sql = f"""
+            SELECT {dimension} AS name, SUM(posts) AS total_posts, SUM(engagement_sum) AS engagement_sum,
+                SUM(sentiment_sum) AS sentiment_sum, SUM(positive_posts) AS positive_posts,
+                SUM(negative_posts) AS negative_posts
+            FROM rollup_daily_{dimension}
+            WHERE user_id = ? AND day >= ?
+            GROUP BY {dimension}
+            HAVING SUM(posts) > 0
+            ORDER BY total_posts DESC, name
+        """
+        with self._transaction() as conn:
+            return [dict(row) for row in conn.execute(sql, (user_id, self._since_day(days)))]
+
+    def get_activity_heatmap(self, user_id: str, days: int) -> List[Dict]:
+        # strftime('%w') : 0 = dimanche, ramené à 0 = lundi
+        sql = """
+            SELECT
+                (CAST(strftime('%w', day) AS INTEGER) + 6) % 7 AS day_of_week,
+                hour,
+                SUM(posts) AS total_posts
+            FROM rollup_hourly
+            WHERE user_id = ? AND day >= ?
+            GROUP BY day_of_week, hour
+            HAVING SUM(posts) > 0
+            ORDER BY day_of_week, hour
+        """
+        with self._transaction() as conn:
+            return [dict(row) for row in conn.execute(sql, (user_id, self._since_day(days)))]
+
+    def get_subreddit_activity(
+        self,
+        user_id: str,
+        days: int,
+        subreddits: Optional[List[str]] = None
+    ) -> List[Dict]:
+        sql = """
+            SELECT
+                s.subreddit, s.day, s.posts, s.engagement_sum,
+                coalesce(SUM(k.posts), 0) AS keyword_hits,
+                json_group_array(k.keyword) FILTER (WHERE k.posts > 0) AS keywords
+            FROM rollup_daily_subreddit s
+            LEFT JOIN rollup_daily_keyword k
+                ON k.user_id = s.user_id AND k.day = s.day AND k.subreddit = s.subreddit
+            WHERE s.user_id = ? AND s.day >= ?
+            AND (? IS NULL OR s.subreddit IN (SELECT value FROM json_each(?)))
+            AND s.posts > 0
+            GROUP BY s.subreddit, s.day
+            ORDER BY s.subreddit, s.day
+        """
+        subreddits_json = json.dumps(subreddits) if subreddits is not None else None
+
+        with self._transaction() as conn:
+            rows = conn.execute(sql, (user_id, self._since_day(days), subreddits_json, subreddits_json))
+            return [
+                {**dict(row), "keywords": json.loads(row["keywords"] or "[]")}
+                for row in rows
+            ]
+
+    # ----- Sketches journaliers -----
+
+    def get_day_posts(
+        self,
+        user_id: str,
+        day: str,
+        columns: List[str],
+        after_id: int = 0,
+        limit: int = 1000
+    ) -> List[Dict]:
+        columns = ["id"] + [col for col in columns if col != "id"]
+        unknown = set(columns) - SELECTABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Colonnes inconnues: {', '.join(sorted(unknown))}")
+
+        next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+        sql = (
+            f"SELECT {', '.join(columns)} FROM posts "
+            "WHERE user_id = ? AND post_date >= ? AND post_date < ? AND id > ? "
+            "ORDER BY id LIMIT ?"
+        )
+        with self._transaction() as conn:
+            rows = conn.execute(sql, (user_id, day, next_day, after_id, limit))
+            return [self._row_to_dict(row) for row in rows]
+
+    def save_daily_sketches(self, rows: List[Dict]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO rollup_daily_sketches (
+                    user_id, day, posts, authors_hll, subreddits_hll,
+                    score_sketch, engagement_sketch, updated_at
+                )
+                VALUES (
+                    :user_id, :day, :posts, :authors_hll, :subreddits_hll,
+                    :score_sketch, :engagement_sketch, CURRENT_TIMESTAMP
+                )
+                ON CONFLICT(user_id, day) DO UPDATE SET
+                    posts = excluded.posts,
+                    authors_hll = excluded.authors_hll,
+                    subreddits_hll = excluded.subreddits_hll,
+                    score_sketch = excluded.score_sketch,
+                    engagement_sketch = excluded.engagement_sketch,
+                    updated_at = excluded.updated_at
+                """,
+                rows
+            )
+
+    def get_daily_sketches(self, user_id: str, days: int) -> List[Dict]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT day, posts, authors_hll, subreddits_hll, score_sketch, engagement_sketch "
+                "FROM rollup_daily_sketches WHERE user_id = ? AND day >= ? ORDER BY day",
+                (user_id, self._since_day(days))
+            )
+            return [dict(row) for row in rows]
+
+    # ----- Fouille des termes associés aux mots-clés -----
+
+    def get_keyword_mining_state(self, user_id: str) -> Optional[str]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT state FROM keyword_mining WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row["state"] if row else None
+
+    def save_keyword_mining_state(self, user_id: str, state: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO keyword_mining (user_id, state, updated_at) "
+                "VALUES (?, ?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                "state = excluded.state, updated_at = excluded.updated_at",
+                (user_id, state)
+            )
+
+    # ----- Découverte de subreddits -----
+
+    def save_subreddit_discovery(self, rows: List[Dict]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO subreddit_discovery (
+                    user_id, subreddit, posts, keyword_hits, keywords_matched,
+                    engagement_sum, decayed_hits, last_day, as_of, updated_at
+                )
+                VALUES (
+                    :user_id, :subreddit, :posts, :keyword_hits, :keywords_matched,
+                    :engagement_sum, :decayed_hits, :last_day, :as_of, CURRENT_TIMESTAMP
+                )
+                ON CONFLICT(user_id, subreddit) DO UPDATE SET
+                    posts = excluded.posts,
+                    keyword_hits = excluded.keyword_hits,
+                    keywords_matched = excluded.keywords_matched,
+                    engagement_sum = excluded.engagement_sum,
+                    decayed_hits = excluded.decayed_hits,
+                    last_day = excluded.last_day,
+                    as_of = excluded.as_of,
+                    updated_at = excluded.updated_at
+                """,
+                rows
+            )
+
+    def get_subreddit_discovery(self, user_id: str) -> List[Dict]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT subreddit, posts, keyword_hits, keywords_matched, engagement_sum, "
+                "decayed_hits, last_day, as_of FROM subreddit_discovery WHERE user_id = ?",
+                (user_id,)
+            )
+            return [dict(row) for row in rows]
+
+    # ----- Configuration utilisateur -----
+
+    def get_user_config(self, user_id: str) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM user_configs WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        config = dict(row)
+        if isinstance(config.get("engagement_weights"), str):
+            config["engagement_weights"] = json.loads(config["engagement_weights"])
+        return config
+
+    def update_user_config(self, user_id: str, config: Dict) -> None:
+        with self._transaction() as conn:
+            known = {row["name"] for row in conn.execute("PRAGMA table_info(user_configs)")}
+            columns = [col for col in config if col in known and col != "id"]
+            values = [
+                json.dumps(config[col]) if isinstance(config[col], (dict, list)) else config[col]
+                for col in columns
+            ]
+            updates = ", ".join(f"{col} = excluded.{col}" for col in columns if col != "user_id")
+
+            conn.execute(
+                f"INSERT INTO user_configs ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT(user_id) DO UPDATE SET {updates}",
+                values
+            )
@@ -0,0 +1,373 @@
+"""
+Interface de stockage commune aux backends (Supabase, SQLite embarqué)
+
+Les backends exposent les mêmes opérations que utils/database.py mais
+sans dépendance à Streamlit : ils retournent des structures Python simples
+(listes de dicts) et lèvent une exception en cas d'erreur. La gestion des
+erreurs pour l'interface et la conversion en DataFrame restent dans
+utils/database.py.
+"""
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional, Tuple
+
+from .filters import FilterSpec
+
+
+# Projections prédéfinies pour get_posts (évite de transférer le selftext complet)
+# None = toutes les colonnes
+POST_COLUMNS = {
+    # Liste de posts (page Résultats) : tout sauf le contenu
+    "list": [
+        "id", "post_id", "title", "author", "subreddit", "url", "post_date", "score",
+        "upvote_ratio", "num_comments", "awards", "is_nsfw", "matched_keywords",
+        "engagement_score", "content_preview", "cluster_id", "sentiment"
+    ],
+    # Graphiques et agrégations (page Historique)
+    "analytics": [
+        "post_id", "subreddit", "post_date", "score", "num_comments", "engagement_score", "sentiment"
+    ],
+    # Composantes du score d'engagement (simulation de poids, page Configuration)
+    "scoring": [
+        "post_id", "title", "subreddit", "url", "score", "num_comments", "awards",
+        "upvote_ratio", "age_hours"
+    ],
+    # Export CSV : toutes les colonnes (contenu complet inclus)
+    "export": None,
+}
+
+# Longueur de l'aperçu stocké dans posts.content_preview ; le contenu complet
+# est stocké à part (table post_bodies, compressée) et chargé à la demande
+CONTENT_PREVIEW_LENGTH = 200
+
+# Dimensions des agrégats journaliers (tables rollup_*)
+ROLLUP_DIMENSIONS = ["subreddit", "keyword"]
+
+# Colonnes de tri autorisées (chacune couverte par un index (user_id, colonne DESC, id DESC))
+SORT_COLUMNS = ["engagement_score", "score", "num_comments", "post_date"]
+
+
+def resolve_columns(columns) -> Optional[List[str]]:
+    """
+    Convertit un nom de projection, une liste ou une chaîne "a, b" en liste de colonnes
+    """
+    if columns is None:
+        return None
+    if isinstance(columns, str):
+        if columns in POST_COLUMNS:
+            return POST_COLUMNS[columns]
+        if columns.strip() == "*":
+            return None
+        return [c.strip() for c in columns.split(",") if c.strip()]
+    return list(columns)
+
+
+def split_post_bodies(posts_data: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Sépare le contenu des posts de leurs métadonnées
+
+    Returns:
+        (posts sans content mais avec content_preview,
+         corps {post_id, post_date, user_id, content} des posts ayant un contenu)
+    """
+    posts, bodies = [], []
+
+    for post in posts_data:
+        post = dict(post)
+        content = post.pop("content", None) or ""
+        post["content_preview"] = content[:CONTENT_PREVIEW_LENGTH]
+        posts.append(post)
+
+        if content:
+            bodies.append({
+                "post_id": post["post_id"],
+                "post_date": post["post_date"],
+                "user_id": post.get("user_id", "default"),
+                "content": content,
+            })
+
+    return posts, bodies
+
+
+class StorageBackend(ABC):
+    """
+    Opérations de stockage de Reddit Monitor
+
+    Les paramètres reprennent ceux des fonctions de utils/database.py.
+    """
+
+    # ----- Mots-clés -----
+
+    @abstractmethod
+    def add_keyword(self, keyword: str, user_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_keywords(self, user_id: str, active_only: bool = True) -> List[str]:
+        ...
+
+    @abstractmethod
+    def delete_keyword(self, keyword: str, user_id: str) -> None:
+        ...
+
+    # ----- Subreddits -----
+
+    @abstractmethod
+    def add_subreddit(self, subreddit: str, list_type: str, user_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_subreddits(self, list_type: str, user_id: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def delete_subreddit(self, subreddit: str, user_id: str) -> None:
+        ...
+
+    # ----- Posts -----
+
+    @abstractmethod
+    def save_posts(self, posts_data: List[Dict]) -> None:
+        ...
+
+    @abstractmethod
+    def get_posts(
+        self,
+        user_id: str,
+        days: int,
+        limit: int,
+        filters: Optional[FilterSpec] = None,
+        columns: Optional[List[str]] = None,
+        sort_by: str = "engagement_score",
+        cursor: Optional[Tuple] = None
+    ) -> List[Dict]:
+        """
+        Posts de la fenêtre, triés par sort_by puis id décroissants ; les
+        critères de filters sont traduits en clauses de la requête
+        """
+
+    @abstractmethod
+    def get_post_bodies(self, post_ids: List[str]) -> Dict[str, str]:
+        """
+        Contenu complet des posts demandés, {post_id: content}
+        (les posts sans contenu sont absents)
+        """
+
+    def get_post_content(self, post_id: str) -> str:
+        return self.get_post_bodies([post_id]).get(post_id, "")
+
+    @abstractmethod
+    def get_signature_candidates(self, user_id: str, band_keys: List[str]) -> List[Dict]:
+        """
+        Signatures MinHash enregistrées partageant au moins une clé LSH
+        avec band_keys, lignes {post_id, cluster_id, signature}
+        """
+
+    @abstractmethod
+    def save_signatures(self, rows: List[Dict]) -> None:
+        """
+        Enregistre les signatures {user_id, post_id, post_date, cluster_id,
+        signature, bands} (voir utils/dedup.py)
+        """
+
+    @abstractmethod
+    def search_posts(
+        self,
+        user_id: str,
+        query: str,
+        days: int,
+        filters: Optional[FilterSpec] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict]:
+        """
+        Recherche plein texte classée (colonnes title_highlight,
+        content_highlight, rank et total_count en plus des colonnes "list"),
+        restreinte aux posts qui satisfont filters
+        """
+
+    @abstractmethod
+    def get_expiring_posts(self, days: int, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        """
+        Posts (colonnes de la table posts) que cleanup_old_posts(days) supprimera,
+        par lots triés par id croissant (pagination keyset sur after_id)
+        """
+
+    @abstractmethod
+    def cleanup_old_posts(self, days: int) -> None:
+        ...
+
+    @abstractmethod
+    def count_posts(self, user_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def rescore_posts(
+        self,
+        user_id: str,
+        weights: Dict,
+        after_id: int = 0,
+        limit: int = 1000,
+        formula: Optional[str] = None
+    ) -> Dict:
+        """
+        Recalcule engagement_score pour un lot de posts de l'utilisateur (id > after_id),
+        avec la formule personnalisée formula (utils/formula.py) ou la formule par défaut
+
+        Returns:
+            Dict {processed, updated, last_id} ; processed = 0 quand tout est traité
+        """
+
+    @abstractmethod
+    def get_sentiment_batch(
+        self,
+        user_id: str,
+        after_id: int = 0,
+        limit: int = 1000,
+        missing_only: bool = True
+    ) -> List[Dict]:
+        """
+        Posts {id, post_id, title, content_preview} à scorer (sentiment NULL
+        si missing_only), par lots triés par id croissant
+        """
+
+    @abstractmethod
+    def update_sentiments(self, user_id: str, scores: Dict[str, float]) -> int:
+        """
+        Enregistre {post_id: sentiment} ; retourne le nombre de posts modifiés
+        """
+
+    # ----- Agrégations -----
+
+    @abstractmethod
+    def get_stats(self, user_id: str, days: int, top: int = 5) -> Dict:
+        """
+        Dict {total_posts, avg_engagement, top_subreddits: [{subreddit, total_posts}]}
+        """
+
+    @abstractmethod
+    def get_subreddit_stats(
+        self,
+        user_id: str,
+        days: int,
+        subreddit: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Lignes {subreddit, total_posts, avg_score, avg_comments, avg_engagement, last_post_date}
+        """
+
+    @abstractmethod
+    def get_keyword_stats(
+        self,
+        user_id: str,
+        days: int,
+        subreddit: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Lignes {keyword, total_posts, avg_score, avg_engagement}
+        """
+
+    # ----- Agrégats journaliers (rollups maintenus à l'écriture) -----
+
+    @abstractmethod
+    def get_daily_rollups(
+        self,
+        user_id: str,
+        days: int,
+        dimension: Optional[str] = None,
+        names: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Lignes {day, name, total_posts, score_sum, comments_sum, engagement_sum,
+        sentiment_sum} par jour (name None) ou par jour et valeur de dimension, triées par jour
+        """
+
+    @abstractmethod
+    def get_rollup_totals(self, user_id: str, days: int, dimension: str = "subreddit") -> List[Dict]:
+        """
+        Lignes {name, total_posts, engagement_sum, sentiment_sum, positive_posts,
+        negative_posts} de la période, par volume décroissant
+        """
+
+    @abstractmethod
+    def get_activity_heatmap(self, user_id: str, days: int) -> List[Dict]:
+        """
+        Lignes {day_of_week (0 = lundi), hour, total_posts}
+        """
+
+    @abstractmethod
+    def get_subreddit_activity(
+        self,
+        user_id: str,
+        days: int,
+        subreddits: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Lignes {subreddit, day, posts, engagement_sum, keyword_hits, keywords}
+        par subreddit et par jour (keywords : liste des mots-clés du jour)
+        """
+
+    # ----- Sketches journaliers (voir utils/sketches.py) -----
+
+    @abstractmethod
+    def get_day_posts(
+        self,
+        user_id: str,
+        day: str,
+        columns: List[str],
+        after_id: int = 0,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """
+        Posts d'un jour UTC ("YYYY-MM-DD"), par lots triés par id croissant
+        (pagination keyset sur after_id, la colonne id est toujours incluse)
+        """
+
+    @abstractmethod
+    def save_daily_sketches(self, rows: List[Dict]) -> None:
+        """
+        Remplace les lignes {user_id, day, posts, authors_hll, subreddits_hll,
+        score_sketch, engagement_sketch} de rollup_daily_sketches
+        """
+
+    @abstractmethod
+    def get_daily_sketches(self, user_id: str, days: int) -> List[Dict]:
+        """
+        Lignes de rollup_daily_sketches de la période, triées par jour
+        """
+
+    # ----- Fouille des termes associés aux mots-clés (voir utils/keyword_mining.py) -----
+
+    @abstractmethod
+    def get_keyword_mining_state(self, user_id: str) -> Optional[str]:
+        """
+        État sérialisé (KeywordMiner.to_text), None si absent
+        """
+
+    @abstractmethod
+    def save_keyword_mining_state(self, user_id: str, state: str) -> None:
+        ...
+
+    # ----- Découverte de subreddits (voir utils/discovery.py) -----
+
+    @abstractmethod
+    def save_subreddit_discovery(self, rows: List[Dict]) -> None:
+        """
+        Remplace les lignes {user_id, subreddit, posts, keyword_hits,
+        keywords_matched, engagement_sum, decayed_hits, last_day, as_of}
+        """
+
+    @abstractmethod
+    def get_subreddit_discovery(self, user_id: str) -> List[Dict]:
+        ...
+
+    # ----- Configuration utilisateur -----
+
+    @abstractmethod
+    def get_user_config(self, user_id: str) -> Optional[Dict]:
+        """
+        Configuration enregistrée, ou None si l'utilisateur n'en a pas
+        """
+
+    @abstractmethod
+    def update_user_config(self, user_id: str, config: Dict) -> None:
+        ...
@@ -0,0 +1,457 @@
+"""
+Backend de stockage Supabase (PostgreSQL via PostgREST)
+
+Schéma : database_schema.sql
+"""
+from supabase import create_client, Client
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+from .analyzer import engagement_components, score_engagement_batch
+from .storage import StorageBackend, split_post_bodies
+from .filters import FilterSpec
+
+# Nombre de post_id par requête in.(...) (longueur d'URL PostgREST)
+BODIES_CHUNK_SIZE = 100
+
+# Nombre de clés LSH par requête bands && {...} (longueur d'URL PostgREST)
+BANDS_CHUNK_SIZE = 150
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    Stockage dans Supabase : requêtes PostgREST et fonctions RPC du schéma
+    """
+
+    def __init__(self, url: str, key: str):
+        self.client: Client = create_client(url, key)
+
+    # ----- Mots-clés -----
+
+    def add_keyword(self, keyword: str, user_id: str) -> None:
+        data = {
+            "keyword": keyword.lower().strip(),
+            "user_id": user_id,
+            "active": True,
+            "created_at": datetime.now().isoformat()
+        }
+        self.client.table("keywords").insert(data).execute()
+
+    def get_keywords(self, user_id: str, active_only: bool = True) -> List[str]:
+        query = self.client.table("keywords").select("keyword").eq("user_id", user_id)
+
+        if active_only:
+            query = query.eq("active", True)
+
+        response = query.execute()
+        return [item["keyword"] for item in response.data]
+
+    def delete_keyword(self, keyword: str, user_id: str) -> None:
+        self.client.table("keywords").delete().eq("keyword", keyword).eq("user_id", user_id).execute()
+
+    # ----- Subreddits -----
+
+    def add_subreddit(self, subreddit: str, list_type: str, user_id: str) -> None:
+        data = {
+            "subreddit": subreddit.lower().strip(),
+            "list_type": list_type,
+            "user_id": user_id,
+            "active": True,
+            "created_at": datetime.now().isoformat()
+        }
+        self.client.table("subreddits").insert(data).execute()
+
+    def get_subreddits(self, list_type: str, user_id: str) -> List[str]:
+        response = (
+            self.client.table("subreddits")
+            .select("subreddit")
+            .eq("user_id", user_id)
+            .eq("list_type", list_type)
+            .eq("active", True)
+            .execute()
+        )
+        return [item["subreddit"] for item in response.data]
+
+    def delete_subreddit(self, subreddit: str, user_id: str) -> None:
+        self.client.table("subreddits").delete().eq("subreddit", subreddit).eq("user_id", user_id).execute()
+
+    # ----- Posts -----
+
+    def save_posts(self, posts_data: List[Dict]) -> None:
+        posts, bodies = split_post_bodies(posts_data)
+
+        # Corps en premier : le trigger set_post_search_vector les lit pour
+        # indexer le contenu lors de l'insertion des posts
+        if bodies:
+            self.client.table("post_bodies").upsert(bodies, on_conflict="post_id,post_date").execute()
+
+        # Insertion par batch (éviter les doublons via (post_id, post_date) unique,
+        # la clé de partitionnement faisant partie de la contrainte)
+        self.client.table("posts").upsert(posts, on_conflict="post_id,post_date").execute()
+
+    def get_posts(
+        self,
+        user_id: str,
+        days: int,
+        limit: int,
+        filters: Optional[FilterSpec] = None,
+        columns: Optional[List[str]] = None,
+        sort_by: str = "engagement_score",
+        cursor: Optional[Tuple] = None
+    ) -> List[Dict]:
+        # Date limite
+        date_limit = (datetime.now() - timedelta(days=days)).isoformat()
+
+        query = (
+            self.client.table("posts")
+            .select(", ".join(columns) if columns else "*")
+            .eq("user_id", user_id)
+            .gte("post_date", date_limit)
+            .order(sort_by, desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+        )
+
+        # Pagination keyset : (sort_by, id) < curseur, servie par l'index composite
+        if cursor:
+            value, last_id = cursor
+            query = query.or_(
+                f'{sort_by}.lt."{value}",'
+                f'and({sort_by}.eq."{value}",id.lt.{last_id})'
+            )
+
+        if filters:
+            query = filters.apply_postgrest(query)
+
+        return query.execute().data or []
+
+    def get_post_bodies(self, post_ids: List[str]) -> Dict[str, str]:
+        bodies = {}
+
+        for start in range(0, len(post_ids), BODIES_CHUNK_SIZE):
+            response = (
+                self.client.table("post_bodies")
+                .select("post_id, content")
+                .in_("post_id", post_ids[start:start + BODIES_CHUNK_SIZE])
+                .execute()
+            )
+            bodies.update({item["post_id"]: item["content"] for item in response.data})
+
+        return bodies
+
+    def get_signature_candidates(self, user_id: str, band_keys: List[str]) -> List[Dict]:
+        candidates = {}
+
+        for start in range(0, len(band_keys), BANDS_CHUNK_SIZE):
+            # bands && '{...}' : servi par l'index GIN idx_post_signatures_bands
+            response = (
+                self.client.table("post_signatures")
+                .select("post_id, cluster_id, signature")
+                .eq("user_id", user_id)
+                .ov("bands", band_keys[start:start + BANDS_CHUNK_SIZE])
+                .execute()
+            )
+            candidates.update({item["post_id"]: item for item in response.data})
+
+        return list(candidates.values())
+
+    def save_signatures(self, rows: List[Dict]) -> None:
+        self.client.table("post_signatures").upsert(rows, on_conflict="user_id,post_id").execute()
+
+    def search_posts(
+        self,
+        user_id: str,
+        query: str,
+        days: int,
+        filters: Optional[FilterSpec] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict]:
+        response = self.client.rpc(
+            "search_posts",
+            {
+                "p_user_id": user_id,
+                "p_query": query,
+                "p_days": days,
+                **(filters or FilterSpec()).rpc_params(),
+                "p_limit": limit,
+                "p_offset": offset
+            }
+        ).execute()
+        return response.data or []
+
+    def get_expiring_posts(self, days: int, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        # Mêmes lignes que celles supprimées par drop_expired_posts_partitions
+        response = self.client.rpc(
+            "get_expiring_posts",
+            {"p_days": days, "p_after_id": after_id, "p_limit": limit}
+        ).execute()
+        return response.data or []
+
+    def cleanup_old_posts(self, days: int) -> None:
+        # Rétention par suppression de partitions mensuelles entières
+        self.client.rpc("drop_expired_posts_partitions", {"p_days": days}).execute()
+        self.client.rpc(
+            "create_posts_partitions",
+            {"p_months_back": 0, "p_months_ahead": 2}
+        ).execute()
+
+    def count_posts(self, user_id: str) -> int:
+        response = (
+            self.client.table("posts")
+            .select("id", count="exact")
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        return response.count or 0
+
+    def rescore_posts(
+        self,
+        user_id: str,
+        weights: Dict,
+        after_id: int = 0,
+        limit: int = 1000,
+        formula: Optional[str] = None
+    ) -> Dict:
+        if formula:
+            return self._rescore_posts_with_formula(user_id, weights, after_id, limit, formula)
+
+        # Calcul et mise à jour côté base : aucune ligne ne transite
+        response = self.client.rpc(
+            "rescore_posts_batch",
+            {"p_user_id": user_id, "p_weights": weights, "p_after_id": after_id, "p_limit": limit}
+        ).execute()
+        rows = response.data or []
+        return rows[0] if rows else {"processed": 0, "updated": 0, "last_id": None}
+
+    def _rescore_posts_with_formula(
+        self,
+        user_id: str,
+        weights: Dict,
+        after_id: int,
+        limit: int,
+        formula: str
+    ) -> Dict:
+        # Formule personnalisée : lot lu puis scoré en une passe vectorisée côté
+        # application, seuls les scores modifiés sont renvoyés (set_posts_engagement)
+        response = (
+            self.client.table("posts")
+            .select("id, score, num_comments, awards, upvote_ratio, age_hours, engagement_score")
+            .eq("user_id", user_id)
+            .gt("id", after_id)
+            .order("id")
+            .limit(limit)
+            .execute()
+        )
+        rows = response.data or []
+        if not rows:
+            return {"processed": 0, "updated": 0, "last_id": None}
+
+        components, age_hours = engagement_components(rows)
+        scores = score_engagement_batch(components, age_hours, weights, formula).tolist()
+        changes = {
+            row["id"]: score for score, row in zip(scores, rows)
+            if row["engagement_score"] is None or score != float(row["engagement_score"])
+        }
+
+        updated = 0
+        if changes:
+            updated = self.client.rpc(
+                "set_posts_engagement",
+                {"p_user_id": user_id, "p_ids": list(changes), "p_scores": list(changes.values())}
+            ).execute().data or 0
+        return {"processed": len(rows), "updated": updated, "last_id": rows[-1]["id"]}
+
+    def get_sentiment_batch(
+        self,
+        user_id: str,
+        after_id: int = 0,
+        limit: int = 1000,
+        missing_only: bool = True
+    ) -> List[Dict]:
+        query = (
+            self.client.table("posts")
+            .select("id, post_id, title, content_preview")
+            .eq("user_id", user_id)
+            .gt("id", after_id)
+        )
+        if missing_only:
+            query = query.is_("sentiment", "null")
+        response = query.order("id").limit(limit).execute()
+        return response.data or []
+
+    def update_sentiments(self, user_id: str, scores: Dict[str, float]) -> int:
+        if not scores:
+            return 0
+        response = self.client.rpc(
+            "set_posts_sentiment",
+            {"p_user_id": user_id, "p_post_ids": list(scores), "p_scores": list(scores.values())}
+        ).execute()
+        return response.data or 0
+
+    # ----- Agrégations -----
+
+    def get_stats(self, user_id: str, days: int, top: int = 5) -> Dict:
+        response = self.client.rpc(
+            "get_user_stats",
+            {"p_user_id": user_id, "p_days": days, "p_top": top}
+        ).execute()
+        return response.data or {}
+
+    def get_subreddit_stats(
+        self,
+        user_id: str,
+        days: int,
+        subreddit: Optional[str] = None
+    ) -> List[Dict]:
+        response = self.client.rpc(
+            "get_subreddit_stats",
+            {"p_user_id": user_id, "p_days": days, "p_subreddit": subreddit}
+        ).execute()
+        return response.data or []
+
+    def get_keyword_stats(
+        self,
+        user_id: str,
+        days: int,
+        subreddit: Optional[str] = None
+    ) -> List[Dict]:
+        response = self.client.rpc(
+            "get_keyword_stats",
+            {"p_user_id": user_id, "p_days": days, "p_subreddit": subreddit}
+        ).execute()
+        return response.data or []
+
+    # ----- Agrégats journaliers -----
+
+    def get_daily_rollups(
+        self,
+        user_id: str,
+        days: int,
+        dimension: Optional[str] = None,
+        names: Optional[List[str]] = None
+    ) -> List[Dict]:
+        response = self.client.rpc(
+            "get_daily_rollups",
+            {"p_user_id": user_id, "p_days": days, "p_dimension": dimension, "p_names": names}
+        ).execute()
+        return response.data or []
+
+    def get_rollup_totals(self, user_id: str, days: int, dimension: str = "subreddit") -> List[Dict]:
+        response = self.client.rpc(
+            "get_rollup_totals",
+            {"p_user_id": user_id, "p_days": days, "p_dimension": dimension}
+        ).execute()
+        return response.data or []
+
+    def get_activity_heatmap(self, user_id: str, days: int) -> List[Dict]:
+        response = self.client.rpc(
+            "get_activity_heatmap",
+            {"p_user_id": user_id, "p_days": days}
+        ).execute()
+        return response.data or []
+
+    def get_subreddit_activity(
+        self,
+        user_id: str,
+        days: int,
+        subreddits: Optional[List[str]] = None
+    ) -> List[Dict]:
+        response = self.client.rpc(
+            "get_subreddit_activity",
+            {"p_user_id": user_id, "p_days": days, "p_subreddits": subreddits}
+        ).execute()
+        return response.data or []
+
+    # ----- Sketches journaliers -----
+
+    def get_day_posts(
+        self,
+        user_id: str,
+        day: str,
+        columns: List[str],
+        after_id: int = 0,
+        limit: int = 1000
+    ) -> List[Dict]:
+        columns = ["id"] + [col for col in columns if col != "id"]
+        next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+        # Bornes UTC explicites : même découpage que les agrégats (post_date AT TIME ZONE 'UTC')
+        response = (
+            self.client.table("posts")
+            .select(", ".join(columns))
+            .eq("user_id", user_id)
+            .gte("post_date", f"{day}T00:00:00+00:00")
+            .lt("post_date", f"{next_day}T00:00:00+00:00")
+            .gt("id", after_id)
+            .order("id")
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    def save_daily_sketches(self, rows: List[Dict]) -> None:
+        now = datetime.now().isoformat()
+        rows = [{**row, "updated_at": now} for row in rows]
+        self.client.table("rollup_daily_sketches").upsert(rows, on_conflict="user_id,day").execute()
+
+    def get_daily_sketches(self, user_id: str, days: int) -> List[Dict]:
+        since = (datetime.now() - timedelta(days=days)).date().isoformat()
+        response = (
+            self.client.table("rollup_daily_sketches")
+            .select("day, posts, authors_hll, subreddits_hll, score_sketch, engagement_sketch")
+            .eq("user_id", user_id)
+            .gte("day", since)
+            .order("day")
+            .execute()
+        )
+        return response.data or []
+
+    # ----- Fouille des termes associés aux mots-clés -----
+
+    def get_keyword_mining_state(self, user_id: str) -> Optional[str]:
+        response = (
+            self.client.table("keyword_mining")
+            .select("state")
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return response.data[0]["state"] if response.data else None
+
+    def save_keyword_mining_state(self, user_id: str, state: str) -> None:
+        self.client.table("keyword_mining").upsert(
+            {"user_id": user_id, "state": state, "updated_at": datetime.now().isoformat()},
+            on_conflict="user_id"
+        ).execute()
+
+    # ----- Découverte de subreddits -----
+
+    def save_subreddit_discovery(self, rows: List[Dict]) -> None:
+        now = datetime.now().isoformat()
+        rows = [{**row, "updated_at": now} for row in rows]
+        self.client.table("subreddit_discovery").upsert(rows, on_conflict="user_id,subreddit").execute()
+
+    def get_subreddit_discovery(self, user_id: str) -> List[Dict]:
+        response = (
+            self.client.table("subreddit_discovery")
+            .select("subreddit, posts, keyword_hits, keywords_matched, engagement_sum, decayed_hits, last_day, as_of")
+            .eq("user_id", user_id)
+            .order("decayed_hits", desc=True)
+            .execute()
+        )
+        return response.data or []
+
+    # ----- Configuration utilisateur -----
+
+    def get_user_config(self, user_id: str) -> Optional[Dict]:
+        response = (
+            self.client.table("user_configs")
+            .select("*")
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    def update_user_config(self, user_id: str, config: Dict) -> None:
+        self.client.table("user_configs").upsert(config, on_conflict="user_id").execute()
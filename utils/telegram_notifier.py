@@ -7,6 +7,8 @@ from telegram.error import TelegramError
 from typing import List, Dict
 import asyncio
 
+from .analyzer import top_k
+
 
 def get_telegram_bot():
     """
@@ -72,7 +74,7 @@ def format_weekly_report(posts: List[Dict], stats: Dict) -> str:
     """
     Formate un rapport hebdomadaire pour Telegram
     """
-    top_posts = sorted(posts, key=lambda x: x.get("engagement_score", 0), reverse=True)[:5]
+    top_posts = top_k(posts, 5, unique_key="cluster_id")
     
     message = f"""
 📊 <b>Rapport Hebdomadaire Reddit Monitor</b>
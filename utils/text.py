@@ -0,0 +1,77 @@
+"""
+Module de normalisation et de découpage du texte des posts
+
+Tokenizer commun à la détection de quasi-doublons, à l'extraction de
+termes (mots-clés suggérés) et aux autres analyses de texte.
+"""
+import re
+import unicodedata
+from typing import List
+
+
+_URL_RE = re.compile(r"https?://\S+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+# Mots : lettres / chiffres, avec + # . - internes (c++, c#, node.js, gpt-4)
+_TOKEN_RE = re.compile(r"[a-z0-9](?:[a-z0-9+#.\-]*[a-z0-9+#])?")
+
+# Mots vides anglais et français (titres Reddit majoritairement en anglais)
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+get got had has have having he her here hers him his how i if in into is it its itself just
+me more most my no nor not now of off on once only or other our out over own same she should
+so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your
+yours new one like any anyone anything really still also vs via amp
+au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me meme
+mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi
+ton tu un une vos votre vous c d j l m n s t y est sont ete etre avoir fait plus comme tout
+""".split())
+
+
+def _fold(text: str) -> str:
+    """
+    Minuscules, sans accents ni URL
+    """
+    text = _URL_RE.sub(" ", (text or "").lower())
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Minuscules, sans accents, URL ni ponctuation, espaces simples
+    """
+    return _NON_WORD_RE.sub(" ", _fold(text)).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Mots d'un texte, en minuscules et sans accents (URL retirées)
+    """
+    return _TOKEN_RE.findall(_fold(text))
+
+
+def content_terms(tokens: List[str], max_n: int = 2) -> List[str]:
+    """
+    Unigrammes et n-grammes (jusqu'à max_n) de mots porteurs de sens :
+    sans mot vide ni nombre seul, unigrammes d'au moins 3 caractères
+    """
+    terms = []
+    run = []
+
+    for token in tokens + [None]:
+        if token is not None and token not in STOPWORDS and not token.isdigit():
+            run.append(token)
+            continue
+
+        # Séquence de mots porteurs terminée : ses n-grammes
+        for n in range(1, max_n + 1):
+            for i in range(len(run) - n + 1):
+                gram = run[i:i + n]
+                if n == 1 and len(gram[0]) < 3:
+                    continue
+                terms.append(" ".join(gram))
+        run = []
+
+    return terms
@@ -0,0 +1,185 @@
+"""
+Module de détection de tendances en continu (pics de volume par mot-clé et subreddit)
+
+Chaque post reçu pendant un scan met à jour, en O(1) par mot-clé et subreddit,
+un débit à décroissance exponentielle (demi-vie TREND_HALF_LIFE_HOURS) :
+
+    débit = ln(2) / demi-vie × Σ exp(-ln(2) × âge / demi-vie)
+
+La somme ne dépend pas de l'ordre d'arrivée des posts (la recherche Reddit
+les renvoie par pertinence, pas par date). Le débit, ramené en posts par
+jour, est comparé à une bande EWMA (moyenne et variance à pondération
+exponentielle) calculée sur les agrégats journaliers des jours précédents :
+un pic est signalé quand le z-score dépasse TREND_Z_THRESHOLD. Seuls les
+mots-clés et subreddits présents dans la référence sont surveillés (un mot-clé
+ajouté la veille n'est pas un pic).
+"""
+import math
+from typing import List, Dict, Optional, Tuple
+
+import pandas as pd
+
+from config.settings import (
+    TREND_HALF_LIFE_HOURS, TREND_Z_THRESHOLD, TREND_MIN_DAILY_RATE, TREND_EWMA_ALPHA
+)
+
+
+def ewma_band(daily_counts, alpha: float = TREND_EWMA_ALPHA) -> Tuple[float, float]:
+    """
+    Moyenne et écart-type à pondération exponentielle d'une série journalière
+    (du plus ancien au plus récent jour)
+    """
+    mean = variance = 0.0
+    for i, value in enumerate(daily_counts):
+        value = float(value)
+        if i == 0:
+            mean = value
+            continue
+        diff = value - mean
+        increment = alpha * diff
+        mean += increment
+        variance = (1 - alpha) * (variance + diff * increment)
+    return mean, math.sqrt(variance)
+
+
+class TrendDetector:
+    """
+    Débits décroissants et alertes de pic par (dimension, nom)
+
+    Utilisation :
+        detector = TrendDetector()
+        detector.seed(daily_rollups, "subreddit")   # lignes {day, name, total_posts}
+        for post in batch:
+            for alert in detector.add(post):
+                ...
+    """
+
+    def __init__(
+        self,
+        half_life_hours: float = TREND_HALF_LIFE_HOURS,
+        z_threshold: float = TREND_Z_THRESHOLD,
+        min_daily_rate: float = TREND_MIN_DAILY_RATE
+    ):
+        self.decay = math.log(2) / half_life_hours
+        self.z_threshold = z_threshold
+        self.min_daily_rate = min_daily_rate
+        # (dimension, nom) -> somme des poids exp(-decay × âge)
+        self._weights = {}
+        # (dimension, nom) -> (moyenne, écart-type) des posts par jour
+        self._baselines = {}
+        self._seen = set()
+        self._active = {}
+
+    def seed(self, daily_rollups, dimension: str, today: Optional[str] = None) -> None:
+        """
+        Calcule les bandes de référence depuis les agrégats journaliers
+
+        Args:
+            daily_rollups: Lignes {day, name, total_posts} (voir get_daily_rollups)
+            dimension: "subreddit" ou "keyword"
+            today: Jour exclu de la référence ("YYYY-MM-DD", aujourd'hui par défaut),
+                ses posts étant ceux que le scan en cours mesure
+        """
+        df = pd.DataFrame(daily_rollups)
+        if df.empty:
+            return
+
+        today = pd.Timestamp(today or pd.Timestamp.now().date())
+        df["day"] = pd.to_datetime(df["day"])
+        df = df[df["day"] < today]
+        if df.empty:
+            return
+
+        # Jours sans post comptés à zéro, du premier jour de la référence à hier
+        days = pd.date_range(df["day"].min(), today - pd.Timedelta(days=1), freq="D")
+        counts = (
+            df.pivot_table(index="day", columns="name", values="total_posts", aggfunc="sum")
+            .reindex(days)
+            .fillna(0)
+        )
+
+        for name in counts.columns:
+            self._baselines[(dimension, name)] = ewma_band(counts[name].to_numpy())
+
+    def rate(self, dimension: str, name: str) -> float:
+        """
+        Débit courant estimé, en posts par jour
+        """
+        return self._weights.get((dimension, name), 0.0) * self.decay * 24
+
+    def zscore(self, dimension: str, name: str) -> Optional[float]:
+        """
+        Écart du débit courant à la bande de référence (None sans référence)
+        """
+        baseline = self._baselines.get((dimension, name))
+        if baseline is None:
+            return None
+        mean, std = baseline
+        # Plancher de Poisson : un faible volume historique n'est pas une bande étroite
+        std = max(std, math.sqrt(max(mean, 1.0)))
+        return (self.rate(dimension, name) - mean) / std
+
+    def add(self, post: Dict) -> List[Dict]:
+        """
+        Ajoute un post (subreddit et mots-clés) aux débits
+
+        Returns:
+            Alertes déclenchées par ce post : {dimension, name, rate, baseline, zscore}
+        """
+        age_hours = post.get("age_hours")
+        if age_hours is None:
+            return []
+        weight = math.exp(-self.decay * max(float(age_hours), 0.0))
+
+        keys = [("subreddit", post.get("subreddit"))]
+        keys += [("keyword", kw) for kw in post.get("keywords") or []]
+
+        alerts = []
+        for dimension, name in keys:
+            if not name or (dimension, name, post.get("post_id")) in self._seen:
+                continue
+            self._seen.add((dimension, name, post.get("post_id")))
+            self._weights[(dimension, name)] = self._weights.get((dimension, name), 0.0) + weight
+
+            alert = self._check(dimension, name)
+            if alert:
+                alerts.append(alert)
+
+        return alerts
+
+    def extend(self, posts: List[Dict]) -> List[Dict]:
+        alerts = []
+        for post in posts:
+            alerts.extend(self.add(post))
+        return alerts
+
+    def _check(self, dimension: str, name: str) -> Optional[Dict]:
+        z = self.zscore(dimension, name)
+        if z is None:
+            return None
+
+        key = (dimension, name)
+        rate = self.rate(dimension, name)
+
+        if z < self.z_threshold or rate < self.min_daily_rate:
+            return None
+
+        # Alerte déjà levée : valeurs mises à jour, pas de nouvelle notification
+        if key in self._active:
+            self._active[key].update(rate=rate, zscore=z)
+            return None
+
+        self._active[key] = {
+            "dimension": dimension,
+            "name": name,
+            "rate": rate,
+            "baseline": self._baselines[key][0],
+            "zscore": z,
+        }
+        return self._active[key]
+
+    def alerts(self) -> List[Dict]:
+        """
+        Alertes actives, du z-score le plus élevé au plus faible
+        """
+        return sorted(self._active.values(), key=lambda alert: alert["zscore"], reverse=True)